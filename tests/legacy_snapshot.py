@@ -0,0 +1,243 @@
+"""
+The per-property animation snapshot voxanimate used before it batched its
+COM reads, kept verbatim as the reference test_voxanimate compares
+snapshot_slide_animations() against.
+"""
+
+
+def legacy_snapshot(slide) -> dict:
+    """
+    Capture complete animation state before audio insertion.
+    
+    IMPORTANT: Excludes media/audio effects - we only want shape animations.
+    
+    Returns:
+        {
+            "effects": [...],
+            "has_text_animations": True/False,  # NEW: Flag for text animations
+            "text_animation_shapes": [...]      # NEW: Names of affected shapes
+        }
+    """
+    try:
+        seq = slide.TimeLine.MainSequence
+        snapshot = {
+            "effects": [],
+            "has_text_animations": False,
+            "text_animation_shapes": []
+        }
+        
+        for i in range(1, seq.Count + 1):
+            effect = seq.Item(i)
+            
+            # CRITICAL FIX: Skip media/audio effects
+            # We only want to preserve shape animations, not audio
+            try:
+                if int(effect.EffectType) == 83:  # msoAnimEffectMediaPlay
+                    continue  # Skip audio effects
+            except:
+                pass
+            
+            eff_data = {
+                "index": i,
+                "shape_id": None,
+                "shape_name": None,
+                "effect_type": int(effect.EffectType),
+                "trigger_type": int(effect.Timing.TriggerType),
+                "trigger_delay": float(effect.Timing.TriggerDelayTime),
+                "duration": float(effect.Timing.Duration),
+                "speed": 1.0,
+                "rewind": False,
+                "repeat_count": 1,
+                "auto_reverse": False,
+                "effect_options": {},
+                "behaviors": [],
+                "text_unit_effect": None,  # NEW: For text animations
+                "paragraph": None,         # NEW: Which paragraph (-1 = all, 0+ = specific)
+                "text_range_start": None,  # NEW: Character start position
+                "text_range_length": None  # NEW: Character length
+            }
+            
+            # Capture shape info if available
+            try:
+                if effect.Shape:
+                    eff_data["shape_id"] = effect.Shape.Id
+                    eff_data["shape_name"] = effect.Shape.Name
+            except:
+                pass
+            
+            # NEW: Capture text animation properties (for by-paragraph/by-word animations)
+            try:
+                # TextUnitEffect property (by paragraph, by word, by letter)
+                if hasattr(effect, 'TextUnitEffect'):
+                    eff_data["text_unit_effect"] = int(effect.TextUnitEffect)
+                    # Mark that this slide has text animations
+                    snapshot["has_text_animations"] = True
+                    if eff_data.get("shape_name"):
+                        snapshot["text_animation_shapes"].append(eff_data["shape_name"])
+            except:
+                pass
+            
+            try:
+                # Paragraph index (-1 = all, 0+ = specific paragraph)
+                if hasattr(effect, 'Paragraph'):
+                    eff_data["paragraph"] = int(effect.Paragraph)
+                    # Mark that this slide has text animations
+                    snapshot["has_text_animations"] = True
+                    if eff_data.get("shape_name") and eff_data["shape_name"] not in snapshot["text_animation_shapes"]:
+                        snapshot["text_animation_shapes"].append(eff_data["shape_name"])
+            except:
+                pass
+            
+            try:
+                # Text range for character-level targeting
+                if hasattr(effect, 'TextRangeStart'):
+                    eff_data["text_range_start"] = int(effect.TextRangeStart)
+            except:
+                pass
+            
+            try:
+                if hasattr(effect, 'TextRangeLength'):
+                    eff_data["text_range_length"] = int(effect.TextRangeLength)
+            except:
+                pass
+            
+            # Capture additional timing properties safely
+            try:
+                eff_data["speed"] = float(effect.Timing.Speed)
+            except:
+                pass
+            
+            try:
+                eff_data["rewind"] = bool(effect.Timing.RewindWhenDone)
+            except:
+                pass
+            
+            try:
+                eff_data["repeat_count"] = int(effect.Timing.RepeatCount)
+            except:
+                pass
+            
+            try:
+                eff_data["auto_reverse"] = bool(effect.Timing.AutoReverse)
+            except:
+                pass
+            
+            # NEW: Capture effect options (direction, amount, etc.)
+            try:
+                if hasattr(effect, 'EffectParameters'):
+                    params = effect.EffectParameters
+                    
+                    # Direction (for Wipe, Fly In, etc.)
+                    try:
+                        eff_data["effect_options"]["direction"] = int(params.Direction)
+                    except:
+                        pass
+                    
+                    # Amount (for Grow/Shrink, etc.)
+                    try:
+                        eff_data["effect_options"]["amount"] = float(params.Amount)
+                    except:
+                        pass
+                    
+                    # Font settings (for text effects)
+                    try:
+                        eff_data["effect_options"]["font_bold"] = bool(params.FontBold)
+                    except:
+                        pass
+                    
+                    try:
+                        eff_data["effect_options"]["font_italic"] = bool(params.FontItalic)
+                    except:
+                        pass
+                    
+                    try:
+                        eff_data["effect_options"]["font_size"] = float(params.FontSize)
+                    except:
+                        pass
+                    
+                    try:
+                        eff_data["effect_options"]["font_underline"] = bool(params.FontUnderline)
+                    except:
+                        pass
+                    
+                    # Color settings
+                    try:
+                        eff_data["effect_options"]["color_rgb"] = int(params.Color.RGB)
+                    except:
+                        pass
+                    
+                    try:
+                        eff_data["effect_options"]["color2_rgb"] = int(params.Color2.RGB)
+                    except:
+                        pass
+                    
+                    # Relative position
+                    try:
+                        eff_data["effect_options"]["relative"] = bool(params.Relative)
+                    except:
+                        pass
+            except:
+                pass
+            
+            # NEW: Capture behavior properties (smooth start/end, etc.)
+            try:
+                if hasattr(effect, 'Behaviors'):
+                    for j in range(1, effect.Behaviors.Count + 1):
+                        behavior = effect.Behaviors.Item(j)
+                        behavior_data = {
+                            "type": int(behavior.Type) if hasattr(behavior, 'Type') else None
+                        }
+                        
+                        # Timing properties
+                        try:
+                            behavior_data["accumulate"] = int(behavior.Accumulate)
+                        except:
+                            pass
+                        
+                        try:
+                            behavior_data["additive"] = int(behavior.Additive)
+                        except:
+                            pass
+                        
+                        # Motion behavior properties
+                        try:
+                            if behavior.Type == 1:  # msoAnimTypeMotion
+                                behavior_data["x"] = float(behavior.MotionEffect.FromX)
+                                behavior_data["y"] = float(behavior.MotionEffect.FromY)
+                                behavior_data["to_x"] = float(behavior.MotionEffect.ToX)
+                                behavior_data["to_y"] = float(behavior.MotionEffect.ToY)
+                        except:
+                            pass
+                        
+                        # Property effect (for most animations)
+                        try:
+                            if behavior.Type == 4:  # msoAnimTypeProperty
+                                behavior_data["property"] = int(behavior.PropertyEffect.Property)
+                                try:
+                                    behavior_data["from_value"] = str(behavior.PropertyEffect.From)
+                                except:
+                                    pass
+                                try:
+                                    behavior_data["to_value"] = str(behavior.PropertyEffect.To)
+                                except:
+                                    pass
+                        except:
+                            pass
+                        
+                        # Timing behavior
+                        try:
+                            timing = behavior.Timing
+                            behavior_data["smooth_start"] = float(timing.SmoothStart)
+                            behavior_data["smooth_end"] = float(timing.SmoothEnd)
+                        except:
+                            pass
+                        
+                        eff_data["behaviors"].append(behavior_data)
+            except:
+                pass
+            
+            snapshot["effects"].append(eff_data)
+        
+        return snapshot
+    except Exception as e:
+        return {"effects": [], "error": str(e)}
@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import voxanimate
+from voxfakecom import FakeModel, FakeObject, build_slide
+from legacy_snapshot import legacy_snapshot
+
+SEEDS = range(8)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("audio", [True, False])
+@pytest.mark.parametrize("text", [True, False])
+def test_snapshot_matches_legacy_reader(seed, audio, text):
+    batched = voxanimate.snapshot_slide_animations(build_slide(FakeModel(), 25, seed=seed, audio=audio, text=text))
+    legacy = legacy_snapshot(build_slide(FakeModel(), 25, seed=seed, audio=audio, text=text))
+    assert "error" not in batched
+    assert batched == legacy
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_insert_audio_effect_matches_full_rebuild(seed):
+    timelines = {}
+    for name in ("rebuild", "diff"):
+        model = FakeModel()
+        slide = build_slide(model, 25, seed=seed, audio=False, text=False)
+        snap = voxanimate.snapshot_slide_animations(slide)
+        audio = FakeObject(model, Id=999, Name="VOX_VO")
+        if name == "rebuild":
+            assert voxanimate.restore_slide_animations(slide, snap, audio)
+        else:
+            assert voxanimate.insert_audio_effect(slide, snap, audio) == "kept"
+        timelines[name] = voxanimate._read_fingerprint(slide.TimeLine.MainSequence, voxanimate.ComStats())
+    assert timelines["diff"] == timelines["rebuild"]
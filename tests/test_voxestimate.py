@@ -0,0 +1,62 @@
+import os
+import sys
+import threading
+
+from pptx import Presentation
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import voxcore
+import voxestimate
+
+
+class _Response:
+    def __init__(self, body):
+        self.status_code = 200
+        self.headers = {}
+        self.text = ""
+        self._body = body
+
+    def iter_content(self, size):
+        for i in range(0, len(self._body), size):
+            yield self._body[i:i + size]
+
+    def close(self):
+        pass
+
+
+class _Session:
+    """Answers every TTS request with silent 16-bit PCM, like the API with pcm_* output."""
+
+    headers = {}
+
+    def post(self, url, **kwargs):
+        return _Response(b"\x00\x00" * 4410)
+
+    def request(self, method, url, **kwargs):
+        return self.post(url, **kwargs)
+
+
+def _make_deck(path, notes):
+    prs = Presentation()
+    for text in notes:
+        slide = prs.slides.add_slide(prs.slide_layouts[6])
+        slide.notes_slide.notes_text_frame.text = text
+    prs.save(path)
+
+
+def test_narration_records_latency_samples(tmp_path):
+    notes = ["First slide.", "The second slide has a longer note.", "Third."]
+    deck = str(tmp_path / "deck.pptx")
+    _make_deck(deck, notes)
+    env = voxcore.NarrationEnv(session=_Session(), settings={"tts_output_format": "pcm_22050"},
+                               settings_dir=str(tmp_path / "settings"))
+    assert voxestimate.read_latency_samples(env.logs_dir) == []
+
+    summary = voxcore.run_narration("key", "voice", deck, str(tmp_path / "out"), "", threading.Event(),
+                                    env=env, audio_only=True)
+
+    assert summary["status"] == "complete"
+    samples = voxestimate.read_latency_samples(env.logs_dir)
+    assert sorted(c for c, _ms in samples) == sorted(len(n) for n in notes)
+    assert all(ms >= 0 for _c, ms in samples)
@@ -0,0 +1,70 @@
+import os
+import sys
+import asyncio
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+web = pytest.importorskip("aiohttp.web")
+
+import voxnet
+from voxsecurity.allowlist import DomainNotAllowed
+
+
+async def _serve(app):
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def test_fetch_voices_retries_5xx_and_sorts():
+    calls = []
+
+    async def voices(request):
+        calls.append(request.headers.get("xi-api-key"))
+        if len(calls) == 1:
+            return web.Response(status=503)
+        return web.json_response({"voices": [{"name": "Zed", "voice_id": "z"}, {"name": "amy", "voice_id": "a"}]})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/v1/voices", voices)
+        runner, base = await _serve(app)
+        try:
+            async with voxnet.AsyncVoxClient(api_base=base, allowed_domains={"127.0.0.1"}, backoff_base=0.01) as c:
+                return await c.fetch_voices("key")
+        finally:
+            await runner.cleanup()
+
+    assert asyncio.run(run()) == [("amy", "a"), ("Zed", "z")]
+    assert calls == ["key", "key"]
+
+
+def test_request_does_not_follow_redirects():
+    async def moved(request):
+        raise web.HTTPFound("http://localhost:1/v1/voices")
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/v1/voices", moved)
+        runner, base = await _serve(app)
+        try:
+            async with voxnet.AsyncVoxClient(api_base=base, allowed_domains={"127.0.0.1"}) as c:
+                return await c.request("GET", c.url("/v1/voices"))
+        finally:
+            await runner.cleanup()
+
+    assert asyncio.run(run()).status_code == 302
+
+
+def test_request_blocks_unlisted_hosts():
+    async def run():
+        async with voxnet.AsyncVoxClient(allowed_domains={"127.0.0.1"}) as c:
+            await c.request("GET", "https://evil.example.com/")
+
+    with pytest.raises(DomainNotAllowed):
+        asyncio.run(run())
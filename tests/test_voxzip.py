@@ -0,0 +1,87 @@
+import os
+import sys
+import zipfile
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import voxzip
+
+MEMBERS = {
+    "[Content_Types].xml": (b"<Types/>", zipfile.ZIP_DEFLATED),
+    "ppt/slides/slide1.xml": (b"<sld>one</sld>" * 50, zipfile.ZIP_DEFLATED),
+    "ppt/slides/slide2.xml": (b"<sld>two</sld>" * 50, zipfile.ZIP_BZIP2),
+    "ppt/slides/slide3.xml": (b"<sld>three</sld>" * 50, zipfile.ZIP_LZMA),
+    "ppt/media/image1.png": (bytes(range(256)) * 40, zipfile.ZIP_STORED),
+    "ppt/media/old.wav": (b"RIFF" + bytes(500), zipfile.ZIP_STORED),
+}
+
+
+def _make(path):
+    with zipfile.ZipFile(path, "w") as z:
+        for name, (data, method) in MEMBERS.items():
+            z.writestr(name, data, compress_type=method)
+
+
+def _read_all(path):
+    with zipfile.ZipFile(path) as z:
+        assert z.testzip() is None
+        names = z.namelist()
+        assert len(names) == len(set(names))
+        return {n: z.read(n) for n in names}, {i.filename: i.compress_type for i in z.infolist()}
+
+
+def test_rewrite_copies_replaces_adds_and_removes(tmp_path):
+    src = str(tmp_path / "deck.pptx")
+    dst = str(tmp_path / "out.pptx")
+    _make(src)
+    wav = tmp_path / "new.wav"
+    wav.write_bytes(b"RIFF" + bytes(range(200)) * 5)
+
+    stats = voxzip.rewrite(src, dst,
+                           replace={"ppt/slides/slide1.xml": b"<sld>ONE</sld>",
+                                    "ppt/slides/slide3.xml": b"<sld>THREE</sld>",
+                                    "ppt/slides/_rels/slide1.xml.rels": b"<Relationships/>"},
+                           add_files={"ppt/media/new.wav": str(wav)},
+                           remove={"ppt/media/old.wav"})
+
+    data, methods = _read_all(dst)
+    assert data["ppt/slides/slide1.xml"] == b"<sld>ONE</sld>"
+    assert data["ppt/slides/slide3.xml"] == b"<sld>THREE</sld>"
+    assert methods["ppt/slides/slide3.xml"] == zipfile.ZIP_DEFLATED  # lzma can't be re-encoded
+    assert data["ppt/slides/_rels/slide1.xml.rels"] == b"<Relationships/>"
+    assert data["ppt/media/new.wav"] == wav.read_bytes()
+    assert "ppt/media/old.wav" not in data
+    for name in ("[Content_Types].xml", "ppt/slides/slide2.xml", "ppt/media/image1.png"):
+        assert data[name] == MEMBERS[name][0]
+        assert methods[name] == MEMBERS[name][1]
+    assert stats["members_copied"] == 3
+    assert stats["members_written"] == 4
+    assert not os.path.exists(dst + voxzip.TMP_SUFFIX)
+
+
+def test_rewrite_in_place(tmp_path):
+    src = str(tmp_path / "deck.pptx")
+    _make(src)
+    voxzip.rewrite(src, replace={"ppt/slides/slide2.xml": b"<sld>TWO</sld>"})
+    data, methods = _read_all(src)
+    assert data["ppt/slides/slide2.xml"] == b"<sld>TWO</sld>"
+    assert methods["ppt/slides/slide2.xml"] == zipfile.ZIP_DEFLATED
+    assert data["ppt/media/image1.png"] == MEMBERS["ppt/media/image1.png"][0]
+
+
+def test_rewrite_drops_every_copy_of_a_replaced_duplicate(tmp_path):
+    src = str(tmp_path / "dup.pptx")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # zipfile warns about the duplicate name
+        with zipfile.ZipFile(src, "w", zipfile.ZIP_DEFLATED) as z:
+            z.writestr("a.xml", b"first")
+            z.writestr("b.xml", b"keep")
+            z.writestr("a.xml", b"second")
+    dst = str(tmp_path / "out.pptx")
+    voxzip.rewrite(src, dst, replace={"a.xml": b"new"})
+    with zipfile.ZipFile(dst) as z:
+        assert z.testzip() is None
+        assert z.namelist() == ["a.xml", "b.xml"]
+        assert z.read("a.xml") == b"new"
+        assert z.read("b.xml") == b"keep"
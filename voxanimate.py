@@ -4,13 +4,79 @@ Animation preservation system for Voxsmith.
 
 Captures and restores PowerPoint animation timelines when audio is inserted,
 working around COM API's inherent animation scrambling behavior.
+
+Every property read in a snapshot is a cross-process COM call, so the
+snapshot reads each object once and counts its calls (ComStats).
+voxfakecom provides an in-process stand-in for the PowerPoint object
+model to exercise and benchmark this without PowerPoint.
+
+snapshot_from_timing_xml() builds the same structure from the slide XML
+in microseconds, so text-animation checks can run before PowerPoint is
+even started; COM is then needed only for slides it can't fully describe
+and for the restore itself.
+
+insert_audio_effect() is the cheap restore: it adds only the audio's
+Play effect and compares the rest of the timeline with the snapshot's
+timeline_fingerprint(), falling back to the full delete-and-recreate
+restore_slide_animations() only when the insert really scrambled it.
 """
+import time
+
+# EffectParameters reads, in snapshot order: (key, property, converter).
+# Color/Color2 are read through their .RGB.
+_EFFECT_PARAMS = (
+    ("direction", "Direction", int),
+    ("amount", "Amount", float),
+    ("font_bold", "FontBold", bool),
+    ("font_italic", "FontItalic", bool),
+    ("font_size", "FontSize", float),
+    ("font_underline", "FontUnderline", bool),
+    ("color_rgb", "Color", int),
+    ("color2_rgb", "Color2", int),
+    ("relative", "Relative", bool),
+)
+
+# A parameter that has failed this many times for an effect type, and never
+# succeeded for it, is not read again for that type. A failing COM read is
+# the most expensive kind (the error is marshalled back across processes).
+SKIP_AFTER_FAILURES = 2
+
+# {effect_type: {property: failures}}; -1 marks a property that has worked for the type
+_PARAM_HISTORY = {}
+
+
+class ComStats:
+    """COM round trips made by snapshot_slide_animations(), for the run log."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.skipped = 0
+        self.effects = 0
+        self.seconds = 0.0
+
+    def add(self, other) -> None:
+        for k in ("calls", "errors", "skipped", "effects", "seconds"):
+            setattr(self, k, getattr(self, k) + getattr(other, k))
+
+    def summary(self) -> str:
+        return (f"{self.effects} effect(s), {self.calls} COM call(s), {self.errors} failed, "
+                f"{self.skipped} skipped, {self.seconds * 1000:.0f} ms")
+
 
-def snapshot_slide_animations(slide) -> dict:
+_MISSING = object()
+
+
+def snapshot_slide_animations(slide, stats=None) -> dict:
     """
     Capture complete animation state before audio insertion.
     
     IMPORTANT: Excludes media/audio effects - we only want shape animations.
+
+    Every COM object (effect, Timing, Shape, EffectParameters, Behaviors,
+    each behavior) is fetched once and reused, and EffectParameters that
+    keep failing for an effect type are no longer read for it. Pass a
+    ComStats as stats to get the call count and time for the slide.
     
     Returns:
         {
@@ -19,33 +85,53 @@ def snapshot_slide_animations(slide) -> dict:
             "text_animation_shapes": [...]      # NEW: Names of affected shapes
         }
     """
+    st = stats if stats is not None else ComStats()
+    t0 = time.perf_counter()
+
+    def get(obj, name):
+        # One cross-process property read; raises like the COM call would
+        st.calls += 1
+        try:
+            return getattr(obj, name)
+        except Exception:
+            st.errors += 1
+            raise
+
+    def opt(obj, name):
+        # Property that may not exist or may not apply: _MISSING instead of raising
+        try:
+            return get(obj, name)
+        except Exception:
+            return _MISSING
+
     try:
-        seq = slide.TimeLine.MainSequence
+        seq = get(get(slide, "TimeLine"), "MainSequence")
         snapshot = {
             "effects": [],
             "has_text_animations": False,
             "text_animation_shapes": []
         }
-        
-        for i in range(1, seq.Count + 1):
+
+        for i in range(1, get(seq, "Count") + 1):
+            st.calls += 1
             effect = seq.Item(i)
-            
+
             # CRITICAL FIX: Skip media/audio effects
             # We only want to preserve shape animations, not audio
-            try:
-                if int(effect.EffectType) == 83:  # msoAnimEffectMediaPlay
-                    continue  # Skip audio effects
-            except:
-                pass
-            
+            effect_type = int(get(effect, "EffectType"))
+            if effect_type == 83:  # msoAnimEffectMediaPlay
+                continue  # Skip audio effects
+            st.effects += 1
+
+            timing = get(effect, "Timing")
             eff_data = {
                 "index": i,
                 "shape_id": None,
                 "shape_name": None,
-                "effect_type": int(effect.EffectType),
-                "trigger_type": int(effect.Timing.TriggerType),
-                "trigger_delay": float(effect.Timing.TriggerDelayTime),
-                "duration": float(effect.Timing.Duration),
+                "effect_type": effect_type,
+                "trigger_type": int(get(timing, "TriggerType")),
+                "trigger_delay": float(get(timing, "TriggerDelayTime")),
+                "duration": float(get(timing, "Duration")),
                 "speed": 1.0,
                 "rewind": False,
                 "repeat_count": 1,
@@ -57,191 +143,338 @@ def snapshot_slide_animations(slide) -> dict:
                 "text_range_start": None,  # NEW: Character start position
                 "text_range_length": None  # NEW: Character length
             }
-            
+
             # Capture shape info if available
             try:
-                if effect.Shape:
-                    eff_data["shape_id"] = effect.Shape.Id
-                    eff_data["shape_name"] = effect.Shape.Name
+                shape = get(effect, "Shape")
+                if shape:
+                    eff_data["shape_id"] = get(shape, "Id")
+                    eff_data["shape_name"] = get(shape, "Name")
             except:
                 pass
-            
+
             # NEW: Capture text animation properties (for by-paragraph/by-word animations)
             try:
                 # TextUnitEffect property (by paragraph, by word, by letter)
-                if hasattr(effect, 'TextUnitEffect'):
-                    eff_data["text_unit_effect"] = int(effect.TextUnitEffect)
-                    # Mark that this slide has text animations
-                    snapshot["has_text_animations"] = True
-                    if eff_data.get("shape_name"):
-                        snapshot["text_animation_shapes"].append(eff_data["shape_name"])
+                eff_data["text_unit_effect"] = int(get(effect, "TextUnitEffect"))
+                # Mark that this slide has text animations
+                snapshot["has_text_animations"] = True
+                if eff_data.get("shape_name"):
+                    snapshot["text_animation_shapes"].append(eff_data["shape_name"])
             except:
                 pass
-            
+
             try:
                 # Paragraph index (-1 = all, 0+ = specific paragraph)
-                if hasattr(effect, 'Paragraph'):
-                    eff_data["paragraph"] = int(effect.Paragraph)
-                    # Mark that this slide has text animations
-                    snapshot["has_text_animations"] = True
-                    if eff_data.get("shape_name") and eff_data["shape_name"] not in snapshot["text_animation_shapes"]:
-                        snapshot["text_animation_shapes"].append(eff_data["shape_name"])
+                eff_data["paragraph"] = int(get(effect, "Paragraph"))
+                snapshot["has_text_animations"] = True
+                if eff_data.get("shape_name") and eff_data["shape_name"] not in snapshot["text_animation_shapes"]:
+                    snapshot["text_animation_shapes"].append(eff_data["shape_name"])
             except:
                 pass
-            
-            try:
-                # Text range for character-level targeting
-                if hasattr(effect, 'TextRangeStart'):
-                    eff_data["text_range_start"] = int(effect.TextRangeStart)
-            except:
-                pass
-            
-            try:
-                if hasattr(effect, 'TextRangeLength'):
-                    eff_data["text_range_length"] = int(effect.TextRangeLength)
-            except:
-                pass
-            
+
+            for key, prop in (("text_range_start", "TextRangeStart"), ("text_range_length", "TextRangeLength")):
+                try:
+                    eff_data[key] = int(get(effect, prop))
+                except:
+                    pass
+
             # Capture additional timing properties safely
-            try:
-                eff_data["speed"] = float(effect.Timing.Speed)
-            except:
-                pass
-            
-            try:
-                eff_data["rewind"] = bool(effect.Timing.RewindWhenDone)
-            except:
-                pass
-            
-            try:
-                eff_data["repeat_count"] = int(effect.Timing.RepeatCount)
-            except:
-                pass
-            
-            try:
-                eff_data["auto_reverse"] = bool(effect.Timing.AutoReverse)
-            except:
-                pass
-            
+            for key, prop, conv in (("speed", "Speed", float), ("rewind", "RewindWhenDone", bool),
+                                    ("repeat_count", "RepeatCount", int), ("auto_reverse", "AutoReverse", bool)):
+                try:
+                    eff_data[key] = conv(get(timing, prop))
+                except:
+                    pass
+
             # NEW: Capture effect options (direction, amount, etc.)
-            try:
-                if hasattr(effect, 'EffectParameters'):
-                    params = effect.EffectParameters
-                    
-                    # Direction (for Wipe, Fly In, etc.)
-                    try:
-                        eff_data["effect_options"]["direction"] = int(params.Direction)
-                    except:
-                        pass
-                    
-                    # Amount (for Grow/Shrink, etc.)
-                    try:
-                        eff_data["effect_options"]["amount"] = float(params.Amount)
-                    except:
-                        pass
-                    
-                    # Font settings (for text effects)
-                    try:
-                        eff_data["effect_options"]["font_bold"] = bool(params.FontBold)
-                    except:
-                        pass
-                    
-                    try:
-                        eff_data["effect_options"]["font_italic"] = bool(params.FontItalic)
-                    except:
-                        pass
-                    
-                    try:
-                        eff_data["effect_options"]["font_size"] = float(params.FontSize)
-                    except:
-                        pass
-                    
-                    try:
-                        eff_data["effect_options"]["font_underline"] = bool(params.FontUnderline)
-                    except:
-                        pass
-                    
-                    # Color settings
-                    try:
-                        eff_data["effect_options"]["color_rgb"] = int(params.Color.RGB)
-                    except:
-                        pass
-                    
-                    try:
-                        eff_data["effect_options"]["color2_rgb"] = int(params.Color2.RGB)
-                    except:
-                        pass
-                    
-                    # Relative position
+            params = opt(effect, "EffectParameters")
+            if params is not _MISSING:
+                history = _PARAM_HISTORY.setdefault(effect_type, {})
+                for key, prop, conv in _EFFECT_PARAMS:
+                    if history.get(prop, 0) >= SKIP_AFTER_FAILURES:
+                        st.skipped += 1
+                        continue
                     try:
-                        eff_data["effect_options"]["relative"] = bool(params.Relative)
+                        value = get(params, prop)
+                        if prop in ("Color", "Color2"):
+                            value = get(value, "RGB")
+                        eff_data["effect_options"][key] = conv(value)
+                        history[prop] = -1
                     except:
-                        pass
-            except:
-                pass
-            
+                        if history.get(prop, 0) >= 0:
+                            history[prop] = history.get(prop, 0) + 1
+
             # NEW: Capture behavior properties (smooth start/end, etc.)
-            try:
-                if hasattr(effect, 'Behaviors'):
-                    for j in range(1, effect.Behaviors.Count + 1):
-                        behavior = effect.Behaviors.Item(j)
+            behaviors = opt(effect, "Behaviors")
+            if behaviors is not _MISSING:
+                try:
+                    for j in range(1, get(behaviors, "Count") + 1):
+                        st.calls += 1
+                        behavior = behaviors.Item(j)
+                        try:
+                            btype = get(behavior, "Type")
+                        except AttributeError:
+                            btype = None
                         behavior_data = {
-                            "type": int(behavior.Type) if hasattr(behavior, 'Type') else None
+                            "type": int(btype) if btype is not None else None
                         }
-                        
+
                         # Timing properties
-                        try:
-                            behavior_data["accumulate"] = int(behavior.Accumulate)
-                        except:
-                            pass
-                        
-                        try:
-                            behavior_data["additive"] = int(behavior.Additive)
-                        except:
-                            pass
-                        
+                        for key, prop in (("accumulate", "Accumulate"), ("additive", "Additive")):
+                            try:
+                                behavior_data[key] = int(get(behavior, prop))
+                            except:
+                                pass
+
                         # Motion behavior properties
-                        try:
-                            if behavior.Type == 1:  # msoAnimTypeMotion
-                                behavior_data["x"] = float(behavior.MotionEffect.FromX)
-                                behavior_data["y"] = float(behavior.MotionEffect.FromY)
-                                behavior_data["to_x"] = float(behavior.MotionEffect.ToX)
-                                behavior_data["to_y"] = float(behavior.MotionEffect.ToY)
-                        except:
-                            pass
-                        
+                        if btype == 1:  # msoAnimTypeMotion
+                            try:
+                                motion = get(behavior, "MotionEffect")
+                                behavior_data["x"] = float(get(motion, "FromX"))
+                                behavior_data["y"] = float(get(motion, "FromY"))
+                                behavior_data["to_x"] = float(get(motion, "ToX"))
+                                behavior_data["to_y"] = float(get(motion, "ToY"))
+                            except:
+                                pass
+
                         # Property effect (for most animations)
-                        try:
-                            if behavior.Type == 4:  # msoAnimTypeProperty
-                                behavior_data["property"] = int(behavior.PropertyEffect.Property)
+                        if btype == 4:  # msoAnimTypeProperty
+                            try:
+                                prop_effect = get(behavior, "PropertyEffect")
+                                behavior_data["property"] = int(get(prop_effect, "Property"))
                                 try:
-                                    behavior_data["from_value"] = str(behavior.PropertyEffect.From)
+                                    behavior_data["from_value"] = str(get(prop_effect, "From"))
                                 except:
                                     pass
                                 try:
-                                    behavior_data["to_value"] = str(behavior.PropertyEffect.To)
+                                    behavior_data["to_value"] = str(get(prop_effect, "To"))
                                 except:
                                     pass
-                        except:
-                            pass
-                        
+                            except:
+                                pass
+
                         # Timing behavior
                         try:
-                            timing = behavior.Timing
-                            behavior_data["smooth_start"] = float(timing.SmoothStart)
-                            behavior_data["smooth_end"] = float(timing.SmoothEnd)
+                            btiming = get(behavior, "Timing")
+                            behavior_data["smooth_start"] = float(get(btiming, "SmoothStart"))
+                            behavior_data["smooth_end"] = float(get(btiming, "SmoothEnd"))
                         except:
                             pass
-                        
+
                         eff_data["behaviors"].append(behavior_data)
-            except:
-                pass
-            
+                except:
+                    pass
+
             snapshot["effects"].append(eff_data)
-        
+
         return snapshot
     except Exception as e:
         return {"effects": [], "error": str(e)}
+    finally:
+        st.seconds += time.perf_counter() - t0
+
+
+# ---------- Snapshot from the slide's <p:timing> XML (no PowerPoint needed) ----------
+
+_P = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+
+# Effect node types -> MsoAnimTriggerType
+_XML_TRIGGERS = {"clickEffect": 1, "withEffect": 2, "afterEffect": 3}
+
+# Behavior elements -> MsoAnimType
+_XML_BEHAVIORS = {"animMotion": 1, "animClr": 2, "animScale": 3, "animRot": 4, "anim": 5, "cmd": 6,
+                  "animEffect": 7, "set": 8}
+
+# <p:iterate type> -> MsoAnimTextUnitEffect
+_XML_TEXT_UNITS = {"el": 0, "lt": 1, "wd": 2}
+
+_XML_ACCUMULATE = {"none": 1, "always": 2}
+_XML_ADDITIVE = {"base": 1, "sum": 2}
+
+
+def _xml_effect_type(preset_class: str, preset_id: int):
+    """MsoAnimEffect for a preset, or None where the numbering isn't a straight mapping."""
+    if preset_class in ("entr", "exit") and 1 <= preset_id <= 53:
+        return preset_id  # the classic entrance/exit presets share MsoAnimEffect's numbering
+    if preset_class == "emph" and 1 <= preset_id <= 9:
+        return 53 + preset_id  # ChangeFillColor (54) .. Transparency (62)
+    if preset_class == "mediacall":
+        return 83
+    return None
+
+
+def _ms(value):
+    """A timing attribute in milliseconds as float, or None for "indefinite"/missing."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _cond_delay(ctn):
+    cond = ctn.find(_P + "stCondLst/" + _P + "cond")
+    return _ms(cond.get("delay")) if cond is not None else None
+
+
+def snapshot_from_timing_xml(slide_xml) -> dict:
+    """
+    Same structure as snapshot_slide_animations(), read from a slide part's
+    XML (bytes or str) instead of over COM: the main sequence of
+    <p:timing>, plus <p:bldP> paragraph builds for the text-animation flag.
+
+    Extra keys: "source" is "xml"; "complete" is False when some effect
+    carries detail the COM restore needs but the XML doesn't map onto
+    (motion paths, directional variants, emphasis amounts and colours,
+    newer presets, endless repeats)
+    - take a COM snapshot of such a slide before restoring it. Each effect
+    also records its preset_class, preset_id and preset_subtype.
+    """
+    import xml.etree.ElementTree as ET
+
+    snapshot = {
+        "effects": [],
+        "has_text_animations": False,
+        "text_animation_shapes": [],
+        "source": "xml",
+        "complete": True,
+    }
+    try:
+        root = ET.fromstring(slide_xml)
+    except Exception as e:
+        return {"effects": [], "error": str(e), "source": "xml", "complete": False}
+
+    names = {}
+    for c_nv_pr in root.iter(_P + "cNvPr"):
+        try:
+            names[int(c_nv_pr.get("id"))] = c_nv_pr.get("name")
+        except (TypeError, ValueError):
+            pass
+
+    def mark_text(shape_name, unique):
+        snapshot["has_text_animations"] = True
+        if shape_name and (not unique or shape_name not in snapshot["text_animation_shapes"]):
+            snapshot["text_animation_shapes"].append(shape_name)
+
+    timing = root.find(_P + "timing")
+    main_seq = None
+    if timing is not None:
+        for ctn in timing.iter(_P + "cTn"):
+            if ctn.get("nodeType") == "mainSeq":
+                main_seq = ctn
+                break
+
+    index = 0
+    for par in (main_seq.iter(_P + "par") if main_seq is not None else ()):
+        ctn = par.find(_P + "cTn")
+        if ctn is None or ctn.get("nodeType") not in _XML_TRIGGERS:
+            continue
+        index += 1  # COM numbers every main-sequence effect, media included
+        preset_class = ctn.get("presetClass") or ""
+        try:
+            preset_id = int(ctn.get("presetID") or 0)
+            preset_subtype = int(ctn.get("presetSubtype") or 0)
+        except ValueError:
+            preset_id, preset_subtype = 0, 0
+        effect_type = _xml_effect_type(preset_class, preset_id)
+        if effect_type == 83:
+            continue  # media effects are left out, as in the COM snapshot
+        if effect_type is None or preset_subtype or preset_class == "emph":
+            # Emphasis amounts and colours (p:by, p:to, rotation) aren't read into effect_options,
+            # so a rebuild from this snapshot would fall back to PowerPoint's defaults
+            snapshot["complete"] = False
+
+        eff_data = {
+            "index": index,
+            "shape_id": None,
+            "shape_name": None,
+            "effect_type": effect_type,
+            "trigger_type": _XML_TRIGGERS[ctn.get("nodeType")],
+            "trigger_delay": (_cond_delay(ctn) or 0.0) / 1000.0,
+            "duration": 0.0,
+            "speed": 1.0,
+            "rewind": ctn.get("fill") == "remove",
+            "repeat_count": 1,
+            "auto_reverse": ctn.get("autoRev") in ("1", "true"),
+            "effect_options": {},
+            "behaviors": [],
+            "text_unit_effect": None,
+            "paragraph": None,
+            "text_range_start": None,
+            "text_range_length": None,
+            "preset_class": preset_class,
+            "preset_id": preset_id,
+            "preset_subtype": preset_subtype,
+        }
+        if ctn.get("spd"):
+            eff_data["speed"] = (_ms(ctn.get("spd")) or 100000.0) / 100000.0
+        if ctn.get("repeatCount"):
+            count = _ms(ctn.get("repeatCount"))
+            if count is None:
+                snapshot["complete"] = False
+            else:
+                eff_data["repeat_count"] = max(1, int(round(count / 1000.0)))
+
+        target = par.find(".//" + _P + "spTgt")
+        if target is not None:
+            try:
+                eff_data["shape_id"] = int(target.get("spid"))
+                eff_data["shape_name"] = names.get(eff_data["shape_id"])
+            except (TypeError, ValueError):
+                pass
+
+        iterate = ctn.find(_P + "iterate")
+        if iterate is not None:
+            eff_data["text_unit_effect"] = _XML_TEXT_UNITS.get(iterate.get("type", "el"), 0)
+            mark_text(eff_data["shape_name"], unique=False)
+        if target is not None:
+            p_rg = target.find(_P + "txEl/" + _P + "pRg")
+            char_rg = target.find(_P + "txEl/" + _P + "charRg")
+            if p_rg is not None:
+                eff_data["paragraph"] = int(p_rg.get("st", "0"))
+                mark_text(eff_data["shape_name"], unique=True)
+            elif char_rg is not None:
+                st = int(char_rg.get("st", "0"))
+                eff_data["text_range_start"] = st
+                eff_data["text_range_length"] = int(char_rg.get("end", st)) - st
+
+        end = 0.0
+        children = ctn.find(_P + "childTnLst")
+        for child in (children if children is not None else ()):
+            btype = _XML_BEHAVIORS.get(child.tag[len(_P):]) if child.tag.startswith(_P) else None
+            if btype is None:
+                continue
+            behavior_data = {"type": btype}
+            c_bhvr = child.find(_P + "cBhvr")
+            b_ctn = c_bhvr.find(_P + "cTn") if c_bhvr is not None else None
+            if c_bhvr is not None:
+                if c_bhvr.get("accumulate") in _XML_ACCUMULATE:
+                    behavior_data["accumulate"] = _XML_ACCUMULATE[c_bhvr.get("accumulate")]
+                if c_bhvr.get("additive") in _XML_ADDITIVE:
+                    behavior_data["additive"] = _XML_ADDITIVE[c_bhvr.get("additive")]
+            if btype == 1:
+                snapshot["complete"] = False  # motion paths are rebuilt from COM
+            if b_ctn is not None:
+                behavior_data["smooth_start"] = (_ms(b_ctn.get("accel")) or 0.0) / 100000.0
+                behavior_data["smooth_end"] = (_ms(b_ctn.get("decel")) or 0.0) / 100000.0
+                dur = _ms(b_ctn.get("dur"))
+                if dur is not None:
+                    end = max(end, (_cond_delay(b_ctn) or 0.0) + dur)
+            eff_data["behaviors"].append(behavior_data)
+        eff_data["duration"] = end / 1000.0
+
+        snapshot["effects"].append(eff_data)
+
+    # Paragraph builds: flagged even if no effect above targeted a paragraph
+    if timing is not None:
+        for bld_p in timing.iter(_P + "bldP"):
+            if bld_p.get("build", "whole") in ("p", "cust"):
+                try:
+                    mark_text(names.get(int(bld_p.get("spid"))), unique=True)
+                except (TypeError, ValueError):
+                    mark_text(None, unique=True)
+
+    return snapshot
 
 
 def restore_slide_animations(slide, snapshot: dict, audio_shape) -> bool:
@@ -482,6 +715,77 @@ def restore_slide_animations(slide, snapshot: dict, audio_shape) -> bool:
         return False
 
 
+# ---------- Diff restore: add the audio effect, verify the rest ----------
+
+def timeline_fingerprint(effects) -> tuple:
+    """Order, target, type, trigger and delay of each shape animation - what an insert can scramble."""
+    return tuple((e.get("shape_id"), int(e["effect_type"]), int(e["trigger_type"]),
+                  round(float(e["trigger_delay"]), 3)) for e in effects)
+
+
+def _read_fingerprint(seq, st) -> tuple:
+    """(fingerprint of the live sequence's shape animations, number of media effects in it)."""
+    def get(obj, name):
+        st.calls += 1
+        try:
+            return getattr(obj, name)
+        except Exception:
+            st.errors += 1
+            raise
+
+    rows = []
+    media = 0
+    for i in range(1, get(seq, "Count") + 1):
+        st.calls += 1
+        effect = seq.Item(i)
+        effect_type = int(get(effect, "EffectType"))
+        if effect_type == 83:  # msoAnimEffectMediaPlay
+            media += 1
+            continue
+        st.effects += 1
+        try:
+            shape_id = get(get(effect, "Shape"), "Id")
+        except Exception:
+            shape_id = None
+        timing = get(effect, "Timing")
+        rows.append((shape_id, effect_type, int(get(timing, "TriggerType")),
+                     round(float(get(timing, "TriggerDelayTime")), 3)))
+    return tuple(rows), media
+
+
+def insert_audio_effect(slide, snapshot: dict, audio_shape, stats=None) -> str:
+    """
+    Add the audio's Play effect at position 1 (After Previous) without
+    touching the rest of the timeline, then check the rest against the
+    snapshot's fingerprint. Only if inserting the audio scrambled it -
+    or a stray media effect is left - is the whole timeline rebuilt with
+    restore_slide_animations().
+
+    Returns "kept" (4 COM writes), "rebuilt" or "failed".
+    """
+    st = stats if stats is not None else ComStats()
+    t0 = time.perf_counter()
+    try:
+        if "error" not in snapshot:
+            seq = slide.TimeLine.MainSequence
+            st.calls += 2
+            audio_eff = seq.AddEffect(audio_shape, 83)  # msoAnimEffectMediaPlay
+            st.calls += 1
+            audio_eff.MoveTo(1)
+            timing = audio_eff.Timing
+            timing.TriggerType = 3  # msoAnimTriggerAfterPrevious
+            timing.TriggerDelayTime = 0.0
+            st.calls += 3
+            live, media = _read_fingerprint(seq, st)
+            if media == 1 and live == timeline_fingerprint(snapshot.get("effects", [])):
+                return "kept"
+    except Exception:
+        pass
+    finally:
+        st.seconds += time.perf_counter() - t0
+    return "rebuilt" if restore_slide_animations(slide, snapshot, audio_shape) else "failed"
+
+
 def cleanup_orphaned_audio_effects(slide):
     """
     Remove animation effects for audio shapes that no longer exist.
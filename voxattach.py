@@ -12,6 +12,7 @@ from __future__ import annotations
 
 from pathlib import Path
 import sys
+import time
 
 __version__ = "1.1"
 
@@ -136,6 +137,58 @@ def _ensure_session(deck_path: str):
     return app, pres, opened_by_us
 
 
+# ---------- Save checkpoints ----------
+
+# Defaults for a narration run (settings: save_every_slides / save_every_seconds; 0 disables a trigger)
+SAVE_EVERY_SLIDES = 10
+SAVE_EVERY_SECONDS = 120
+
+
+class SaveCheckpoint:
+    """
+    Decide when to Save() an open presentation during a run.
+
+    Saving a large, media-heavy deck takes seconds, so instead of saving after
+    every slide we save every `every_slides` insertions or `every_seconds`,
+    whichever comes first (0 disables a trigger), plus a final save. The
+    slides inserted since the last save are returned by save() so callers can
+    record them as durable in their manifest.
+    """
+
+    def __init__(self, every_slides: int = SAVE_EVERY_SLIDES, every_seconds: float = SAVE_EVERY_SECONDS,
+                 clock=time.monotonic):
+        self.every_slides = max(0, int(every_slides or 0))
+        self.every_seconds = max(0.0, float(every_seconds or 0))
+        self._clock = clock
+        self.last_save = clock()
+        self.pending = []
+        self.saves = 0
+
+    def mark(self, slide_index_1based: int) -> None:
+        self.pending.append(int(slide_index_1based))
+
+    def due(self) -> bool:
+        if not self.pending:
+            return False
+        if self.every_slides and len(self.pending) >= self.every_slides:
+            return True
+        if self.every_seconds and (self._clock() - self.last_save) >= self.every_seconds:
+            return True
+        # Both triggers off means "final save only"
+        return False
+
+    def save(self, pres) -> list:
+        """Save now; returns the slide indexes that became durable."""
+        pres.Save()
+        saved, self.pending = self.pending, []
+        self.last_save = self._clock()
+        self.saves += 1
+        return saved
+
+    def maybe_save(self, pres) -> list:
+        return self.save(pres) if self.due() else []
+
+
 # ---------- Slide-level helpers ----------
 
 def _delete_existing_vox_audio(slide):
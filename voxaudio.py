@@ -0,0 +1,350 @@
+"""
+voxaudio.py
+In-process audio normalization for Voxsmith.
+
+Turns WAV/PCM bytes from ElevenLabs into the 44.1 kHz stereo PCM16 WAV that
+PowerPoint gets, without spawning ffmpeg or bouncing through temp files.
+Compressed formats (MP3 etc.) are not handled here - callers fall back to
+ffmpeg when normalize_wav_bytes() returns None.
+
+NumPy is used for resampling when it is installed; otherwise a pure-Python
+path is used (the frozen build excludes NumPy).
+"""
+import os
+import sys
+import struct
+from array import array
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Without NumPy, resampling long clips in Python is slower than one ffmpeg
+# spawn; past this many source frames the caller should use ffmpeg instead.
+PURE_PY_RESAMPLE_MAX_FRAMES = 44100 * 60
+
+_LITTLE = sys.byteorder == "little"
+
+
+class WavInfo:
+    __slots__ = ("fmt", "rate", "channels", "bits", "data")
+
+    def __init__(self, fmt, rate, channels, bits, data):
+        self.fmt = fmt
+        self.rate = rate
+        self.channels = channels
+        self.bits = bits
+        self.data = data
+
+
+def is_wav(data: bytes) -> bool:
+    return len(data) >= 12 and data[0:4] == b"RIFF" and data[8:12] == b"WAVE"
+
+
+def parse_wav(data: bytes):
+    """Walk RIFF chunks and return WavInfo, or None if not a usable WAV."""
+    if not is_wav(data):
+        return None
+    pos = 12
+    fmt = None
+    body = None
+    n = len(data)
+    while pos + 8 <= n:
+        cid = data[pos:pos + 4]
+        size = struct.unpack_from("<I", data, pos + 4)[0]
+        start = pos + 8
+        if cid == b"fmt " and size >= 16:
+            tag, ch, rate, _br, _align, bits = struct.unpack_from("<HHIIHH", data, start)
+            if tag == WAVE_FORMAT_EXTENSIBLE and size >= 40:
+                tag = struct.unpack_from("<H", data, start + 24)[0]
+            fmt = (tag, ch, rate, bits)
+        elif cid == b"data":
+            # Streamed WAVs may carry 0 or 0xFFFFFFFF as the data size
+            end = n if size in (0, 0xFFFFFFFF) or start + size > n else start + size
+            body = data[start:end]
+            break
+        pos = start + size + (size & 1)
+    if fmt is None or body is None:
+        return None
+    tag, ch, rate, bits = fmt
+    if ch < 1 or rate < 1:
+        return None
+    return WavInfo(tag, rate, ch, bits, body)
+
+
+def _to_pcm16(info: WavInfo):
+    """Return interleaved PCM16 samples as array('h'), or None for unsupported encodings."""
+    d = info.data
+    if info.fmt == WAVE_FORMAT_PCM:
+        if info.bits == 16:
+            out = array("h")
+            out.frombytes(d[:len(d) - (len(d) % 2)])
+            if not _LITTLE:
+                out.byteswap()
+            return out
+        if info.bits in (24, 32):
+            # Keep the two most significant bytes of each little-endian sample
+            w = info.bits // 8
+            usable = len(d) - (len(d) % w)
+            b = bytearray(usable // w * 2)
+            b[0::2] = d[w - 2:usable:w]
+            b[1::2] = d[w - 1:usable:w]
+            out = array("h")
+            out.frombytes(bytes(b))
+            if not _LITTLE:
+                out.byteswap()
+            return out
+        if info.bits == 8:
+            # Unsigned 8-bit: flip the sign bit and use it as the high byte
+            b = bytearray(len(d) * 2)
+            b[1::2] = d.translate(bytes((i ^ 0x80) for i in range(256)))
+            out = array("h")
+            out.frombytes(bytes(b))
+            if not _LITTLE:
+                out.byteswap()
+            return out
+        return None
+    if info.fmt == WAVE_FORMAT_IEEE_FLOAT and info.bits == 32:
+        f = array("f")
+        f.frombytes(d[:len(d) - (len(d) % 4)])
+        if not _LITTLE:
+            f.byteswap()
+        if np is not None:
+            v = np.clip(np.frombuffer(f.tobytes(), dtype=np.float32), -1.0, 1.0)
+            return array("h", (v * 32767.0).astype(np.int16).tobytes())
+        return array("h", (int(max(-1.0, min(1.0, x)) * 32767.0) for x in f))
+    return None
+
+
+def _resample(samples, channels: int, src_rate: int, dst_rate: int):
+    """Linear-interpolation resample of interleaved PCM16."""
+    if src_rate == dst_rate or not samples:
+        return samples
+    frames = len(samples) // channels
+    out_frames = int(frames * dst_rate / src_rate)
+    if np is not None:
+        x = np.frombuffer(samples.tobytes(), dtype=np.int16).reshape(-1, channels).astype(np.float32)
+        pos = np.arange(out_frames, dtype=np.float64) * (src_rate / dst_rate)
+        src_pos = np.arange(frames, dtype=np.float64)
+        y = np.empty((out_frames, channels), dtype=np.float32)
+        for c in range(channels):
+            y[:, c] = np.interp(pos, src_pos, x[:, c])
+        y = np.clip(np.rint(y), -32768, 32767).astype(np.int16)
+        return array("h", y.tobytes())
+    step = src_rate / dst_rate
+    last = frames - 1
+    out = array("h", bytes(out_frames * channels * 2))
+    for c in range(channels):
+        ch = samples[c::channels]
+        vals = []
+        for i in range(out_frames):
+            p = i * step
+            j = int(p)
+            if j >= last:
+                vals.append(ch[last])
+                continue
+            a = ch[j]
+            vals.append(int(a + (ch[j + 1] - a) * (p - j)))
+        out[c::channels] = array("h", vals)
+    return out
+
+
+def _remix(samples, channels: int, target_channels: int):
+    """Up/down-mix between mono and stereo. Returns None for other layouts."""
+    if channels == target_channels:
+        return samples
+    frames = len(samples) // channels
+    if channels == 1 and target_channels == 2:
+        out = array("h", bytes(frames * 4))
+        out[0::2] = samples
+        out[1::2] = samples
+        return out
+    if channels == 2 and target_channels == 1:
+        left, right = samples[0::2], samples[1::2]
+        return array("h", ((a + b) >> 1 for a, b in zip(left, right)))
+    return None
+
+
+def encode_wav(samples, rate: int, channels: int) -> bytes:
+    """Wrap interleaved PCM16 samples in a canonical 44-byte WAV header."""
+    if not _LITTLE:
+        samples = array("h", samples)
+        samples.byteswap()
+    body = samples.tobytes()
+    return wav_header(len(body), rate, channels, 16) + body
+
+
+def wav_header(data_bytes: int, rate: int, channels: int, bits: int = 16) -> bytes:
+    align = channels * bits // 8
+    return (b"RIFF" + struct.pack("<I", 36 + data_bytes) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, WAVE_FORMAT_PCM, channels, rate, rate * align, align, bits)
+            + b"data" + struct.pack("<I", data_bytes))
+
+
+def normalize_pcm16(raw: bytes, rate: int, channels: int, target_rate: int = 44100, target_channels: int = 2):
+    """Raw little-endian PCM16 -> target WAV bytes, or None if it can't be done in-process."""
+    info = WavInfo(WAVE_FORMAT_PCM, int(rate), int(channels), 16, raw)
+    return _normalize(info, int(target_rate), int(target_channels))
+
+
+def normalize_wav_bytes(data: bytes, target_rate: int = 44100, target_channels: int = 2):
+    """
+    WAV bytes -> 44.1 kHz stereo PCM16 WAV bytes (or the requested target).
+
+    Returns None for anything that needs a real decoder (MP3, ADPCM, >2
+    channels, very long pure-Python resamples) so the caller can use ffmpeg.
+    """
+    info = parse_wav(data)
+    if info is None:
+        return None
+    return _normalize(info, int(target_rate), int(target_channels))
+
+
+def _normalize(info: WavInfo, target_rate: int, target_channels: int):
+    if info.channels > 2:
+        return None
+    if info.rate != target_rate and np is None and len(info.data) // max(1, info.channels * info.bits // 8) > PURE_PY_RESAMPLE_MAX_FRAMES:
+        return None
+    samples = _to_pcm16(info)
+    if samples is None:
+        return None
+    samples = _resample(samples, info.channels, info.rate, target_rate)
+    samples = _remix(samples, info.channels, target_channels)
+    if samples is None:
+        return None
+    return encode_wav(samples, target_rate, target_channels)
+
+
+def wav_data_span(path: str):
+    """
+    (rate, channels, bits, data_offset, data_bytes) of a PCM WAV file, read
+    from its headers only, or None if it isn't an uncompressed PCM WAV.
+    """
+    with open(path, "rb") as f:
+        head = f.read(12)
+        if not is_wav(head):
+            return None
+        file_size = os.fstat(f.fileno()).st_size
+        fmt = None
+        pos = 12
+        while pos + 8 <= file_size:
+            f.seek(pos)
+            cid = f.read(4)
+            size = struct.unpack("<I", f.read(4))[0]
+            start = pos + 8
+            if cid == b"fmt " and size >= 16:
+                tag, ch, rate, _br, _align, bits = struct.unpack("<HHIIHH", f.read(16))
+                if tag == WAVE_FORMAT_EXTENSIBLE and size >= 40:
+                    f.seek(start + 24)
+                    tag = struct.unpack("<H", f.read(2))[0]
+                fmt = (tag, ch, rate, bits)
+            elif cid == b"data":
+                if fmt is None or fmt[0] != WAVE_FORMAT_PCM:
+                    return None
+                end = file_size if size in (0, 0xFFFFFFFF) or start + size > file_size else start + size
+                return fmt[2], fmt[1], fmt[3], start, end - start
+            pos = start + size + (size & 1)
+    return None
+
+
+def concat_wavs(paths, out_path: str, block: int = 1 << 20) -> int:
+    """
+    Join PCM WAV files of one format into out_path, frame for frame.
+
+    Sample data is copied verbatim (no resampling, gaps or overlap), each
+    part trimmed to whole frames, so the result is exactly the sum of its
+    parts. Returns the number of frames written; raises ValueError if the
+    parts are not all the same PCM format.
+    """
+    spans = []
+    for p in paths:
+        span = wav_data_span(p)
+        if span is None:
+            raise ValueError(f"not a PCM WAV: {os.path.basename(p)}")
+        if spans and span[:3] != spans[0][:3]:
+            raise ValueError(f"format mismatch: {os.path.basename(p)}")
+        spans.append(span)
+    if not spans:
+        raise ValueError("nothing to join")
+    rate, channels, bits = spans[0][:3]
+    frame = channels * bits // 8
+    total = sum(size - size % frame for *_fmt, _off, size in spans)
+    with open(out_path, "wb") as out:
+        out.write(wav_header(total, rate, channels, bits))
+        for p, (*_fmt, offset, size) in zip(paths, spans):
+            left = size - size % frame
+            with open(p, "rb") as f:
+                f.seek(offset)
+                while left > 0:
+                    buf = f.read(min(block, left))
+                    if not buf:
+                        raise ValueError(f"truncated: {os.path.basename(p)}")
+                    out.write(buf)
+                    left -= len(buf)
+    return total // frame
+
+
+class StreamingWavWriter:
+    """
+    Write raw PCM16 chunks to a WAV file as they arrive.
+
+    Mono is up-mixed to stereo chunk by chunk; the header is written with a
+    zero length up front and patched on close(), so memory stays flat no
+    matter how long the narration is. Sample rate is passed through - only
+    use this when the source rate already matches the target.
+    """
+
+    def __init__(self, path: str, rate: int, src_channels: int = 1, target_channels: int = 2):
+        if src_channels not in (1, 2) or target_channels not in (1, 2):
+            raise ValueError("only mono/stereo PCM can be streamed")
+        self.path = path
+        self.rate = int(rate)
+        self.src_channels = src_channels
+        self.target_channels = target_channels
+        self.data_bytes = 0
+        self._carry = b""
+        self._f = open(path, "wb")
+        self._f.write(wav_header(0, self.rate, target_channels, 16))
+
+    def write(self, chunk: bytes) -> None:
+        buf = self._carry + chunk if self._carry else chunk
+        frame = 2 * self.src_channels
+        usable = len(buf) - (len(buf) % frame)
+        self._carry = buf[usable:]
+        if not usable:
+            return
+        samples = array("h")
+        samples.frombytes(buf[:usable])
+        if not _LITTLE:
+            samples.byteswap()
+        out = _remix(samples, self.src_channels, self.target_channels)
+        if not _LITTLE:
+            out.byteswap()
+        body = out.tobytes()
+        self._f.write(body)
+        self.data_bytes += len(body)
+
+    def close(self) -> None:
+        if self._f is None:
+            return
+        self._f.seek(0)
+        self._f.write(wav_header(self.data_bytes, self.rate, self.target_channels, 16))
+        self._f.close()
+        self._f = None
+
+    def abort(self) -> None:
+        """Close and delete a partial file (cancel / network error)."""
+        try:
+            if self._f is not None:
+                self._f.close()
+        finally:
+            self._f = None
+            try:
+                os.remove(self.path)
+            except Exception:
+                pass
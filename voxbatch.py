@@ -0,0 +1,242 @@
+"""
+voxbatch.py
+Multi-deck narration queue for Voxsmith.
+
+Narrates many decks (e.g. a course folder split by VoxPrep) as one job. All
+decks share:
+  - one pool of TTS workers sized to the ElevenLabs plan's concurrency cap,
+    so slides from different decks keep every slot busy;
+  - one HTTP session, so connections are reused across decks;
+  - one token-bucket request limiter, one AIMD concurrency controller and
+    one character budget, so the batch as a whole - not each deck - stays
+    inside the account's limits.
+
+Audio-only decks run side by side. Decks that attach audio go through
+PowerPoint one at a time on the calling thread, since COM automation of a
+single PowerPoint instance does not parallelize.
+"""
+import os
+import copy
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import voxtts
+import voxcore
+import voxmanifest
+
+DEFAULT_RATE_PER_SEC = 5.0
+DEFAULT_DECK_WORKERS = 2
+
+
+def find_decks(paths, recursive=False):
+    """Expand files and folders into a sorted, de-duplicated list of .pptx paths."""
+    out = []
+    for p in paths:
+        if os.path.isdir(p):
+            if recursive:
+                for dirpath, _dirs, files in os.walk(p):
+                    out.extend(os.path.join(dirpath, fn) for fn in files if _is_deck(fn))
+            else:
+                out.extend(os.path.join(p, fn) for fn in os.listdir(p) if _is_deck(fn))
+        else:
+            out.append(p)
+    seen = set()
+    decks = []
+    for d in sorted(os.path.abspath(x) for x in out):
+        if d not in seen:
+            seen.add(d)
+            decks.append(d)
+    return decks
+
+
+def _is_deck(name: str) -> bool:
+    # Skip PowerPoint's "~$deck.pptx" lock files
+    return name.lower().endswith(".pptx") and not name.startswith("~$")
+
+
+def output_dir_for(deck: str, out_root: str, batch=()) -> str:
+    """
+    Output folder for a deck: out_root for a single deck (empty batch), else
+    <out_root>/<deck name>. batch lists the batch's decks; a deck whose name
+    another one shares gets its path relative to the batch's common folder
+    instead (its path hash when there is none, e.g. across drives).
+    """
+    base = os.path.splitext(os.path.basename(deck))[0]
+    if not out_root:
+        return os.path.join(os.path.dirname(deck), f"{base}_audio")
+    if not batch:
+        return out_root
+    paths = [os.path.abspath(d) for d in batch]
+    key = os.path.normcase(base)
+    if sum(os.path.normcase(os.path.splitext(os.path.basename(p))[0]) == key for p in paths) < 2:
+        return os.path.join(out_root, base)
+    full = os.path.abspath(deck)
+    try:
+        rel = os.path.relpath(os.path.splitext(full)[0], os.path.commonpath(paths))
+    except ValueError:
+        return os.path.join(out_root, voxmanifest.deck_tag(full))
+    return os.path.join(out_root, rel)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, at most `burst` banked."""
+
+    def __init__(self, rate: float = DEFAULT_RATE_PER_SEC, burst: float = None, clock=time.monotonic):
+        self.rate = max(0.0, float(rate or 0))
+        self.burst = max(1.0, float(burst if burst is not None else max(1.0, self.rate)))
+        self._clock = clock
+        self._tokens = self.burst
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Take tokens if available; returns 0 on success, else seconds to wait."""
+        if self.rate <= 0:
+            return 0.0  # unlimited
+        with self._lock:
+            self._refill(self._clock())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0, cancel_event=None) -> bool:
+        """Block until tokens are granted. Returns False if cancelled while waiting."""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return True
+            if cancel_event is not None:
+                if cancel_event.wait(min(wait, 0.25)):
+                    return False
+            else:
+                time.sleep(min(wait, 0.25))
+
+
+class QuotaExceeded(Exception):
+    """Raised when a request would take the batch past its character budget."""
+
+
+class CharQuota:
+    """
+    Running total of characters sent for synthesis against an optional limit.
+
+    Characters are reserved before a request and refunded if it fails, so
+    concurrent workers never jointly overshoot the budget.
+    """
+
+    def __init__(self, limit: int = None):
+        self.limit = None if limit is None else max(0, int(limit))
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, chars: int) -> None:
+        with self._lock:
+            if self.limit is not None and self.used + chars > self.limit:
+                raise QuotaExceeded(f"character quota exhausted ({self.used:,} of {self.limit:,} used)")
+            self.used += chars
+
+    def refund(self, chars: int) -> None:
+        with self._lock:
+            self.used = max(0, self.used - chars)
+
+    def remaining(self):
+        with self._lock:
+            return None if self.limit is None else max(0, self.limit - self.used)
+
+
+def fetch_character_quota(session, api_key: str, timeout: float = 30):
+    """Characters left on the account this billing period, or None if unknown."""
+    try:
+        resp = session.get("https://api.elevenlabs.io/v1/user/subscription",
+                           headers={"xi-api-key": api_key}, timeout=timeout)
+        if resp.status_code != 200:
+            return None
+        data = resp.json()
+        return max(0, int(data["character_limit"]) - int(data["character_count"]))
+    except Exception:
+        return None
+
+
+class BatchQueue:
+    """
+    Collect decks with add(), then run() them against shared resources.
+
+    env is the NarrationEnv to share (session, settings, cache, folders); it
+    is copied, not modified. events_for(deck) returns the NarrationEvents for
+    each deck and may be called from worker threads.
+    """
+
+    def __init__(self, env, api_key: str, voice_id: str, concurrency=None,
+                 deck_workers: int = DEFAULT_DECK_WORKERS, rate_per_sec: float = DEFAULT_RATE_PER_SEC,
+                 char_budget: int = None, events_for=None):
+        self.env = env
+        self.api_key = api_key
+        self.voice_id = voice_id
+        if concurrency is None:
+            concurrency = env.settings.get("tts_concurrency", voxtts.DEFAULT_CONCURRENCY)
+        self.concurrency = voxtts.clamp_concurrency(concurrency)
+        self.deck_workers = max(1, int(deck_workers or 1))
+        self.limiter = TokenBucket(rate_per_sec, burst=self.concurrency)
+        self.quota = CharQuota(char_budget)
+        self.controller = voxtts.AdaptiveConcurrency(self.concurrency)
+        self.events_for = events_for or (lambda deck: voxcore.NarrationEvents())
+        self.jobs = []
+
+    def add(self, deck: str, output_dir: str, slide_range: str = "", audio_only: bool = True,
+            changed_only: bool = False) -> None:
+        self.jobs.append({"deck": deck, "output_dir": output_dir, "slide_range": slide_range,
+                          "audio_only": audio_only, "changed_only": changed_only})
+
+    def _run_one(self, job, env, cancel_event):
+        if cancel_event.is_set():
+            return {"status": voxcore.STATUS_CANCELLED, "deck": job["deck"], "selected": 0,
+                    "processed": 0, "failures": 0, "slides": {}}
+        return voxcore.run_narration(self.api_key, self.voice_id, job["deck"], job["output_dir"],
+                                     job["slide_range"], cancel_event, events=self.events_for(job["deck"]),
+                                     env=env, audio_only=job["audio_only"], changed_only=job["changed_only"])
+
+    def run(self, cancel_event=None, on_deck_done=None) -> list:
+        """
+        Narrate every queued deck; returns their summaries in add() order.
+
+        on_deck_done(summary) is called as each deck finishes (from the
+        thread that ran it).
+        """
+        cancel_event = cancel_event or threading.Event()
+        pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="voxtts")
+        env = copy.copy(self.env)
+        env.executor = pool
+        env.limiter = self.limiter
+        env.quota = self.quota
+        env.controller = self.controller
+        env.settings = dict(env.settings, tts_concurrency=self.concurrency)
+        results = [None] * len(self.jobs)
+
+        def finish(i, summary):
+            results[i] = summary
+            if on_deck_done is not None:
+                on_deck_done(summary)
+
+        def run_at(i):
+            finish(i, self._run_one(self.jobs[i], env, cancel_event))
+
+        audio = [i for i, j in enumerate(self.jobs) if j["audio_only"]]
+        attach = [i for i, j in enumerate(self.jobs) if not j["audio_only"]]
+        decks = ThreadPoolExecutor(max_workers=self.deck_workers, thread_name_prefix="voxbatch")
+        try:
+            futures = [decks.submit(run_at, i) for i in audio]
+            # PowerPoint decks go one at a time here while audio-only decks share the pool
+            for i in attach:
+                run_at(i)
+            for fut in futures:
+                fut.result()
+        finally:
+            decks.shutdown(wait=True)
+            pool.shutdown(wait=False, cancel_futures=True)
+        return results
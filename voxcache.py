@@ -0,0 +1,202 @@
+"""
+voxcache.py
+Content-addressed cache for ElevenLabs TTS audio.
+
+Audio is keyed on everything that changes what the API would return:
+normalized narration text, voice_id, voice_settings, output_format, model
+and (for chunks of a long note) the neighbouring text sent for stitching.
+A hit skips the HTTP call entirely. Entries are plain files under the
+settings dir; file mtime doubles as the LRU clock so the cache survives
+restarts without a separate index.
+
+The cache's total size is counted once per process and then kept up to
+date as entries are stored, so a store only walks the cache when it takes
+the total over budget. Eviction then trims to EVICT_TO_FRACTION of the
+budget, which leaves room for many stores before the next walk, and
+sweeps staging files left behind by crashed runs.
+"""
+import os
+import time
+import json
+import hashlib
+import threading
+import unicodedata
+import re
+
+DEFAULT_MAX_MB = 500
+EVICT_TO_FRACTION = 0.9     # eviction trims to this share of max_bytes
+STALE_TMP_SECONDS = 3600    # staging files older than this belong to a dead run
+_WS = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and unify Unicode forms so cosmetic edits still hit."""
+    t = unicodedata.normalize("NFC", text or "")
+    return _WS.sub(" ", t).strip()
+
+
+def cache_key(text: str, voice_id: str, voice_settings=None, output_format: str = "", model_id: str = "",
+              context=None) -> str:
+    """
+    Stable SHA-256 over the normalized request parameters.
+
+    context holds request-stitching text (previous_text / next_text) for a
+    chunk of a longer note; it changes the audio, so it is part of the key.
+    """
+    params = {
+        "text": normalize_text(text),
+        "voice_id": voice_id or "",
+        "voice_settings": voice_settings or {},
+        "output_format": output_format or "",
+        "model_id": model_id or "",
+    }
+    if context:
+        params["context"] = {k: normalize_text(v) for k, v in context.items() if v}
+    blob = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """
+    On-disk audio cache with size-based LRU eviction.
+
+    Safe to share between synthesis threads: files are written via
+    temp file + os.replace and counters are guarded by a lock.
+    """
+
+    def __init__(self, root: str, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max(0, int(max_bytes))
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._total = None  # bytes in the cache; counted on first store
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(self.root, exist_ok=True)
+        except Exception:
+            pass
+
+    def _path(self, key: str) -> str:
+        # Two-level fan-out keeps directory listings short on big caches
+        return os.path.join(self.root, key[:2], key + ".audio")
+
+    def contains(self, key: str) -> bool:
+        """Check for an entry without touching it or the counters."""
+        try:
+            return os.path.isfile(self._path(key))
+        except Exception:
+            return False
+
+    def get_path(self, key: str):
+        """Return the entry's file path (and refresh recency) so callers can stream it, or None on a miss."""
+        p = self._path(key)
+        try:
+            size = os.path.getsize(p)
+            try:
+                os.utime(p, None)
+            except Exception:
+                pass
+            with self._lock:
+                self.hits += 1
+                self.bytes_saved += size
+            return p
+        except Exception:
+            with self._lock:
+                self.misses += 1
+            return None
+
+    def staging_path(self, key: str):
+        """Temp path inside the cache to stream a download into; None when caching is off."""
+        if self.max_bytes == 0:
+            return None
+        p = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(p), exist_ok=True)
+        except Exception:
+            return None
+        return f"{p}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def put_file(self, key: str, staged: str) -> bool:
+        """Move a fully written staging file into place, then evict over budget."""
+        p = self._path(key)
+        try:
+            size = os.path.getsize(staged)
+            if size == 0:
+                raise ValueError("empty")
+            old = self._size_of(p)
+            os.replace(staged, p)
+        except Exception:
+            try:
+                os.remove(staged)
+            except Exception:
+                pass
+            return False
+        self._stored(size - old)
+        return True
+
+    @staticmethod
+    def _size_of(path: str) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _stored(self, delta: int) -> None:
+        """Count a store against the running total; evict once it is over budget."""
+        with self._lock:
+            if self._total is not None:
+                self._total += delta
+                if self._total <= self.max_bytes:
+                    return
+        self.evict()
+
+    def _entries(self, sweep_before=None):
+        """(mtime, size, path) of every entry; staging files older than sweep_before are deleted."""
+        out = []
+        for dirpath, _dirs, files in os.walk(self.root):
+            for fn in files:
+                fp = os.path.join(dirpath, fn)
+                if not fn.endswith(".audio"):
+                    if sweep_before is not None and fn.endswith(".tmp"):
+                        try:
+                            if os.stat(fp).st_mtime < sweep_before:
+                                os.remove(fp)
+                        except Exception:
+                            pass
+                    continue
+                try:
+                    st = os.stat(fp)
+                    out.append((st.st_mtime, st.st_size, fp))
+                except Exception:
+                    pass
+        return out
+
+    def evict(self) -> int:
+        """
+        Recount the cache and, when it is over max_bytes, drop the oldest
+        entries until it fits EVICT_TO_FRACTION of it. Also deletes staging
+        files older than STALE_TMP_SECONDS. Returns the count removed.
+        """
+        removed = 0
+        with self._lock:
+            entries = self._entries(sweep_before=time.time() - STALE_TMP_SECONDS)
+            total = sum(sz for _, sz, _ in entries)
+            if total > self.max_bytes:
+                target = int(self.max_bytes * EVICT_TO_FRACTION)
+                entries.sort()
+                for _mtime, sz, fp in entries:
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(fp)
+                        total -= sz
+                        removed += 1
+                    except Exception:
+                        pass
+            self._total = total
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "bytes_saved": self.bytes_saved}
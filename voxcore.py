@@ -0,0 +1,1369 @@
+"""
+voxcore.py
+GUI-free narration engine for Voxsmith.
+
+run_narration() takes a deck from notes to narrated slides: text extraction,
+TTS synthesis, audio conversion and (optionally) insertion into the deck -
+through PowerPoint, or straight into the .pptx with voxembed. It
+talks to its front end only through a NarrationEvents object, so the
+customtkinter app and the command-line runner (voxsmith_cli.py) share the
+same code path. Everything environmental - HTTP session, settings, log and
+cache folders - comes in through NarrationEnv.
+"""
+import os
+import re
+import sys
+import time
+import json
+import hashlib
+import logging
+import tempfile
+import traceback
+import subprocess
+
+import requests
+from pptx import Presentation
+
+import voxattach
+import voxanimate
+import voxtts
+import voxcache
+import voxmanifest
+import voxaudio
+import voxnet
+import voxlexicon
+import voxnotes
+import voxestimate
+import voxembed
+from voxnet import pretty_api_error
+from voxattach import SAVE_EVERY_SLIDES, SAVE_EVERY_SECONDS
+from voxsecurity.redaction import redact
+
+APP_DIR_NAME = "Voxsmith 2"
+
+TARGET_SAMPLE_RATE = "44100"
+TARGET_CODEC = "pcm_s16le"
+TARGET_CHANNELS = "2"
+
+# TTS request knobs (shared by the payload, cache key and deck manifest)
+# Raw PCM skips decoding entirely; plans without it fall back to "wav" per run.
+TTS_OUTPUT_FORMAT = "pcm_44100"
+TTS_VOICE_SETTINGS = {"stability": 0.5, "similarity_boost": 0.7}
+
+# Long notes: split into chunks of at most this many characters and synthesize
+# them in parallel (settings: tts_chunk_chars; 0 sends each note as one request)
+TTS_CHUNK_CHARS = 0
+
+# How audio is inserted (settings: insert_backend): "com" drives PowerPoint,
+# "xml" edits the .pptx directly (voxembed) and needs no Office install
+INSERT_BACKENDS = ("com", "xml")
+
+# Network hygiene defaults (1 initial + 2 retries, exponential backoff)
+NET_MAX_ATTEMPTS = 3
+NET_BACKOFF_BASE = 0.75
+NET_TIMEOUT = 120
+
+
+def get_settings_dir(app_name: str = APP_DIR_NAME) -> str:
+    if os.name == "nt":
+        base = os.getenv("APPDATA") or os.path.expanduser("~")
+        return os.path.join(base, app_name)
+    elif sys.platform == "darwin":
+        return os.path.expanduser(f"~/Library/Application Support/{app_name}")
+    else:
+        return os.path.expanduser(f"~/.config/{app_name}")
+
+def load_settings_file(settings_dir: str) -> dict:
+    try:
+        with open(os.path.join(settings_dir, "settings.json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+def sha256_file(p: str) -> str:
+    try:
+        with open(p, 'rb') as f:
+            h = hashlib.sha256()
+            for chunk in iter(lambda: f.read(8192), b''):
+                h.update(chunk)
+            return h.hexdigest()
+    except Exception:
+        return ""
+
+def ensure_local_ffmpeg_on_path():
+    try:
+        if getattr(sys, "frozen", False):
+            exe_dir = os.path.dirname(sys.executable)
+        else:
+            exe_dir = os.path.dirname(os.path.abspath(__file__))
+        local_ffmpeg_dir = os.path.join(exe_dir, "ffmpeg")
+        if os.path.isdir(local_ffmpeg_dir):
+            os.environ["PATH"] = local_ffmpeg_dir + os.pathsep + os.environ.get("PATH", "")
+    except Exception:
+        pass
+
+def write_target_wav(data: bytes, output_file: str, src_suffix: str = ".wav", pcm_rate=None) -> str:
+    """Write API audio to output_file as 44.1 kHz stereo PCM16.
+
+    Raw PCM (pcm_rate given) is wrapped in a WAV header and WAV is converted
+    in-process; anything else (MP3 etc.) goes through a temp file and ffmpeg.
+    Returns "inproc" or "ffmpeg".
+    """
+    if pcm_rate:
+        out = voxaudio.normalize_pcm16(data, pcm_rate, 1, int(TARGET_SAMPLE_RATE), int(TARGET_CHANNELS))
+    else:
+        out = voxaudio.normalize_wav_bytes(data, int(TARGET_SAMPLE_RATE), int(TARGET_CHANNELS))
+    if out is not None:
+        with open(output_file, "wb") as f:
+            f.write(out)
+        return "inproc"
+    with tempfile.NamedTemporaryFile(delete=False, suffix=src_suffix) as tmp:
+        tmp.write(data); tmp_path = tmp.name
+    try:
+        run_ffmpeg_quiet(["ffmpeg","-y","-i",tmp_path,"-acodec",TARGET_CODEC,"-ar",TARGET_SAMPLE_RATE,"-ac",TARGET_CHANNELS,output_file])
+    finally:
+        try:
+            os.remove(tmp_path)
+        except Exception:
+            pass
+    return "ffmpeg"
+
+def convert_file_to_target_wav(src_path: str, output_file: str, pcm_rate=None) -> str:
+    """File variant of write_target_wav; ffmpeg reads src_path directly when needed."""
+    with open(src_path, "rb") as f:
+        head = f.read(12)
+    if pcm_rate or voxaudio.is_wav(head):
+        with open(src_path, "rb") as f:
+            data = f.read()
+        if pcm_rate:
+            out = voxaudio.normalize_pcm16(data, pcm_rate, 1, int(TARGET_SAMPLE_RATE), int(TARGET_CHANNELS))
+        else:
+            out = voxaudio.normalize_wav_bytes(data, int(TARGET_SAMPLE_RATE), int(TARGET_CHANNELS))
+        del data
+        if out is not None:
+            with open(output_file, "wb") as f:
+                f.write(out)
+            return "inproc"
+    raw_input = ["-f", "s16le", "-ar", str(pcm_rate), "-ac", "1"] if pcm_rate else []
+    cp = run_ffmpeg_quiet(["ffmpeg","-y"] + raw_input + ["-i",src_path,"-acodec",TARGET_CODEC,"-ar",TARGET_SAMPLE_RATE,"-ac",TARGET_CHANNELS,output_file])
+    if cp.returncode != 0:
+        raise RuntimeError(f"ffmpeg conversion failed (exit {cp.returncode})")
+    return "ffmpeg"
+
+def needs_conversion(pcm_rate) -> bool:
+    """False when streamed audio is written as the final WAV (PCM at the target rate)."""
+    return pcm_rate != int(TARGET_SAMPLE_RATE)
+
+def finish_part_file(output_file: str, pcm_rate=None) -> str:
+    """Convert output_file + ".part" (left by a deferred stream) into output_file."""
+    part_path = output_file + ".part"
+    try:
+        return convert_file_to_target_wav(part_path, output_file, pcm_rate)
+    finally:
+        try:
+            os.remove(part_path)
+        except Exception:
+            pass
+
+def stream_audio_to_wav(chunks, output_file: str, pcm_rate=None, tee_path=None, cancel_event=None, defer_convert=False):
+    """Write streamed API audio to output_file as 44.1 kHz stereo PCM16.
+
+    PCM already at the target rate goes straight into output_file as chunks
+    arrive; anything else lands in output_file + ".part" and is converted once
+    complete (or left for finish_part_file() when defer_convert is set).
+    tee_path (a cache staging file) receives the raw bytes too.
+    Returns (bytes, md5_hex, sha256_hex) of the raw API audio.
+    """
+    direct = not needs_conversion(pcm_rate)
+    part_path = output_file + ".part"
+    writer = raw = tee = None
+    try:
+        sinks = []
+        if direct:
+            writer = voxaudio.StreamingWavWriter(output_file, pcm_rate, 1, int(TARGET_CHANNELS))
+            sinks.append(writer.write)
+        else:
+            raw = open(part_path, "wb")
+            sinks.append(raw.write)
+        if tee_path:
+            tee = open(tee_path, "wb")
+            sinks.append(tee.write)
+        result = voxtts.pump(chunks, sinks, cancel_event)
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        for fh, path in ((raw, part_path), (tee, tee_path)):
+            if fh is not None:
+                try:
+                    fh.close()
+                    os.remove(path)
+                except Exception:
+                    pass
+        raise
+    if writer is not None:
+        writer.close()
+    for fh in (raw, tee):
+        if fh is not None:
+            fh.close()
+    if not direct and not defer_convert:
+        finish_part_file(output_file, pcm_rate)
+    return result
+
+def run_hidden(cmd_list):
+    kwargs = dict(stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if os.name == "nt":
+        try:
+            kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
+        except AttributeError:
+            si = subprocess.STARTUPINFO(); si.dwFlags = subprocess.STARTF_USESHOWWINDOW
+            kwargs["startupinfo"] = si
+    return subprocess.run(cmd_list, **kwargs)
+
+def run_ffmpeg_quiet(cmd_list):
+    return run_hidden(cmd_list + ["-hide_banner", "-loglevel", "error"])
+
+def test_ffmpeg_available():
+    try:
+        cp = run_hidden(["ffmpeg", "-version"])
+        return cp.returncode == 0
+    except FileNotFoundError:
+        return False
+
+def select_slides(total: int, spec: str):
+    if not spec.strip():
+        return list(range(1, total + 1))
+    s = set()
+    for part in [p.strip() for p in spec.split(',') if p.strip()]:
+        if '-' in part:
+            a, b = part.split('-', 1)
+            try:
+                st = int(a) if a else 1
+            except Exception:
+                st = 1
+            try:
+                en = int(b) if b else total
+            except Exception:
+                en = total
+            st = max(1, st); en = min(total, en)
+            if st <= en:
+                s.update(range(st, en + 1))
+        else:
+            try:
+                n = int(part)
+                if 1 <= n <= total:
+                    s.add(n)
+            except Exception:
+                pass
+    return sorted(s)
+
+# ------------------------------------------------------------
+# Slide text extraction for "### Read Slide" marker
+# ------------------------------------------------------------
+
+def extract_slide_text(slide):
+    """
+    Extract text from a slide's shapes and text boxes (excluding title).
+    Returns text in natural reading order: top-to-bottom, left-to-right.
+    
+    Excludes:
+    - Title shapes (first shape with title placeholder)
+    - Grouped objects
+    - Tables
+    
+    Returns:
+        str: Extracted text with newlines between shapes
+    """
+    from pptx.enum.shapes import MSO_SHAPE_TYPE, PP_PLACEHOLDER
+    
+    text_items = []
+    
+    # Find the title placeholder to exclude it
+    title_shape_id = None
+    for shape in slide.shapes:
+        if shape.is_placeholder:
+            try:
+                if shape.placeholder_format.type == PP_PLACEHOLDER.TITLE:
+                    title_shape_id = shape.shape_id
+                    break
+            except:
+                pass
+    
+    # Collect text from shapes with their positions
+    for shape in slide.shapes:
+        # Skip title
+        if shape.shape_id == title_shape_id:
+            continue
+            
+        # Skip grouped objects (they're part of a group)
+        try:
+            if hasattr(shape, 'group_items'):
+                # This is a group shape itself - skip individual processing
+                continue
+        except:
+            pass
+        
+        # Skip tables
+        if shape.shape_type == MSO_SHAPE_TYPE.TABLE:
+            continue
+        
+        # Extract text from text frames (shapes and text boxes)
+        if shape.has_text_frame:
+            text = shape.text_frame.text.strip()
+            if text:
+                # Store with position for sorting
+                top = shape.top
+                left = shape.left
+                text_items.append((top, left, text))
+    
+    # Sort by position: top-to-bottom (primary), then left-to-right (secondary)
+    text_items.sort(key=lambda x: (x[0], x[1]))
+    
+    # Extract just the text in sorted order
+    extracted_text = '\n'.join(item[2] for item in text_items)
+    
+    return extracted_text
+
+
+class PptxNotes:
+    """python-pptx reader with the same interface as voxnotes.DeckNotes (the slow, fallback path)."""
+
+    def __init__(self, path: str):
+        self.prs = Presentation(path)
+
+    def __len__(self):
+        return len(self.prs.slides)
+
+    def notes_text(self, idx: int) -> str:
+        s = self.prs.slides[idx-1]
+        return s.notes_slide.notes_text_frame.text if s.notes_slide and s.notes_slide.notes_text_frame else ""
+
+    def slide_text(self, idx: int) -> str:
+        return extract_slide_text(self.prs.slides[idx-1])
+
+    def close(self) -> None:
+        self.prs = None
+
+
+def open_deck_notes(input_file, env, log, slide_range_spec=""):
+    """
+    Notes reader for a deck: the cached index, else the zip reader, else
+    python-pptx. The index only parses the slides slide_range_spec selects.
+    Raises only when python-pptx can't open the deck either.
+    """
+    settings = env.settings
+    if settings.get("fast_notes_reader", True):
+        try:
+            if settings.get("notes_index", True):
+                deck = voxnotes.load_index(input_file, env.notes_index_dir,
+                                           select=lambda total: select_slides(total, slide_range_spec or ""))
+                log(f"i Notes index: {deck.reparsed} of {len(deck)} slide(s) reparsed")
+                return deck
+            return voxnotes.DeckNotes(input_file)
+        except Exception as e:
+            log(f"! Fast notes reader failed ({e}); falling back to python-pptx")
+    return PptxNotes(input_file)
+
+
+READ_SLIDE_PATTERN = re.compile(r'###\s*read\s*slide', re.IGNORECASE)
+
+
+def resolve_notes(deck, sel, lexicon, log, cancel_event=None):
+    """
+    Final narration text for the selected slides: notes, "### Read Slide"
+    expanded, pronunciation dictionary applied (so hashes and cache keys
+    follow the rewrite).
+
+    Returns (jobs, empty): [(slide, text)] to narrate and the slides with
+    nothing to say.
+    """
+    if len(lexicon):
+        log(f"i Pronunciation dictionary: {len(lexicon)} rule(s)")
+    for _err in lexicon.errors:
+        log(f"! Pronunciation dictionary: {_err}")
+
+    jobs = []
+    empty = []
+    for idx in sel:
+        if cancel_event is not None and cancel_event.is_set():
+            break
+
+        try:
+            text = deck.notes_text(idx)
+        except Exception as e:
+            log(f"   Slide {idx:02d}: Error reading notes: {e}")
+            text = ""
+        note = (text or "").strip()
+
+        # Check for "### Read Slide" marker (case-insensitive)
+        if READ_SLIDE_PATTERN.search(note):
+            log(f"   Slide {idx:02d}: Detected '### Read Slide' marker - extracting slide text...")
+            try:
+                # Extract text from slide shapes (excluding title)
+                slide_text = deck.slide_text(idx)
+                if slide_text:
+                    # Replace the marker with extracted text (case-insensitive)
+                    note = READ_SLIDE_PATTERN.sub(slide_text, note)
+                    log(f"   Extracted {len(slide_text)} chars from slide")
+                else:
+                    log(f"   Warning: No text found on slide to extract")
+                    # Remove the marker so we don't generate audio for it
+                    note = READ_SLIDE_PATTERN.sub("", note).strip()
+            except Exception as e:
+                log(f"   Error extracting slide text: {e}")
+                # Continue with original notes (minus the marker)
+                note = READ_SLIDE_PATTERN.sub("", note).strip()
+
+        if note and len(lexicon):
+            note, _count = lexicon.apply(note)
+            if _count:
+                log(f"   Slide {idx:02d}: {_count} pronunciation replacement(s)")
+
+        if not note:
+            log(f"- Skipping slide {idx:02d}: No notes found.")
+            empty.append(idx)
+            continue
+
+        jobs.append((idx, note))
+    return jobs, empty
+
+
+def xml_animation_snapshots(input_file, slides, log) -> dict:
+    """
+    {slide: snapshot} read from the deck's slide XML (voxanimate.snapshot_from_timing_xml).
+    Slides that can't be read are left out, so they get a COM snapshot.
+    """
+    snapshots = {}
+    try:
+        deck = voxnotes.DeckNotes(input_file)
+    except Exception as e:
+        log(f"! Could not read animations from the deck file ({e}); using PowerPoint")
+        return snapshots
+    t0 = time.perf_counter()
+    with deck:
+        for idx in slides:
+            try:
+                snapshot = voxanimate.snapshot_from_timing_xml(deck.slide_xml(idx))
+            except Exception:
+                continue
+            if snapshot.get("error"):
+                continue
+            snapshots[idx] = snapshot
+            skip, reason = voxanimate.should_skip_audio_attachment(snapshot)
+            if skip:
+                log(f"i Slide {idx:02d}: audio will not be attached - {reason}")
+    pending = sum(1 for s in snapshots.values()
+                  if not s["complete"] and not voxanimate.should_skip_audio_attachment(s)[0])
+    log(f"i Animations read from slide XML for {len(snapshots)} slide(s) in "
+        f"{(time.perf_counter() - t0) * 1000:.0f} ms ({pending} need a PowerPoint snapshot)")
+    return snapshots
+
+
+def chunk_contexts(parts) -> list:
+    """Request-stitching context for each chunk of a split note: the text either side of it."""
+    return [{"previous_text": parts[n - 1] if n else None,
+             "next_text": parts[n + 1] if n + 1 < len(parts) else None}
+            for n in range(len(parts))]
+
+
+class NarrationEvents:
+    """
+    Front-end hooks for run_narration(). The defaults are headless: log lines
+    and progress are dropped, confirmations answer "no".
+    """
+
+    def log(self, msg: str) -> None:
+        pass
+
+    def progress(self, **event) -> None:
+        """Structured progress: evt="plan" once, then evt="slide" per slide."""
+        pass
+
+    def confirm(self, title: str, msg: str) -> bool:
+        return False
+
+    def info(self, title: str, msg: str) -> None:
+        pass
+
+    def error(self, title: str, msg: str) -> None:
+        pass
+
+
+class NarrationEnv:
+    """Everything run_narration() needs from its host besides the job itself."""
+
+    def __init__(self, session=None, settings=None, settings_dir=None, logs_dir=None, manifests_dir=None,
+                 tts_cache=None, net_timeout=NET_TIMEOUT, net_max_attempts=NET_MAX_ATTEMPTS,
+                 net_backoff_base=NET_BACKOFF_BASE, executor=None, limiter=None, quota=None, controller=None,
+                 lexicon=None):
+        self.settings_dir = settings_dir or get_settings_dir()
+        self.settings = settings if settings is not None else load_settings_file(self.settings_dir)
+        self.logs_dir = logs_dir or os.path.join(self.settings_dir, "logs")
+        self.manifests_dir = manifests_dir or os.path.join(self.settings_dir, "decks")
+        self.notes_index_dir = os.path.join(self.settings_dir, "notes_index")
+        if session is None:
+            session = voxnet.shared_session()
+        self.session = session
+        if tts_cache is None:
+            try:
+                mb = int(self.settings.get("tts_cache_mb", voxcache.DEFAULT_MAX_MB))
+            except Exception:
+                mb = voxcache.DEFAULT_MAX_MB
+            tts_cache = voxcache.TTSCache(os.path.join(self.settings_dir, "tts_cache"),
+                                          max_bytes=max(0, mb) * 1024 * 1024)
+        self.tts_cache = tts_cache
+        if lexicon is None:
+            lexicon = voxlexicon.load(voxlexicon.lexicon_path(self.settings_dir))
+        self.lexicon = lexicon
+        self.net_timeout = net_timeout
+        self.net_max_attempts = net_max_attempts
+        self.net_backoff_base = net_backoff_base
+        # Shared across decks by voxbatch.BatchQueue; None for a single run
+        self.executor = executor
+        self.limiter = limiter
+        self.quota = quota
+        self.controller = controller
+
+
+# Run statuses returned in the summary (and journaled): anything but
+# "complete" means some selected slide did not make it.
+STATUS_COMPLETE = "complete"
+STATUS_PARTIAL = "partial"
+STATUS_CANCELLED = "cancelled"
+STATUS_SAVE_FAILED = "save_failed"
+STATUS_FAILED = "failed"
+STATUS_INVALID = "invalid"
+
+
+def run_narration(api_key, voice_id, input_file, output_dir, slide_range_spec, cancel_event,
+                  events=None, env=None, audio_only=False, changed_only=False) -> dict:
+    """
+    Narrate the selected slides of one deck. Blocks until done.
+
+    Returns a summary dict: status (see STATUS_*), deck, selected,
+    processed, failures and slides ({slide: outcome}).
+    """
+    pp_app = None
+    pp_pres = None
+    embedder = None
+    events = events or NarrationEvents()
+    env = env or NarrationEnv()
+    log = events.log
+    settings = env.settings
+    summary = {"status": "failed", "deck": input_file, "selected": 0, "processed": 0, "failures": 0, "slides": {}}
+    processed = 0
+    failures = 0
+
+    deck_manifest = None
+    checkpoint = None
+    journal = None
+    run_status = "failed"
+
+    def slide_done(idx, status, **extra):
+        summary["slides"][idx] = status
+        events.progress(evt="slide", slide=idx, status=status, **extra)
+
+    try:
+        # Prepare session-scoped manifest path in app logs directory
+        try:
+            os.makedirs(env.logs_dir, exist_ok=True)
+        except Exception:
+            pass
+        # Tagged with the deck's path: same-named decks from different folders can run at once
+        session_ts = time.strftime('%Y%m%d_%H%M%S')
+        session_manifest = voxmanifest.SessionManifest(
+            os.path.join(env.logs_dir, f"{voxmanifest.deck_tag(input_file)}_{session_ts}_manifest.jsonl"))
+        if not api_key.strip():
+            run_status = "invalid"
+            log("X Missing API Key."); events.error("Error","Enter API Key."); return summary
+        if not voice_id.strip():
+            run_status = "invalid"
+            log("X Missing Voice selection."); events.error("Error","Choose a voice."); return summary
+        if not os.path.isfile(input_file):
+            run_status = "invalid"
+            log(f"X PowerPoint not found: {input_file}"); events.error("Error", f"PowerPoint not found:\n{input_file}"); return summary
+        # WAV is converted in-process; ffmpeg is only needed for compressed responses
+        if not test_ffmpeg_available():
+            log("i ffmpeg not found - only WAV audio can be converted.")
+
+        os.makedirs(output_dir, exist_ok=True)
+        fixed_dir = output_dir
+
+        log(f"i Deck: {input_file}")
+        log(f"i Output: {output_dir}")
+        log("i Loading slides...")
+
+        try:
+            deck = open_deck_notes(input_file, env, log, slide_range_spec)
+        except Exception as e:
+            log(f"X Failed to open PowerPoint: {e}"); events.error("Error", f"Failed to open PowerPoint:\n{e}"); return summary
+
+        total = len(deck)
+        sel = select_slides(total, slide_range_spec or "")
+        log(f"OK Loaded {total} slide(s). Will process: {sel if sel else 'none'}")
+        summary["selected"] = len(sel)
+        if not sel:
+            deck.close()
+            run_status = "invalid"
+            events.info("No slides selected","Your slide range selected no slides.")
+            return summary
+
+        jobs, empty = resolve_notes(deck, sel, env.lexicon, log, cancel_event)
+        deck.close()
+        for idx in empty:
+            slide_done(idx, "no_notes")
+        processed += len(empty)
+
+        # Changed-only mode: drop slides whose text, voice and settings match the deck manifest
+        out_format = str(settings.get("tts_output_format", TTS_OUTPUT_FORMAT) or TTS_OUTPUT_FORMAT).lower()
+        settings_hash = voxmanifest.settings_sha256(TTS_VOICE_SETTINGS, out_format)
+        deck_manifest = voxmanifest.DeckManifest.load(
+            voxmanifest.deck_manifest_path(env.manifests_dir, input_file), input_file)
+        unsaved = deck_manifest.unsaved()
+        if unsaved:
+            log(f"i Last run inserted but never saved slide(s): {unsaved}")
+        if changed_only and jobs:
+            changed = [(i, n) for i, n in jobs if not deck_manifest.is_current(
+                i, voxmanifest.text_sha256(n), voice_id, settings_hash,
+                os.path.join(fixed_dir, f"slide{i:02d}.wav"), need_inserted=not audio_only)]
+            log(f"i Changed-only mode: {len(changed)} of {len(jobs)} slide(s) changed")
+            for i in sorted(set(i for i, _ in jobs) - set(i for i, _ in changed)):
+                slide_done(i, "unchanged")
+            processed += len(jobs) - len(changed)
+            jobs = changed
+            if not jobs:
+                run_status = "complete"
+                events.info("Nothing to do", "All selected slides are up to date.")
+                return summary
+
+        # Resume: an interrupted run's journal tells us which slides already finished
+        journal_file = voxmanifest.journal_path(env.logs_dir, input_file)
+        last_run = voxmanifest.load_last_run(journal_file)
+        resumed_done = []
+        reuse = {}
+        if jobs and last_run and last_run.get("status") != "complete":
+            remaining, done, ready = voxmanifest.resume_plan(
+                last_run, jobs, voice_id=voice_id, settings_hash=settings_hash, audio_only=audio_only,
+                wav_path_for=lambda i: os.path.join(fixed_dir, f"slide{i:02d}.wav"), file_sha256=sha256_file)
+            if done or ready:
+                first = remaining[0][0] if remaining else None
+                prompt = (f"The previous run on this deck did not finish.\n\n"
+                          f"{len(done)} slide(s) are already done and {len(ready)} have audio ready to insert.\n\n"
+                          + (f"Resume from slide {first}?" if first else "Skip the finished slides?"))
+                if events.confirm("Resume previous run", prompt):
+                    log(f"i Resuming: {len(done)} slide(s) done, {len(ready)} reusing audio on disk")
+                    processed += len(done)
+                    for i in done:
+                        slide_done(i, "resumed")
+                    resumed_done = [(i, last_run["slides"][i]) for i in done]
+                    jobs, reuse = remaining, ready
+                    if not jobs:
+                        run_status = "complete"
+                        events.info("Nothing to do", "All selected slides were finished by the previous run.")
+                        return summary
+        job_slides = [i for i, _ in jobs]
+        events.progress(evt="plan", deck=input_file, selected=len(sel), jobs=len(job_slides))
+
+        # Append-only progress journal; carries finished slides forward so a second interruption still resumes
+        journal = voxmanifest.RunJournal(journal_file, session_ts)
+        journal.begin(input_file, job_slides, audio_only)
+        for i, rec in resumed_done:
+            journal.slide(i, rec.get("state"), **{k: v for k, v in rec.items()
+                                                  if k not in ("evt", "run", "ts", "slide", "state")})
+
+        # Deck save policy: every N slides or T seconds, plus a final save
+        _s = settings
+        checkpoint = voxattach.SaveCheckpoint(every_slides=_s.get("save_every_slides", SAVE_EVERY_SLIDES),
+                                              every_seconds=_s.get("save_every_seconds", SAVE_EVERY_SECONDS))
+
+        backend = str(settings.get("insert_backend", "com") or "com").lower()
+        if backend not in INSERT_BACKENDS:
+            log(f"! Unknown insert_backend '{backend}' - using PowerPoint")
+            backend = "com"
+
+        # Animations are read from the slide XML first: text-animation skips are decided before
+        # PowerPoint starts, and only slides the XML can't fully describe get a COM snapshot below
+        animation_snapshots = {}
+        if not audio_only and backend == "com" and settings.get("animation_snapshot", "xml") == "xml":
+            animation_snapshots = xml_animation_snapshots(input_file, job_slides, log)
+
+        # Skip PowerPoint operations in audio-only mode
+        if audio_only:
+            log("i Audio-only mode: skipping PowerPoint operations")
+        elif backend == "xml":
+            # Effects stay in the slide XML untouched, so there is nothing to snapshot or restore
+            try:
+                embedder = voxembed.PptxAudioEmbedder(input_file)
+            except Exception as e:
+                log(f"X Failed to open deck for offline insertion: {e}")
+                events.error("Error", f"Failed to open deck for offline insertion:\n{e}")
+                return summary
+            # Each save rewrites the whole file, so save once at the end; a crash leaves
+            # the WAVs on disk and the resume plan re-inserts them without the API
+            checkpoint = voxattach.SaveCheckpoint(every_slides=0, every_seconds=0)
+            log("i Offline insertion: audio is written into the .pptx directly (PowerPoint not used)")
+        else:
+            # Open PowerPoint via COM for animation handling
+            log("i Opening PowerPoint for animation preservation...")
+            try:
+                from win32com.client import Dispatch, GetActiveObject
+                # gencache removed - causes issues in frozen exe
+
+                # Try to get existing PowerPoint instance first
+                pp_app = None
+                try:
+                    pp_app = GetActiveObject("PowerPoint.Application")
+                    log("  Using existing PowerPoint instance")
+                except:
+                    # No existing instance found
+                    pass
+
+                # If no existing instance, create new one
+                if not pp_app:
+                    pp_app = Dispatch("PowerPoint.Application")
+                    pp_app.Visible = True
+                    log("  Created new PowerPoint instance")
+                else:
+                    pp_app.Visible = True
+
+                # Check if deck is already open
+                abs_path = os.path.abspath(input_file)
+                pp_pres = None
+
+                log(f"  Looking for deck: {os.path.basename(abs_path)}")
+                log(f"  Currently open presentations: {pp_app.Presentations.Count}")
+
+                for pres in pp_app.Presentations:
+                    try:
+                        pres_path = os.path.abspath(pres.FullName)
+                        log(f"  Checking: {os.path.basename(pres_path)}")
+                        if pres_path.lower() == abs_path.lower():
+                            pp_pres = pres
+                            log("  Found: Deck already open, reusing")
+                            if animation_snapshots and not pp_pres.Saved:
+                                # The file on disk is behind what PowerPoint has in memory
+                                log("  Deck has unsaved changes - reading animations over COM instead")
+                                animation_snapshots = {}
+                            break
+                    except Exception as e:
+                        log(f"  Error checking presentation: {e}")
+                        continue
+
+                # If not open, open it
+                if not pp_pres:
+                    log(f"  Opening deck: {os.path.basename(abs_path)}")
+                    try:
+                        pp_pres = pp_app.Presentations.Open(abs_path, WithWindow=True)
+                        log("  Deck opened successfully")
+                    except Exception as e:
+                        log(f"  Failed to open deck: {e}")
+                        raise
+
+                if not pp_pres:
+                    raise RuntimeError("Deck failed to open (pp_pres is None)")
+
+                log("OK PowerPoint ready for animation preservation")
+            except Exception as e:
+                log(f"X Failed to open PowerPoint via COM: {e}")
+                events.error("Error", f"Failed to open PowerPoint for animation handling:\n{e}")
+                return summary
+
+            # BATCH SNAPSHOT: Backup animations for all selected slides upfront
+            log("i Backing up animations for selected slides...")
+            snapshot_stats = voxanimate.ComStats()
+
+            for idx in job_slides:
+                if cancel_event.is_set():
+                    break
+                xml_snapshot = animation_snapshots.get(idx)
+                if xml_snapshot is not None and (xml_snapshot.get("complete")
+                                                 or voxanimate.should_skip_audio_attachment(xml_snapshot)[0]):
+                    continue  # restorable as read from XML, or the slide won't be attached at all
+                try:
+                    slide = pp_pres.Slides(idx)
+
+                    # Clean up orphaned effects first
+                    voxanimate.cleanup_orphaned_audio_effects(slide)
+
+                    # Snapshot the animation state
+                    slide_stats = voxanimate.ComStats()
+                    snapshot = voxanimate.snapshot_slide_animations(slide, slide_stats)
+                    snapshot_stats.add(slide_stats)
+                    animation_snapshots[idx] = snapshot
+
+                    if snapshot.get("effects"):
+                        log(f"  Slide {idx:02d}: {len(snapshot['effects'])} animations backed up "
+                            f"({slide_stats.calls} COM calls, {slide_stats.seconds * 1000:.0f} ms)")
+                    else:
+                        log(f"  Slide {idx:02d}: No animations")
+
+                except Exception as e:
+                    log(f"  Slide {idx:02d}: Backup failed - {e}")
+                    animation_snapshots[idx] = None
+
+            logging.getLogger("voxsmith").info(redact(f"ANIM_SNAPSHOT {snapshot_stats.summary()}"))
+            log("OK Animation backup complete\n")
+
+        # "diff" adds only the audio effect and rebuilds a timeline only when the insert scrambled it;
+        # "rebuild" always deletes and re-creates every effect
+        restore_mode = str(settings.get("animation_restore", "diff") or "diff").lower()
+        restore_stats = voxanimate.ComStats()
+        restore_outcomes = {}
+
+        url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
+        h = {"xi-api-key": api_key, "Content-Type": "application/json"}
+
+        # Synthesize on a bounded pool; results come back in slide order
+        concurrency = voxtts.clamp_concurrency(settings.get("tts_concurrency", voxtts.DEFAULT_CONCURRENCY))
+        if jobs:
+            log(f"i Synthesizing {len(jobs)} slide(s), up to {concurrency} at a time")
+        # One kept-alive connection per worker, so slides after the first skip the TCP+TLS handshake
+        voxnet.ensure_pool_size(env.session, concurrency)
+        conn_before = voxnet.connection_stats(env.session)
+
+        tts_cache = env.tts_cache
+        # AIMD limit under the pool size: 429s narrow it for every worker, successes widen it
+        controller = env.controller or voxtts.AdaptiveConcurrency(concurrency)
+        stage_timer = voxtts.StageTimer()
+        run_t0 = time.perf_counter()
+
+        # Streaming endpoint: first bytes arrive while the rest is still being generated
+        stream_url = url + "/stream"
+
+        # Raw PCM is requested via query string; flips off for the run if the plan rejects it
+        pcm_state = {"allowed": voxtts.pcm_rate(out_format) is not None}
+
+        try:
+            chunk_chars = max(0, int(settings.get("tts_chunk_chars", TTS_CHUNK_CHARS) or 0))
+        except Exception:
+            chunk_chars = TTS_CHUNK_CHARS
+
+        def fetch(_note, _fmt, _fixed_path, _context=None, _defer=True):
+            _payload = {"text": _note, "voice_settings": dict(TTS_VOICE_SETTINGS)}
+            _params = None
+            if voxtts.pcm_rate(_fmt):
+                _params = {"output_format": _fmt}
+            else:
+                _payload["output_format"] = _fmt
+            # Request stitching: neighbouring chunk text keeps intonation continuous across the joins
+            _context = {k: v for k, v in (_context or {}).items() if v}
+            _payload.update(_context)
+            _key = voxcache.cache_key(_note, voice_id, TTS_VOICE_SETTINGS, _fmt, context=_context)
+            out = {"resp": None, "attempts": 0, "ok": False, "cache_hit": False,
+                   "output_format": _fmt, "fallback": False, "bytes": 0, "md5": "", "sha256": ""}
+            _staged = None
+            _held = False
+            _cached = tts_cache.get_path(_key)
+            try:
+                if _cached is not None:
+                    out["cache_hit"] = True
+                    _chunks = voxtts.iter_file(_cached)
+                else:
+                    # Batch runs share one request rate limiter and character budget across decks
+                    if env.quota is not None:
+                        env.quota.reserve(len(_note))
+                    try:
+                        if env.limiter is not None:
+                            env.limiter.acquire(cancel_event=cancel_event)
+                        # The API counts a request as concurrent until its audio is fully streamed
+                        controller.acquire(cancel_event)
+                        _held = True
+                        _t_req = time.perf_counter()
+                        _resp, _attempts = voxtts.synthesize(env.session, stream_url, h, _payload, timeout=env.net_timeout,
+                                                             max_attempts=env.net_max_attempts, backoff_base=env.net_backoff_base,
+                                                             cancel_event=cancel_event, params=_params, stream=True,
+                                                             controller=controller)
+                    except BaseException:
+                        if env.quota is not None:
+                            env.quota.refund(len(_note))
+                        raise
+                    out.update(resp=_resp, attempts=_attempts)
+                    if _resp.status_code != 200:
+                        if env.quota is not None:
+                            env.quota.refund(len(_note))
+                        return out
+                    _chunks = _resp.iter_content(voxtts.STREAM_CHUNK)
+                    _staged = tts_cache.staging_path(_key)
+                # Stream to slideNN.wav (and the cache) while hashing; memory stays flat
+                try:
+                    n, md5_hex, sha_hex = stream_audio_to_wav(_chunks, _fixed_path, voxtts.pcm_rate(_fmt),
+                                                              tee_path=_staged, cancel_event=cancel_event,
+                                                              defer_convert=_defer)
+                finally:
+                    if out["resp"] is not None:
+                        out["resp"].close()
+            finally:
+                if _held:
+                    controller.release()
+            if _staged:
+                tts_cache.put_file(_key, _staged)
+            if out["resp"] is not None:
+                # Per-character latency history for estimate_narration()
+                _ms = int((time.perf_counter() - _t_req) * 1000)
+                voxnet.log_tts(stream_url, len(_note), _ms, n,
+                               verbose=getattr(env.session, "voxnet_verbose", False),
+                               app_version=getattr(env.session, "voxnet_app_version", "v?"))
+                voxestimate.record_sample(env.logs_dir, len(_note), _ms)
+            out.update(ok=True, bytes=n, md5=md5_hex, sha256=sha_hex)
+            return out
+
+        def fetch_chunked(_parts, _fmt, _fixed_path):
+            # Chunks go out in parallel (each still takes an AIMD slot), are converted to the
+            # target WAV as they land, then joined frame for frame into slideNN.wav
+            _paths = [f"{_fixed_path}.c{_n:02d}.wav" for _n in range(len(_parts))]
+            _jobs = list(enumerate(chunk_contexts(_parts)))
+            _outs = []
+            _err = None
+            try:
+                # Drain every chunk before cleaning up, so none is still writing its file
+                for _job, _o, _e in voxtts.ordered_map(
+                        lambda j: fetch(_parts[j[0]], _fmt, _paths[j[0]], j[1], _defer=False),
+                        _jobs, min(concurrency, len(_parts)), cancel_event):
+                    if _e is not None:
+                        _err = _err or _e
+                    else:
+                        _outs.append(_o)
+                if _err is not None:
+                    raise _err
+                if len(_outs) < len(_parts):
+                    raise voxtts.Cancelled()
+                out = {"resp": None, "attempts": sum(o["attempts"] for o in _outs), "ok": True,
+                       "cache_hit": all(o["cache_hit"] for o in _outs), "output_format": _fmt,
+                       "fallback": False, "chunks": len(_parts), "bytes": sum(o["bytes"] for o in _outs)}
+                _failed = next((o for o in _outs if not o["ok"]), None)
+                if _failed is not None:
+                    out.update(resp=_failed["resp"], ok=False)
+                    return out
+                voxaudio.concat_wavs(_paths, _fixed_path)
+                _n, out["md5"], out["sha256"] = voxtts.pump(voxtts.iter_file(_fixed_path), [])
+                return out
+            finally:
+                for _p in _paths:
+                    try:
+                        os.remove(_p)
+                    except Exception:
+                        pass
+
+        def jfields(_note):
+            return {"text_sha256": voxmanifest.text_sha256(_note), "voice_id": voice_id,
+                    "settings_sha256": settings_hash}
+
+        def synth(job):
+            # Stage 1 (pool): network fetch, streamed to disk
+            _idx, _note = job
+            _t0 = time.perf_counter()
+            _fixed_path = os.path.join(fixed_dir, f"slide{_idx:02d}.wav")
+            _prev = reuse.get(_idx)
+            if _prev is not None:
+                # Final WAV from the interrupted run is on disk and its hash checked out
+                out = {"resp": None, "attempts": 0, "ok": True, "cache_hit": False, "reused": True,
+                       "output_format": _prev.get("output_format", out_format), "fallback": False,
+                       "bytes": _prev.get("bytes", 0), "md5": _prev.get("md5", ""),
+                       "sha256": _prev.get("sha256", ""), "wav_sha256": _prev.get("wav_sha256", ""),
+                       "fetch_s": 0.0}
+                journal.slide(_idx, voxmanifest.J_SYNTHESIZED, output_format=out["output_format"],
+                              bytes=out["bytes"], md5=out["md5"], sha256=out["sha256"], **jfields(_note))
+                return out
+            _parts = voxtts.chunk_text(_note, chunk_chars)
+            if len(_parts) > 1:
+                _fetch = lambda _fmt: fetch_chunked(_parts, _fmt, _fixed_path)
+            else:
+                _fetch = lambda _fmt: fetch(_note, _fmt, _fixed_path)
+            if not pcm_state["allowed"]:
+                out = _fetch(voxtts.LEGACY_FORMAT)
+            else:
+                out = _fetch(out_format)
+                if not out["ok"] and voxtts.is_format_not_allowed(out["resp"]):
+                    pcm_state["allowed"] = False
+                    out = _fetch(voxtts.LEGACY_FORMAT)
+                    out["fallback"] = True
+            out["fetch_s"] = time.perf_counter() - _t0
+            stage_timer.add("fetch", out["fetch_s"])
+            if out["ok"]:
+                journal.slide(_idx, voxmanifest.J_SYNTHESIZED, output_format=out["output_format"],
+                              bytes=out["bytes"], md5=out["md5"], sha256=out["sha256"], **jfields(_note))
+            return out
+
+        def convert(job, out):
+            # Stage 2 (one thread): audio conversion for anything not streamed as final WAV
+            _idx, _note = job
+            _t0 = time.perf_counter()
+            _fixed_path = os.path.join(fixed_dir, f"slide{_idx:02d}.wav")
+            if out["ok"] and not out.get("reused"):
+                if not out.get("chunks") and needs_conversion(voxtts.pcm_rate(out["output_format"])):
+                    finish_part_file(_fixed_path, voxtts.pcm_rate(out["output_format"]))
+                out["wav_sha256"] = sha256_file(_fixed_path)
+            if out["ok"]:
+                journal.slide(_idx, voxmanifest.J_CONVERTED, wav_sha256=out["wav_sha256"], **jfields(_note))
+            out["convert_s"] = time.perf_counter() - _t0
+            stage_timer.add("convert", out["convert_s"])
+            return out
+
+        # Stage 3 (this thread, owns PowerPoint): audio insertion + animation restoration
+        for (idx, note), result, err in voxtts.pipeline(jobs, synth, convert, concurrency, cancel_event,
+                                                        executor=env.executor):
+            if cancel_event.is_set():
+                break
+            insert_t0 = time.perf_counter()
+
+            log(f"> Generating slide {idx:02d}...")
+            txt_hash = hashlib.sha256(note.encode("utf-8", "ignore")).hexdigest()[:8]
+            log(f"   text#={txt_hash}")
+
+            if err is not None:
+                if isinstance(err, FileNotFoundError):
+                    log(f"X Slide {idx:02d}: audio needs ffmpeg, which was not found")
+                elif isinstance(err, requests.RequestException):
+                    log(f" X Network error on slide {idx:02d}: {err}")
+                else:
+                    log(f"X Slide {idx:02d} synthesis error: {err}")
+                slide_done(idx, "error", error=str(err))
+                failures += 1
+                processed += 1
+                continue
+            resp, attempts, cache_hit = result["resp"], result["attempts"], result["cache_hit"]
+            if result["fallback"]:
+                log(f"i {out_format} not available on this plan - using {voxtts.LEGACY_FORMAT}")
+            if result.get("chunks"):
+                log(f"   long note - synthesized as {result['chunks']} chunks")
+            if cache_hit:
+                log(f"   cache hit - skipped API call")
+            if result.get("reused"):
+                log(f"   resumed - reusing audio from the interrupted run")
+
+            if result["ok"]:
+                name = f"slide{idx:02d}.wav"
+                fixed_path = os.path.join(fixed_dir, name)
+
+                wav_md5 = result["md5"][:8]
+                log(f"   wav#={wav_md5}")
+                log(f"   fetch={result.get('fetch_s', 0.0):.2f}s convert={result.get('convert_s', 0.0):.2f}s")
+
+                # Save to manifest (one appended line; running hash chain in .sha256)
+                try:
+                    _mhead = session_manifest.append({'slide': idx, 'voice_id': voice_id, 'text_sha256': txt_hash, 'wav_md5': wav_md5, 'wav_sha256': result['sha256'], 'bytes': result['bytes'], 'attempts': attempts, 'http_status': getattr(resp, 'status_code', None), 'cache_hit': cache_hit, 'output_format': result['output_format']})
+                    logger = logging.getLogger('voxsmith')
+                    logger.info(redact(f'MANIFEST chain={_mhead} file={os.path.basename(session_manifest.path)}'))
+                except Exception:
+                    pass
+
+                log(f" i Converted -> {name}")
+
+                # Skip attachment if audio_only mode is enabled
+                if audio_only:
+                    log(f"i Audio-only mode: saved to {name}")
+                    deck_manifest.record(idx, text_hash=voxmanifest.text_sha256(note), voice_id=voice_id,
+                                         settings_hash=settings_hash, output_file=fixed_path,
+                                         state=voxmanifest.STATE_AUDIO, wav_sha256=result['sha256'])
+                    slide_done(idx, "audio", file=fixed_path, cache_hit=cache_hit)
+                    processed += 1
+                    continue
+
+                # Check if this slide has text animations - if so, skip attachment
+                snapshot = animation_snapshots.get(idx)
+                if snapshot:
+                    should_skip, skip_reason = voxanimate.should_skip_audio_attachment(snapshot)
+                    if should_skip:
+                        log(f"i Skipping attachment to slide {idx:02d} due to animation backup limitations")
+                        log(f"i {skip_reason}")
+                        log(f"i Audio saved to {name} - attach manually to preserve animations")
+                        deck_manifest.record(idx, text_hash=voxmanifest.text_sha256(note), voice_id=voice_id,
+                                             settings_hash=settings_hash, output_file=fixed_path,
+                                             state=voxmanifest.STATE_SKIPPED_ATTACH, wav_sha256=result['sha256'])
+                        journal.slide(idx, voxmanifest.J_SKIPPED_ATTACH)
+                        slide_done(idx, "skipped_attach", file=fixed_path, cache_hit=cache_hit)
+                        processed += 1
+                        continue
+
+
+                # INSERT AUDIO + RESTORE ANIMATIONS
+                log(f"> Inserting audio into slide {idx:02d}...")
+
+                try:
+                    if embedder is not None:
+                        placed = embedder.attach(idx, fixed_path)
+                        if placed["replaced"]:
+                            log(f"  Replaced {placed['replaced']} earlier narration shape(s)")
+                        log(f"  OK Audio placed first on the timeline ({placed['duration_ms'] / 1000:.1f}s)")
+                    else:
+                        slide = pp_pres.Slides(idx)
+
+                        # Remove existing VOX audio shapes
+                        voxattach._delete_existing_vox_audio(slide)
+
+                        # Diff restore keeps the timeline and checks it afterwards; the full
+                        # restore (or no snapshot at all) starts from an empty one
+                        snapshot = animation_snapshots.get(idx)
+                        diff_restore = restore_mode == "diff" and snapshot is not None
+
+                        # CRITICAL: Clear animation timeline BEFORE inserting audio
+                        # Inserting audio into an animated slide scrambles existing animations
+                        if not diff_restore:
+                            log(f"  Clearing animation timeline before audio insertion...")
+                            try:
+                                seq = slide.TimeLine.MainSequence
+                                while seq.Count > 0:
+                                    try:
+                                        seq.Item(1).Delete()
+                                    except:
+                                        break
+                            except Exception:
+                                pass
+
+                        # Insert new audio shape WITHOUT auto-creating animation
+                        # AddMediaObject (not AddMediaObject2) gives us more control
+                        audio_path_abs = os.path.abspath(fixed_path)
+
+                        try:
+                            # Try AddMediaObject first (doesn't auto-animate)
+                            audio_shape = slide.Shapes.AddMediaObject(audio_path_abs, False, True, 0, 0)
+                        except:
+                            # Fall back to AddMediaObject2 if AddMediaObject not available
+                            audio_shape = slide.Shapes.AddMediaObject2(audio_path_abs, False, True, 0, 0)
+
+                        # Configure audio shape appearance and position
+                        try:
+                            audio_shape.Width = 32
+                            audio_shape.Height = 32
+                            W = pp_pres.PageSetup.SlideWidth
+                            H = pp_pres.PageSetup.SlideHeight
+                            audio_shape.Left = W + 5  # Off-slide to the right
+                            audio_shape.Top = H - audio_shape.Height - 5  # Bottom aligned
+                            audio_shape.AlternativeText = "VOX_VO"
+
+                            # Disable interactive triggers/click actions
+                            try:
+                                audio_shape.ActionSettings[1].Action = 0  # ppActionNone
+                            except:
+                                pass
+                        except Exception:
+                            pass
+
+                        # RESTORE ANIMATIONS from snapshot
+                        if diff_restore:
+                            effect_count = len(snapshot.get("effects", []))
+                            outcome = voxanimate.insert_audio_effect(slide, snapshot, audio_shape, restore_stats)
+                            restore_outcomes[outcome] = restore_outcomes.get(outcome, 0) + 1
+                            if outcome == "kept":
+                                log(f"  OK Audio effect added; {effect_count} animation(s) verified unchanged")
+                            elif outcome == "rebuilt":
+                                log(f"  OK Timeline changed on insert - rebuilt {effect_count} animation(s)")
+                            else:
+                                log(f"  ! Animation restoration had issues")
+                        elif snapshot is not None:
+                            # Always call restore - it handles both cases:
+                            # 1. If snapshot has effects: restores them with audio at position 1
+                            # 2. If snapshot is empty: just adds audio effect
+                            log(f"  Restoring animations...")
+                            success = voxanimate.restore_slide_animations(slide, snapshot, audio_shape)
+                            if success:
+                                effect_count = len(snapshot.get("effects", []))
+                                if effect_count > 0:
+                                    log(f"  OK Restored {effect_count} animations")
+                                else:
+                                    log(f"  OK Audio inserted (no animations to restore)")
+                            else:
+                                log(f"  ! Animation restoration had issues")
+                        else:
+                            # Snapshot failed, fall back to basic audio setup
+                            voxattach._configure_play_settings(audio_shape, hide=True)
+                            voxattach._append_media_play_after_previous(slide, audio_shape)
+                            log(f"  ! Snapshot unavailable, basic audio setup used")
+
+                    # Record as inserted-but-unsaved, then save per checkpoint policy
+                    deck_manifest.record(idx, text_hash=voxmanifest.text_sha256(note), voice_id=voice_id,
+                                         settings_hash=settings_hash, output_file=fixed_path,
+                                         state=voxmanifest.STATE_INSERTED_UNSAVED, wav_sha256=result['sha256'])
+                    journal.slide(idx, voxmanifest.J_INSERTED)
+                    checkpoint.mark(idx)
+                    saved = checkpoint.maybe_save(pp_pres or embedder)
+                    if saved:
+                        deck_manifest.mark_saved(saved)
+                        for i in saved:
+                            journal.slide(i, voxmanifest.J_SAVED)
+                        log(f"i Checkpoint: deck saved ({len(saved)} slide(s))")
+                    deck_manifest.save()
+                    log(f"OK Slide {idx:02d} complete")
+                    slide_done(idx, "inserted", file=fixed_path, cache_hit=cache_hit)
+
+                except Exception as e:
+                    log(f"X Slide {idx:02d} insertion error: {e}")
+                    slide_done(idx, "error", error=str(e))
+                    failures += 1
+                stage_timer.add("insert", time.perf_counter() - insert_t0)
+
+            else:
+                msg = pretty_api_error(resp)
+                log(f" X API error slide {idx:02d}: {msg}")
+                slide_done(idx, "error", error=msg)
+                failures += 1
+
+            processed += 1
+
+        if cancel_event.is_set():
+            log("i Run cancelled by user.")
+            run_status = "cancelled"
+        else:
+            run_status = "partial" if failures else "complete"
+
+        try:
+            log(f"i Stage time: {stage_timer.summary()} (wall {time.perf_counter() - run_t0:.1f}s)")
+            logging.getLogger("voxsmith").info(redact(f"PIPELINE {stage_timer.summary()} wall={time.perf_counter() - run_t0:.1f}s"))
+        except Exception:
+            pass
+
+        if restore_outcomes:
+            log(f"i Animations: {restore_outcomes.get('kept', 0)} slide(s) kept as is, "
+                f"{restore_outcomes.get('rebuilt', 0)} rebuilt")
+            logging.getLogger("voxsmith").info(redact(
+                f"ANIM_RESTORE kept={restore_outcomes.get('kept', 0)} rebuilt={restore_outcomes.get('rebuilt', 0)} "
+                f"failed={restore_outcomes.get('failed', 0)} {restore_stats.summary()}"))
+
+        if controller.throttles:
+            log(f"i Rate limited {controller.throttles} time(s); concurrency dipped to {controller.lowest}, "
+                f"now {int(controller.limit)} of {controller.max_limit}")
+            logging.getLogger("voxsmith").info(redact(f"AIMD throttles={controller.throttles} lowest={controller.lowest} limit={int(controller.limit)}"))
+
+        try:
+            conn = voxnet.connection_stats(env.session)
+            sent = conn["requests"] - conn_before["requests"]
+            opened = conn["opened"] - conn_before["opened"]
+            if sent > 0:
+                log(f"i Connections: {sent} request(s) over {opened} new connection(s)")
+                logging.getLogger("voxsmith").info(redact(f"NET_POOL requests={sent} opened={opened} reused={max(0, sent - opened)}"))
+        except Exception:
+            pass
+
+        try:
+            cs = tts_cache.stats()
+            log(f"i TTS cache: {cs['hits']} hit(s), {cs['misses']} miss(es)")
+            logging.getLogger("voxsmith").info(redact(f"TTS_CACHE hits={cs['hits']} misses={cs['misses']} bytes_saved={cs['bytes_saved']}"))
+        except Exception:
+            pass
+
+        if not cancel_event.is_set():
+            if audio_only:
+                log("* Done. Audio files saved to output folder.")
+                events.info("Complete","Audio generation finished. Files saved to output folder.")
+            else:
+                log("* Done. Check your output folder.")
+                events.info("Complete","Narration finished. Check your output folder.")
+            try:
+                log(f"OK Session log saved")
+            except Exception:
+                pass
+        else:
+            events.info("Cancelled","Generation was cancelled.")
+
+    except Exception as e:
+        log(f"X Fatal error: {e}")
+        traceback.print_exc()
+    finally:
+        # Persist what this run narrated so the next changed-only run can diff against it
+        if deck_manifest is not None:
+            deck_manifest.save()
+
+        # Save and leave PowerPoint open (don't close) - unless audio_only mode
+        if not audio_only:
+            try:
+                if embedder is not None:
+                    if checkpoint is not None and checkpoint.pending:
+                        saved = checkpoint.save(embedder)
+                        deck_manifest.mark_saved(saved)
+                        deck_manifest.save()
+                        if journal is not None:
+                            for i in saved:
+                                journal.slide(i, voxmanifest.J_SAVED)
+                        st = embedder.last_save
+                        log(f"i Deck saved ({len(saved)} slide(s)) in {st['seconds']:.1f}s: "
+                            f"{st['members_written']} part(s) written, {st['members_copied']} copied unchanged")
+                        logging.getLogger("voxsmith").info(redact(
+                            f"DECK_SAVE written={st['members_written']} bytes_written={st['bytes_written']} "
+                            f"copied={st['members_copied']} bytes_copied={st['bytes_copied']} s={st['seconds']}"))
+                elif pp_pres:
+                    saved = checkpoint.save(pp_pres) if checkpoint is not None else pp_pres.Save()
+                    if saved and deck_manifest is not None:
+                        deck_manifest.mark_saved(saved)
+                        deck_manifest.save()
+                    if saved and journal is not None:
+                        for i in saved:
+                            journal.slide(i, voxmanifest.J_SAVED)
+                    log("i Deck saved and left open for review")
+            except Exception as e:
+                log(f"! Warning: Failed to save: {e}")
+                run_status = "save_failed"
+            finally:
+                if embedder is not None:
+                    embedder.close()
+
+        # A run that ends anything but "complete" is offered for resume next time
+        if journal is not None:
+            journal.end(run_status)
+            journal.close()
+        summary.update(status=run_status, processed=processed, failures=failures)
+    return summary
+
+
+def estimate_narration(voice_id, input_file, output_dir, slide_range_spec, events=None, env=None,
+                       audio_only=False, changed_only=False, char_budget=None):
+    """
+    Dry run of run_narration(): resolve the selected slides' narration text
+    the same way, split it into the requests the run would send and check
+    each against the TTS cache. Nothing is synthesized, written or inserted.
+
+    Returns the voxestimate.estimate() dict (characters, cache hits, time)
+    or None when the deck can't be read. char_budget is the characters left
+    on the account (voxbatch.fetch_character_quota), if known.
+    """
+    events = events or NarrationEvents()
+    env = env or NarrationEnv()
+    log = events.log
+    settings = env.settings
+    if not os.path.isfile(input_file):
+        log(f"X PowerPoint not found: {input_file}")
+        return None
+    try:
+        deck = open_deck_notes(input_file, env, log, slide_range_spec)
+    except Exception as e:
+        log(f"X Failed to open PowerPoint: {e}")
+        return None
+    try:
+        sel = select_slides(len(deck), slide_range_spec or "")
+        jobs, _empty = resolve_notes(deck, sel, env.lexicon, log)
+    finally:
+        deck.close()
+
+    out_format = str(settings.get("tts_output_format", TTS_OUTPUT_FORMAT) or TTS_OUTPUT_FORMAT).lower()
+    if changed_only and jobs:
+        settings_hash = voxmanifest.settings_sha256(TTS_VOICE_SETTINGS, out_format)
+        deck_manifest = voxmanifest.DeckManifest.load(
+            voxmanifest.deck_manifest_path(env.manifests_dir, input_file), input_file)
+        changed = [(i, n) for i, n in jobs if not deck_manifest.is_current(
+            i, voxmanifest.text_sha256(n), voice_id, settings_hash,
+            os.path.join(output_dir, f"slide{i:02d}.wav"), need_inserted=not audio_only)]
+        log(f"i Changed-only mode: {len(changed)} of {len(jobs)} slide(s) changed")
+        jobs = changed
+
+    try:
+        chunk_chars = max(0, int(settings.get("tts_chunk_chars", TTS_CHUNK_CHARS) or 0))
+    except Exception:
+        chunk_chars = TTS_CHUNK_CHARS
+    # A cached legacy-format response is reused too when the plan rejects PCM
+    formats = [out_format] + ([voxtts.LEGACY_FORMAT] if voxtts.pcm_rate(out_format) else [])
+    requests_ = []
+    seen = set()  # a repeated request is served from the cache the first one fills
+    for idx, note in jobs:
+        parts = voxtts.chunk_text(note, chunk_chars)
+        contexts = chunk_contexts(parts) if len(parts) > 1 else [None]
+        for part, context in zip(parts, contexts):
+            keys = [voxcache.cache_key(part, voice_id, TTS_VOICE_SETTINGS, fmt, context=context) for fmt in formats]
+            hit = keys[0] in seen or any(env.tts_cache.contains(k) for k in keys)
+            seen.add(keys[0])
+            requests_.append((idx, len(part), hit))
+
+    concurrency = voxtts.clamp_concurrency(settings.get("tts_concurrency", voxtts.DEFAULT_CONCURRENCY))
+    model = voxestimate.fit_latency(voxestimate.read_latency_samples(env.logs_dir))
+    est = voxestimate.estimate(requests_, concurrency, model, char_budget)
+    for line in voxestimate.summary_lines(est):
+        log(line)
+    return est
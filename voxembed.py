@@ -0,0 +1,489 @@
+"""
+voxembed.py
+Offline audio insertion for Voxsmith.
+
+Inserts narration into a .pptx without PowerPoint: the WAV is added as a
+media part, a p:pic audio shape tagged VOX_VO (the same tag
+voxattach._delete_existing_vox_audio looks for) is appended to the slide,
+and a "Play" media effect is put first in the slide's main animation
+sequence, After Previous - the timeline restore_slide_animations() builds
+over COM. Existing effects are left as they are in the XML, so nothing has
+to be snapshotted or re-created.
+
+Only the parts a slide needs are rewritten (slide, slide rels, content
+types). Edits are staged in memory by attach() and written in one pass by
+save() through voxzip.rewrite(): every other zip entry, media included,
+is copied raw, and the new file replaces the deck only once it is
+complete. The WAVs go in stored, as PowerPoint does.
+
+Select it with the "insert_backend" setting ("xml"; default "com").
+"""
+import os
+import re
+import wave
+import zlib
+import struct
+import hashlib
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+import voxnotes
+import voxzip
+
+VOX_TAG = "VOX_VO"
+
+_NS_P = "http://schemas.openxmlformats.org/presentationml/2006/main"
+_NS_A = "http://schemas.openxmlformats.org/drawingml/2006/main"
+_NS_R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_P = "{" + _NS_P + "}"
+
+RT_AUDIO = _NS_R + "/audio"
+RT_IMAGE = _NS_R + "/image"
+RT_MEDIA = "http://schemas.microsoft.com/office/2007/relationships/media"
+
+CONTENT_TYPES = "[Content_Types].xml"
+_DEFAULT_TYPES = {"wav": "audio/wav", "png": "image/png"}
+
+ICON_PART = "ppt/media/voxsmith_icon.png"
+
+EMU_PER_PT = 12700
+ICON_PT = 32          # same icon size and off-slide placement as the COM path
+MARGIN_PT = 5
+
+# Default 4:3 slide size when presentation.xml has no p:sldSz
+_DEFAULT_SLIDE_SIZE = (9144000, 6858000)
+
+_PIC = re.compile(r"<p:pic[ >].*?</p:pic>", re.S)
+_SHAPE_ID = re.compile(r'<p:cNvPr\b[^>]*?\bid="(\d+)"')
+_REL_ID = re.compile(r'\br:(?:embed|link|id|pict)="([^"]+)"')
+_ROOT_TAG = re.compile(r"<p:sld\b[^>]*>")
+_XMLNS = re.compile(r'\bxmlns(?::(\w+))?="([^"]*)"')
+
+_PIC_XML = (
+    '<p:pic><p:nvPicPr><p:cNvPr id="{id}" name="Voxsmith narration" descr="' + VOX_TAG + '"/>'
+    '<p:cNvPicPr><a:picLocks noChangeAspect="1"/></p:cNvPicPr>'
+    '<p:nvPr><a:audioFile r:link="{audio}"/><p:extLst><p:ext uri="{{DAA4B4D4-6D71-4841-9C94-3DA1A3B7ED8D}}">'
+    '<p14:media xmlns:p14="http://schemas.microsoft.com/office/powerpoint/2010/main" r:embed="{media}"/>'
+    '</p:ext></p:extLst></p:nvPr></p:nvPicPr>'
+    '<p:blipFill><a:blip r:embed="{image}"/><a:stretch><a:fillRect/></a:stretch></p:blipFill>'
+    '<p:spPr><a:xfrm><a:off x="{x}" y="{y}"/><a:ext cx="{size}" cy="{size}"/></a:xfrm>'
+    '<a:prstGeom prst="rect"><a:avLst/></a:prstGeom></p:spPr></p:pic>'
+)
+
+
+def wav_duration_ms(path: str) -> int:
+    with wave.open(path, "rb") as w:
+        return int(round(w.getnframes() * 1000.0 / w.getframerate()))
+
+
+def _icon_png(size: int = ICON_PT, rgb=(0x44, 0x72, 0xC4)) -> bytes:
+    """A flat square PNG for the audio shape's picture (it sits off-slide)."""
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+    raw = (b"\x00" + bytes(rgb) * size) * size
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw, 9)) + chunk(b"IEND", b""))
+
+
+def _el(tag, parent=None, index=None, **attrs):
+    el = ET.Element(_P + tag, {k: str(v) for k, v in attrs.items()})
+    if parent is not None:
+        if index is None:
+            parent.append(el)
+        else:
+            parent.insert(index, el)
+    return el
+
+
+def _child(el, tag):
+    """el's p:<tag> child, created (appended) if missing."""
+    found = el.find(_P + tag)
+    return found if found is not None else _el(tag, el)
+
+
+def _delay_cond(ctn):
+    """The first numeric p:cond of a cTn's start conditions, or None."""
+    for cond in ctn.iterfind(_P + "stCondLst/" + _P + "cond"):
+        if cond.get("delay", "").isdigit():
+            return cond
+    return None
+
+
+def _shift(ctn, ms: int) -> None:
+    cond = _delay_cond(ctn)
+    if cond is not None:
+        cond.set("delay", str(max(0, int(cond.get("delay")) + ms)))
+
+
+def _auto_starts(group) -> bool:
+    """True if a main-sequence click group starts on its own (its first effect isn't On Click)."""
+    ctn = group.find(_P + "cTn")
+    return ctn is not None and any(c.get("evt") == "onBegin" for c in ctn.iterfind(_P + "stCondLst/" + _P + "cond"))
+
+
+def _targets(el) -> set:
+    return {t.get("spid") for t in el.iter(_P + "spTgt")}
+
+
+class _Timing:
+    """A slide's p:timing, parsed for editing and serialized back with the slide's own prefixes."""
+
+    def __init__(self, slide_xml: str):
+        root_tag = _ROOT_TAG.search(slide_xml)
+        if root_tag is None:
+            raise ValueError("not a slide part")
+        self.decls = dict(_XMLNS.findall(root_tag.group(0)))
+        for prefix, uri in (("p", _NS_P), ("a", _NS_A), ("r", _NS_R)):
+            if self.decls.get(prefix) != uri:
+                raise ValueError(f"slide uses an unexpected '{prefix}:' namespace prefix")
+        span = self._span(slide_xml)
+        if span is not None:
+            wrapper = "<w " + " ".join(f'xmlns:{k}="{v}"' if k else f'xmlns="{v}"'
+                                       for k, v in self.decls.items()) + ">"
+            self.root = ET.fromstring(wrapper + slide_xml[span[0]:span[1]] + "</w>")[0]
+        else:
+            self.root = _el("timing")
+        ids = [int(c.get("id")) for c in self.root.iter(_P + "cTn") if (c.get("id") or "").isdigit()]
+        self._next_id = max(ids, default=0) + 1
+
+    @staticmethod
+    def _span(slide_xml: str):
+        start = slide_xml.find("<p:timing")
+        if start < 0:
+            return None
+        end = slide_xml.find("</p:timing>", start)
+        if end < 0 or slide_xml.find("<p:timing", start + 1) >= 0:
+            raise ValueError("unexpected p:timing layout")
+        return start, end + len("</p:timing>")
+
+    def new_id(self) -> int:
+        self._next_id += 1
+        return self._next_id - 1
+
+    def serialize(self) -> str:
+        for prefix, uri in self.decls.items():
+            if prefix and not re.match(r"ns\d+$", prefix):
+                ET.register_namespace(prefix, uri)
+        return ET.tostring(self.root, encoding="unicode")
+
+    def splice(self, slide_xml: str) -> str:
+        """slide_xml with this timing in place of (or inserted where the schema wants) the old one."""
+        text = self.serialize()
+        span = self._span(slide_xml)
+        if span is not None:
+            return slide_xml[:span[0]] + text + slide_xml[span[1]:]
+        # p:timing follows cSld, clrMapOvr and transition, and precedes the slide's p:extLst
+        after = slide_xml.find("</p:cSld>")
+        if after < 0:
+            raise ValueError("slide has no p:cSld")
+        ext = slide_xml.find("<p:extLst", after)
+        at = ext if ext >= 0 else slide_xml.rfind("</p:sld>")
+        return slide_xml[:at] + text + slide_xml[at:]
+
+    def _root_children(self):
+        tn_lst = self.root.find(_P + "tnLst")
+        if tn_lst is None:
+            tn_lst = _el("tnLst", self.root, 0)
+        par = tn_lst.find(_P + "par")
+        if par is None:
+            par = _el("par", tn_lst)
+            _el("cTn", par, id=self.new_id(), dur="indefinite", restart="never", nodeType="tmRoot")
+        return _child(par.find(_P + "cTn"), "childTnLst")
+
+    def _main_seq(self, root_children):
+        for seq in root_children.iter(_P + "seq"):
+            ctn = seq.find(_P + "cTn")
+            if ctn is not None and ctn.get("nodeType") == "mainSeq":
+                return ctn
+        seq = _el("seq", root_children, 0, concurrent="1", nextAc="seek")
+        ctn = _el("cTn", seq, id=self.new_id(), dur="indefinite", nodeType="mainSeq")
+        _el("childTnLst", ctn)
+        for lst, evt in (("prevCondLst", "onPrev"), ("nextCondLst", "onNext")):
+            cond = _el("cond", _el(lst, seq), evt=evt, delay="0")
+            _el("sldTgt", _el("tgtEl", cond))
+        return ctn
+
+    def remove_media(self, spids: set) -> int:
+        """Drop every effect and media node that targets spids; returns effects removed."""
+        removed = 0
+        parents = {child: parent for parent in self.root.iter() for child in parent}
+        for ctn in list(self.root.iter(_P + "cTn")):
+            par = parents.get(ctn)
+            if par is None or par.tag != _P + "par" or not ctn.get("presetClass"):
+                continue
+            if not _targets(ctn) & spids:
+                continue
+            holder = parents[par]
+            holder.remove(par)
+            removed += 1
+            if ctn.get("presetClass") == "mediacall" and len(holder) == 0:
+                self._drop_empty_step(parents, holder, ctn)
+        for node in list(self.root.iter()):
+            if node.tag in (_P + "audio", _P + "video") and _targets(node) & spids and node in parents:
+                parents[node].remove(node)
+        return removed
+
+    def _drop_empty_step(self, parents, holder, media_ctn) -> None:
+        """Remove the emptied step (and group) an earlier insert() created, undoing its delay shift."""
+        step = parents.get(parents.get(holder))       # childTnLst -> cTn -> par
+        group_list = parents.get(step)
+        if step is None or group_list is None:
+            return
+        position = list(group_list).index(step)
+        group_list.remove(step)
+        if len(group_list) == 0:
+            group = parents.get(parents.get(group_list))
+            if group is not None and group in parents:
+                parents[group].remove(group)
+            return
+        behavior = media_ctn.find(".//" + _P + "cBhvr/" + _P + "cTn")
+        dur = behavior.get("dur", "") if behavior is not None else ""
+        if dur.isdigit():
+            for later in list(group_list)[position:]:
+                _shift(later.find(_P + "cTn"), -int(dur))
+
+    def insert(self, spid: int, dur_ms: int) -> None:
+        """Put a Play effect for spid first in the main sequence, After Previous, plus its media node."""
+        root_children = self._root_children()
+        main = self._main_seq(root_children)
+        groups = _child(main, "childTnLst")
+        first = groups[0] if len(groups) else None
+        if first is not None and _auto_starts(first):
+            steps = _child(first.find(_P + "cTn"), "childTnLst")
+            lead = steps[0].find(_P + "cTn/" + _P + "childTnLst") if len(steps) else None
+            lead_effect = lead[0].find(_P + "cTn") if lead is not None and len(lead) else None
+            if lead_effect is not None and lead_effect.get("nodeType") == "withEffect":
+                # The slide's first effect runs With Previous: it goes along with the narration
+                lead.insert(0, self._effect(spid, dur_ms))
+            else:
+                # After Previous: everything in this group now waits for the narration
+                for step in steps:
+                    _shift(step.find(_P + "cTn"), dur_ms)
+                steps.insert(0, self._step(spid, dur_ms))
+        else:
+            group = _el("par", groups, 0)
+            ctn = _el("cTn", group, id=self.new_id(), fill="hold")
+            st = _el("stCondLst", ctn)
+            _el("cond", st, delay="indefinite")
+            _el("tn", _el("cond", st, evt="onBegin", delay="0"), val=main.get("id"))
+            _el("childTnLst", ctn).append(self._step(spid, dur_ms))
+        root_children.append(self._media_node(spid))
+
+    def _step(self, spid, dur_ms):
+        step = _el("par")
+        ctn = _el("cTn", step, id=self.new_id(), fill="hold")
+        _el("cond", _el("stCondLst", ctn), delay="0")
+        _el("childTnLst", ctn).append(self._effect(spid, dur_ms))
+        return step
+
+    def _effect(self, spid, dur_ms):
+        par = _el("par")
+        ctn = _el("cTn", par, id=self.new_id(), presetID="1", presetClass="mediacall", presetSubtype="0",
+                  fill="hold", nodeType="afterEffect")
+        _el("cond", _el("stCondLst", ctn), delay="0")
+        cmd = _el("cmd", _el("childTnLst", ctn), type="call", cmd="playFrom(0.0)")
+        bhvr = _el("cBhvr", cmd)
+        _el("cTn", bhvr, id=self.new_id(), dur=dur_ms, fill="hold")
+        _el("spTgt", _el("tgtEl", bhvr), spid=spid)
+        return par
+
+    def _media_node(self, spid):
+        # Hidden while not playing, stopped by the next slide's sound - the COM path's play settings
+        audio = _el("audio")
+        node = _el("cMediaNode", audio, vol="80000")
+        ctn = _el("cTn", node, id=self.new_id(), fill="hold", display="0")
+        _el("cond", _el("stCondLst", ctn), delay="indefinite")
+        end = _el("cond", _el("endCondLst", ctn), evt="onStopAudio", delay="0")
+        _el("sldTgt", _el("tgtEl", end))
+        _el("spTgt", _el("tgtEl", node), spid=spid)
+        return audio
+
+
+class PptxAudioEmbedder:
+    """
+    Stage narration inserts into a deck and write them back in one pass.
+
+    attach() may be called for any number of slides (again for the same
+    slide replaces its narration); save() rewrites the deck. Slides are
+    1-based. Use as a context manager or call close().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with voxnotes.DeckNotes(path) as deck:
+            self.slide_parts = list(deck.slide_parts)
+            pres_part = deck._target(deck._rels(""), voxnotes.RT_OFFICE_DOCUMENT)
+        self._zip = zipfile.ZipFile(path)
+        self._staged = {}       # part name -> new bytes
+        self._files = {}        # new part name -> file on disk (streamed in at save)
+        self._orphans = set()   # media parts that lost a reference; dropped at save if nothing else uses them
+        self.pending = []
+        self.last_save = None   # voxzip.rewrite() stats of the last save
+        self.slide_size = self._slide_size(pres_part)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.slide_parts)
+
+    def close(self) -> None:
+        self._zip.close()
+
+    def _exists(self, name: str) -> bool:
+        return name in self._staged or name in self._files or name in self._zip.NameToInfo
+
+    def _read(self, name: str) -> bytes:
+        if name in self._staged:
+            return self._staged[name]
+        return self._zip.read(name)
+
+    def _slide_size(self, pres_part: str):
+        try:
+            with self._zip.open(pres_part) as f:
+                for _event, elem in ET.iterparse(f):
+                    if elem.tag == _P + "sldSz":
+                        return int(elem.get("cx")), int(elem.get("cy"))
+        except (KeyError, ET.ParseError, TypeError, ValueError):
+            pass
+        return _DEFAULT_SLIDE_SIZE
+
+    def _ensure_default_types(self) -> None:
+        types = self._read(CONTENT_TYPES).decode("utf-8")
+        present = {m.lower() for m in re.findall(r'<Default\b[^>]*\bExtension="([^"]+)"', types)}
+        missing = "".join(f'<Default Extension="{ext}" ContentType="{ct}"/>'
+                          for ext, ct in _DEFAULT_TYPES.items() if ext not in present)
+        if missing:
+            at = types.index(">", types.index("<Types")) + 1
+            self._staged[CONTENT_TYPES] = (types[:at] + missing + types[at:]).encode("utf-8")
+
+    def _media_part(self, idx: int, audio_path: str) -> str:
+        h = hashlib.sha256()
+        with open(audio_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        name = f"ppt/media/voxsmith_slide{idx:03d}_{h.hexdigest()[:12]}.wav"
+        if not self._exists(name):
+            self._files[name] = os.path.abspath(audio_path)
+        return name
+
+    def attach(self, idx: int, audio_path: str) -> dict:
+        """
+        Stage audio_path as slide idx's narration, replacing any earlier
+        VOX_VO audio. Returns {"shape_id", "media", "replaced", "duration_ms"}.
+        """
+        if not 1 <= idx <= len(self.slide_parts):
+            raise IndexError(f"slide {idx} out of range (1-{len(self.slide_parts)})")
+        dur_ms = wav_duration_ms(audio_path)
+        part = self.slide_parts[idx - 1]
+        rels_name = voxnotes._part_rels_name(part)
+        xml = self._read(part).decode("utf-8")
+        rels = (self._read(rels_name).decode("utf-8") if self._exists(rels_name) else
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships"></Relationships>')
+        timing = _Timing(xml)
+
+        # Earlier narration: its shape, its effects and the relationships only it used
+        old_ids, old_rids = set(), set()
+        for m in reversed(list(_PIC.finditer(xml))):
+            pic = m.group(0)
+            if f'descr="{VOX_TAG}"' not in pic or "<a:audioFile" not in pic:
+                continue
+            sid = _SHAPE_ID.search(pic)
+            if sid:
+                old_ids.add(sid.group(1))
+            old_rids.update(_REL_ID.findall(pic))
+            xml = xml[:m.start()] + xml[m.end():]
+        if old_ids:
+            timing.remove_media(old_ids)
+        still_used = set(_REL_ID.findall(xml))
+        for rid in old_rids - still_used:
+            rel = re.search(rf'<Relationship\b[^>]*\bId="{re.escape(rid)}"[^>]*/>', rels)
+            if rel is None:
+                continue
+            target = re.search(r'\bTarget="([^"]+)"', rel.group(0))
+            if target and "TargetMode=\"External\"" not in rel.group(0):
+                self._orphans.add(posixpath.normpath(posixpath.join(posixpath.dirname(part), target.group(1))))
+            rels = rels[:rel.start()] + rels[rel.end():]
+        # Media an earlier attach() staged since the last save was never written: just forget it
+        for name in self._orphans & set(self._files):
+            del self._files[name]
+            self._orphans.discard(name)
+
+        # New media part and the three relationships an embedded audio shape needs
+        self._ensure_default_types()
+        media = self._media_part(idx, audio_path)
+        if not self._exists(ICON_PART):
+            self._staged[ICON_PART] = _icon_png()
+        used = [int(n) for n in re.findall(r'\bId="rId(\d+)"', rels)]
+        next_rid = max(used, default=0) + 1
+        rids = {}
+        new_rels = []
+        for key, rel_type, target in (("audio", RT_AUDIO, media), ("media", RT_MEDIA, media),
+                                      ("image", RT_IMAGE, ICON_PART)):
+            rids[key] = f"rId{next_rid}"
+            next_rid += 1
+            rel_target = posixpath.relpath(target, posixpath.dirname(part))
+            new_rels.append(f'<Relationship Id="{rids[key]}" Type="{rel_type}" Target="{rel_target}"/>')
+        at = rels.rindex("</Relationships>")
+        rels = rels[:at] + "".join(new_rels) + rels[at:]
+
+        # Shape, off-slide to the right and bottom-aligned like the COM insert
+        shape_id = max((int(n) for n in _SHAPE_ID.findall(xml)), default=1) + 1
+        size = ICON_PT * EMU_PER_PT
+        width, height = self.slide_size
+        pic = _PIC_XML.format(id=shape_id, audio=rids["audio"], media=rids["media"], image=rids["image"],
+                              x=width + MARGIN_PT * EMU_PER_PT, y=height - size - MARGIN_PT * EMU_PER_PT, size=size)
+        at = xml.rindex("</p:spTree>")
+        xml = xml[:at] + pic + xml[at:]
+
+        timing.insert(shape_id, dur_ms)
+        xml = timing.splice(xml)
+
+        self._staged[part] = xml.encode("utf-8")
+        self._staged[rels_name] = rels.encode("utf-8")
+        if idx not in self.pending:
+            self.pending.append(idx)
+        return {"shape_id": shape_id, "media": media, "replaced": len(old_ids), "duration_ms": dur_ms}
+
+    def _referenced(self, names) -> set:
+        """The subset of names still targeted by some relationship in the package."""
+        bases = {posixpath.basename(n): n for n in names}
+        found = set()
+        rels_parts = {n for n in self._zip.NameToInfo if n.endswith(".rels")} | \
+                     {n for n in self._staged if n.endswith(".rels")}
+        for rels_name in rels_parts:
+            text = self._read(rels_name).decode("utf-8", errors="replace")
+            for base, name in bases.items():
+                if base in text:
+                    found.add(name)
+        return found
+
+    def save(self, out_path: str = None) -> list:
+        """
+        Write the deck with every staged change (to out_path, or over the
+        original). Returns the slides that were pending, now durable.
+        """
+        target = out_path or self.path
+        drop = self._orphans - self._referenced(self._orphans)
+        # Windows won't replace a file that is still open
+        self._zip.close()
+        try:
+            self.last_save = voxzip.rewrite(self.path, target, replace=self._staged, add_files=self._files,
+                                            remove=drop)
+        except BaseException:
+            self._zip = zipfile.ZipFile(self.path)
+            raise
+        self._zip = zipfile.ZipFile(target)
+        self.path = target
+        self._staged, self._files, self._orphans = {}, {}, set()
+        saved, self.pending = self.pending, []
+        return saved
+
+    def Save(self) -> list:
+        """COM-style alias, so voxattach.SaveCheckpoint can drive this like an open presentation."""
+        return self.save()
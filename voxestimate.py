@@ -0,0 +1,215 @@
+"""
+voxestimate.py
+Pre-run cost and duration estimate for Voxsmith.
+
+Every synthesized request appends its character count and end-to-end
+time to latency_samples.jsonl in the logs folder (record_sample(), called
+by run_narration next to voxnet.log_tts). fit_latency() turns the most
+recent of those into a per-request + per-character latency model; estimate() applies it to the requests a run would send, on the same
+number of parallel workers, to predict wall-clock time. Cache hits cost
+neither characters nor time.
+
+With no history yet the model falls back to DEFAULT_MS_PER_REQUEST and
+DEFAULT_MS_PER_CHAR, which are deliberately on the slow side.
+"""
+import os
+import re
+import json
+import heapq
+import threading
+
+SAMPLES_FILE = "latency_samples.jsonl"
+LOG_FILE = "voxsmith.log"
+
+DEFAULT_MS_PER_REQUEST = 800.0
+DEFAULT_MS_PER_CHAR = 15.0
+
+MIN_SAMPLES = 5         # fewer than this and the defaults are used
+MAX_SAMPLES = 2000      # newest samples only, so the model follows the API's current speed
+
+_NET_TTS_LINE = re.compile(r"NET_TTS \S+ chars=(\d+) ms=(\d+)")
+
+_samples_lock = threading.Lock()
+
+
+def record_sample(logs_dir: str, chars: int, ms: int) -> None:
+    """
+    Append one synthesized request to the samples file. Once the file holds
+    twice MAX_SAMPLES lines it is cut back to the newest MAX_SAMPLES.
+    Never raises: a lost sample only makes the next estimate less informed.
+    """
+    path = os.path.join(logs_dir, SAMPLES_FILE)
+    line = json.dumps({"chars": int(chars), "ms": int(ms)}, separators=(",", ":")) + "\n"
+    with _samples_lock:
+        try:
+            os.makedirs(logs_dir, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+            if os.path.getsize(path) > 2 * MAX_SAMPLES * len(line):
+                with open(path, "r", encoding="utf-8", errors="replace") as f:
+                    lines = f.readlines()
+                if len(lines) > 2 * MAX_SAMPLES:
+                    tmp = path + ".tmp"
+                    with open(tmp, "w", encoding="utf-8") as f:
+                        f.writelines(lines[-MAX_SAMPLES:])
+                    os.replace(tmp, path)
+        except Exception:
+            pass
+
+
+def read_latency_samples(logs_dir: str, limit: int = MAX_SAMPLES) -> list:
+    """
+    (chars, ms) for the most recent synthesized requests, oldest first: from
+    the samples file, or from NET_TTS lines in rotated voxsmith.log files
+    when there is no samples file yet.
+    """
+    samples = []
+    try:
+        with open(os.path.join(logs_dir, SAMPLES_FILE), "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                    samples.append((int(rec["chars"]), int(rec["ms"])))
+                except Exception:
+                    continue
+    except OSError:
+        pass
+    if samples:
+        return samples[-limit:] if limit else samples
+    # Rotated files hold older lines: the highest suffix is the oldest, voxsmith.log the newest
+    names = [f"{LOG_FILE}.{n}" for n in range(9, 0, -1)] + [LOG_FILE]
+    for name in names:
+        path = os.path.join(logs_dir, name)
+        if not os.path.isfile(path):
+            continue
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    if "NET_TTS" not in line and "net_tts" not in line:
+                        continue
+                    sample = _parse_sample(line)
+                    if sample is not None:
+                        samples.append(sample)
+        except Exception:
+            continue
+    return samples[-limit:] if limit else samples
+
+
+def _parse_sample(line: str):
+    m = _NET_TTS_LINE.search(line)
+    if m:
+        return int(m.group(1)), int(m.group(2))
+    # Verbose telemetry: the record is the JSON object after the logger prefix
+    start = line.find("{")
+    if start < 0:
+        return None
+    try:
+        rec = json.loads(line[start:])
+        if rec.get("evt") == "net_tts" and rec.get("chars") and rec.get("ms") is not None:
+            return int(rec["chars"]), int(rec["ms"])
+    except Exception:
+        pass
+    return None
+
+
+class LatencyModel:
+    """ms = per_request + per_char * chars, from a least-squares fit or the defaults."""
+
+    def __init__(self, per_request=DEFAULT_MS_PER_REQUEST, per_char=DEFAULT_MS_PER_CHAR, samples=0):
+        self.per_request = float(per_request)
+        self.per_char = float(per_char)
+        self.samples = samples
+
+    def predict_ms(self, chars: int) -> float:
+        return self.per_request + self.per_char * max(0, int(chars))
+
+
+def fit_latency(samples) -> LatencyModel:
+    """Fit a LatencyModel to (chars, ms) samples; defaults when there are too few or they don't fit."""
+    samples = [(c, ms) for c, ms in samples if c > 0 and ms >= 0]
+    n = len(samples)
+    if n < MIN_SAMPLES:
+        return LatencyModel()
+    mean_c = sum(c for c, _ in samples) / n
+    mean_ms = sum(ms for _, ms in samples) / n
+    var_c = sum((c - mean_c) ** 2 for c, _ in samples)
+    if var_c > 0:
+        slope = sum((c - mean_c) * (ms - mean_ms) for c, ms in samples) / var_c
+        intercept = mean_ms - slope * mean_c
+    else:
+        slope, intercept = -1.0, 0.0
+    if slope < 0 or intercept < 0:
+        # Every request the same size, or noise swamps the trend: scale by characters alone
+        slope, intercept = mean_ms / mean_c, 0.0
+    return LatencyModel(intercept, slope, n)
+
+
+def schedule_ms(durations, workers: int) -> float:
+    """Wall time for durations run in order on `workers` parallel slots (each job takes the first free slot)."""
+    workers = max(1, int(workers))
+    slots = [0.0] * min(workers, max(1, len(durations)))
+    for d in durations:
+        heapq.heapreplace(slots, slots[0] + d)
+    return max(slots) if durations else 0.0
+
+
+def estimate(requests, concurrency: int, model: LatencyModel = None, char_budget=None) -> dict:
+    """
+    Cost and time for a run's requests.
+
+    requests is a list of (slide, chars, cache_hit) - one per TTS call, so a
+    long note split into chunks contributes several. char_budget is the
+    characters left on the account, if known.
+    """
+    model = model or LatencyModel()
+    misses = [(s, c) for s, c, hit in requests if not hit]
+    durations = [model.predict_ms(c) for _s, c in misses]
+    billable = sum(c for _s, c in misses)
+    out = {
+        "slides": len({s for s, _c, _h in requests}),
+        "requests": len(requests),
+        "cache_hits": len(requests) - len(misses),
+        "chars_total": sum(c for _s, c, _h in requests),
+        "chars_billable": billable,
+        "concurrency": concurrency,
+        "est_seconds": round(schedule_ms(durations, concurrency) / 1000.0, 1),
+        "est_api_seconds": round(sum(durations) / 1000.0, 1),
+        "latency_ms_per_request": round(model.per_request, 1),
+        "latency_ms_per_char": round(model.per_char, 3),
+        "latency_samples": model.samples,
+        "char_budget": char_budget,
+        "fits_budget": None if char_budget is None else billable <= char_budget,
+    }
+    return out
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    m, s = divmod(seconds, 60)
+    if m < 60:
+        return f"{m}m {s:02d}s"
+    h, m = divmod(m, 60)
+    return f"{h}h {m:02d}m"
+
+
+def summary_lines(est: dict) -> list:
+    """Log lines describing an estimate, in the app's log style."""
+    lines = [
+        f"i Estimate: {est['slides']} slide(s), {est['requests']} request(s), "
+        f"{est['cache_hits']} already cached",
+        f"i Characters: {est['chars_billable']:,} billable of {est['chars_total']:,}",
+        f"i Time: about {format_duration(est['est_seconds'])} of synthesis, {est['concurrency']} at a time",
+    ]
+    if est["latency_samples"]:
+        lines.append(f"i Latency from {est['latency_samples']} past request(s): "
+                     f"{est['latency_ms_per_request']:.0f} ms + {est['latency_ms_per_char']:.1f} ms/char")
+    else:
+        lines.append("i Latency: default figures (no synthesis history yet)")
+    if est.get("char_budget") is not None:
+        if est["fits_budget"]:
+            lines.append(f"OK Fits the {est['char_budget']:,} characters left on the account")
+        else:
+            lines.append(f"! Needs {est['chars_billable']:,} characters but only {est['char_budget']:,} are left")
+    return lines
@@ -0,0 +1,239 @@
+"""
+voxfakecom.py
+In-process stand-in for the PowerPoint COM object model.
+
+Lets voxanimate's snapshot and restore code run on machines without
+PowerPoint (Linux CI, a dev laptop) and makes its COM traffic measurable:
+every property read, property write and method call on a fake object is
+counted, and can be slowed down by a fixed latency to mimic the
+cross-process round trip of real COM automation.
+
+The fakes follow the real model where voxanimate depends on it:
+missing properties raise AttributeError (as win32com dynamic dispatch
+does), EffectParameters that don't apply to an effect type raise
+FakeComError, and the first MainSequence item is Item(1).
+
+Benchmark the snapshot's COM traffic, and the diff restore against the
+full rebuild (tests/test_voxanimate.py checks that their results match):
+    python voxfakecom.py [--slides 20] [--effects 25] [--latency-us 60]
+"""
+import time
+import random
+
+import voxanimate
+
+
+class FakeComError(Exception):
+    """What pywintypes.com_error is to real COM: the call reached the object and failed."""
+
+
+class FakeModel:
+    """Shared call counter and simulated per-call latency for one fake object graph."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def tick(self) -> None:
+        self.calls += 1
+        if self.latency:
+            end = time.perf_counter() + self.latency
+            while time.perf_counter() < end:
+                pass
+
+
+class FakeObject:
+    """
+    A COM object: capitalized attributes live in _props and each access
+    costs one call. Values may be callables raising FakeComError to model
+    properties that exist but fail.
+    """
+
+    def __init__(self, model: FakeModel, **props):
+        object.__setattr__(self, "_model", model)
+        object.__setattr__(self, "_props", dict(props))
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        self._model.tick()
+        try:
+            value = self._props[name]
+        except KeyError:
+            raise AttributeError(name) from None
+        if isinstance(value, FakeComError):
+            raise value
+        return value
+
+    def __setattr__(self, name, value):
+        self._model.tick()
+        if name not in self._props:
+            raise AttributeError(name)
+        self._props[name] = value
+
+
+class FakeCollection(FakeObject):
+    """Count / Item(i) (1-based) collection that is also iterable like a COM collection."""
+
+    def __init__(self, model, items=()):
+        super().__init__(model)
+        object.__setattr__(self, "_items", list(items))
+
+    def __getattr__(self, name):
+        if name == "Count":
+            self._model.tick()
+            return len(self._items)
+        return super().__getattr__(name)
+
+    def Item(self, i):
+        self._model.tick()
+        return self._items[int(i) - 1]
+
+    def __call__(self, i):
+        return self.Item(i)
+
+    def __iter__(self):
+        for i in range(1, len(self._items) + 1):
+            yield self.Item(i)
+
+
+# Effect types whose EffectParameters accept each property (everything else raises)
+_DIRECTION_TYPES = {2, 3, 10, 22, 47}           # fly, blinds, crawl, wipe, peek
+_AMOUNT_TYPES = {59, 61, 62}                    # grow/shrink, spin, transparency
+_FONT_TYPES = {55, 56, 57, 58}                  # change font, font color, size, style
+_COLOR_TYPES = {54, 56, 60}                     # fill color, font color, line color
+
+_PARAM_TYPES = {"Direction": _DIRECTION_TYPES, "Amount": _AMOUNT_TYPES, "FontBold": _FONT_TYPES,
+                "FontItalic": _FONT_TYPES, "FontSize": _FONT_TYPES, "FontUnderline": _FONT_TYPES,
+                "Color": _COLOR_TYPES, "Color2": _COLOR_TYPES, "Relative": {42}}
+
+
+class FakeEffect(FakeObject):
+    def __init__(self, model, sequence, shape, effect_type, rng=None, text=True):
+        rng = rng or random.Random(0)
+        err = FakeComError("The property is not available for this effect")
+        # Paragraph and the text range only read back on effects that animate text
+        text_props = 0 if text else err
+        params = {}
+        for prop, types in _PARAM_TYPES.items():
+            if effect_type not in types:
+                params[prop] = err
+            elif prop.startswith("Color"):
+                params[prop] = FakeObject(model, RGB=rng.randrange(0, 0xFFFFFF))
+            elif prop in ("Amount", "FontSize"):
+                params[prop] = float(rng.choice((50, 100, 150)))
+            elif prop == "Direction":
+                params[prop] = rng.choice((1, 2, 3, 4))
+            else:
+                params[prop] = rng.random() < 0.5
+        behaviors = [_fake_behavior(model, rng) for _ in range(rng.randint(1, 4))]
+        super().__init__(
+            model,
+            EffectType=effect_type,
+            Shape=shape,
+            Timing=FakeObject(model, TriggerType=rng.choice((1, 2, 3)), TriggerDelayTime=rng.choice((0.0, 0.5)),
+                              Duration=rng.choice((0.5, 1.0, 2.0)), Speed=1.0, RewindWhenDone=False,
+                              RepeatCount=1, AutoReverse=False),
+            Paragraph=text_props,
+            TextRangeStart=text_props,
+            TextRangeLength=text_props,
+            EffectParameters=FakeObject(model, **params),
+            Behaviors=FakeCollection(model, behaviors),
+        )
+        object.__setattr__(self, "_sequence", sequence)
+
+    def Delete(self):
+        self._model.tick()
+        self._sequence._items.remove(self)
+
+    def MoveTo(self, to_pos):
+        self._model.tick()
+        items = self._sequence._items
+        items.remove(self)
+        items.insert(int(to_pos) - 1, self)
+
+
+def _fake_behavior(model, rng):
+    btype = rng.choice((1, 4, 4, 5))
+    props = {"Type": btype, "Accumulate": 1, "Additive": 1,
+             "Timing": FakeObject(model, SmoothStart=0.0, SmoothEnd=0.0)}
+    if btype == 1:
+        props["MotionEffect"] = FakeObject(model, FromX=0.0, FromY=0.0, ToX=rng.random(), ToY=rng.random())
+    if btype == 4:
+        props["PropertyEffect"] = FakeObject(model, Property=rng.choice((1, 2, 3)), From="0", To="1")
+    return FakeObject(model, **props)
+
+
+class FakeSequence(FakeCollection):
+    def AddEffect(self, shape, effect_type, *args):
+        self._model.tick()
+        eff = FakeEffect(self._model, self, shape, int(effect_type), text=False)
+        self._items.append(eff)
+        return eff
+
+
+def build_slide(model: FakeModel, n_effects: int = 20, seed: int = 0, audio: bool = True, text: bool = True):
+    """
+    A fake slide with n_effects shape animations (plus one media effect
+    when audio is set); with text off, none of them animates text.
+    """
+    rng = random.Random(seed)
+    seq = FakeSequence(model)
+    shapes = [FakeObject(model, Id=i + 2, Name=f"Shape {i + 2}") for i in range(max(1, n_effects // 2))]
+    if audio:
+        media = FakeObject(model, Id=999, Name="slide01")
+        shapes.append(media)
+        seq._items.append(FakeEffect(model, seq, media, 83, rng))
+    types = sorted(set().union(*_PARAM_TYPES.values()) | {1, 10, 53})
+    for _ in range(n_effects):
+        seq._items.append(FakeEffect(model, seq, rng.choice(shapes[:-1] if audio else shapes), rng.choice(types), rng,
+                                     text=text))
+    return FakeObject(model, TimeLine=FakeObject(model, MainSequence=seq), Shapes=FakeCollection(model, shapes))
+
+
+def _benchmark(argv=None) -> int:
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="voxfakecom", description="Benchmark voxanimate's snapshot on fake COM.")
+    ap.add_argument("--slides", type=int, default=20)
+    ap.add_argument("--effects", type=int, default=25, help="animations per slide")
+    ap.add_argument("--latency-us", type=float, default=60.0, help="simulated cost of one COM call")
+    args = ap.parse_args(argv)
+
+    model = FakeModel(args.latency_us / 1e6)
+    slides = [build_slide(model, args.effects, seed=n) for n in range(args.slides)]
+    model.calls = 0
+    t0 = time.perf_counter()
+    stats = voxanimate.ComStats()
+    for s in slides:
+        voxanimate.snapshot_slide_animations(s, stats)
+    elapsed = time.perf_counter() - t0
+    print(f"snapshot {elapsed * 1000:8.1f} ms  {model.calls:7d} COM calls  "
+          f"{model.calls / max(1, args.slides):7.0f} per slide")
+    _benchmark_restore(args)
+    return 0
+
+
+def _benchmark_restore(args) -> None:
+    """Full rebuild vs diff restore after inserting a new audio shape."""
+    for name in ("rebuild", "diff"):
+        model = FakeModel(args.latency_us / 1e6)
+        slides = [build_slide(model, args.effects, seed=n, audio=False, text=False) for n in range(args.slides)]
+        snaps = [voxanimate.snapshot_slide_animations(s) for s in slides]
+        model.calls = 0
+        t0 = time.perf_counter()
+        outcomes = {}
+        for slide, snap in zip(slides, snaps):
+            audio = FakeObject(model, Id=999, Name="VOX_VO")
+            if name == "rebuild":
+                outcome = "rebuilt" if voxanimate.restore_slide_animations(slide, snap, audio) else "failed"
+            else:
+                outcome = voxanimate.insert_audio_effect(slide, snap, audio)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        elapsed = time.perf_counter() - t0
+        print(f"{name:8s} {elapsed * 1000:8.1f} ms  {model.calls:7d} COM calls  "
+              f"{model.calls / max(1, args.slides):7.0f} per slide  {outcomes}")
+
+
+if __name__ == "__main__":
+    raise SystemExit(_benchmark())
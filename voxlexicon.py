@@ -0,0 +1,247 @@
+"""
+voxlexicon.py
+Pronunciation dictionary for Voxsmith.
+
+Rewrites narration text before it is sent for synthesis, so acronyms and
+product names are spoken right without hand-editing every deck's notes.
+Rules live in pronunciations.json in the settings folder:
+
+    {"rules": [
+        {"find": "SQL", "replace": "sequel"},
+        {"find": "AWS", "replace": "A W S", "case_sensitive": true},
+        {"find": "v(\\d+)\\.(\\d+)", "replace": "version \\1 point \\2", "regex": true}
+    ]}
+
+A flat {"find": "replace", ...} object is accepted too. Literal rules match
+whole words and ignore case unless told otherwise; regex rules may use
+numbered groups in the replacement.
+
+All rules are compiled once into a single regex - literals as a character
+trie, regex rules as numbered alternatives - so a note is rewritten in one
+pass however many rules there are. At any position, regex rules are tried
+first (in file order), then the longest literal.
+"""
+import os
+import re
+import json
+import threading
+
+LEXICON_FILE = "pronunciations.json"
+
+TEMPLATE = {
+    "rules": [
+        {"find": "SQL", "replace": "sequel"},
+        {"find": "v(\\d+)\\.(\\d+)", "replace": "version \\1 point \\2", "regex": True},
+    ]
+}
+
+
+def _trie_pattern(words) -> str:
+    """One regex matching any of words, sharing common prefixes (longest match first)."""
+    trie = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+    return _emit(trie)
+
+
+def _emit(node) -> str:
+    branches = [re.escape(ch) + _emit(child) for ch, child in sorted(node.items()) if ch]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if "" in node:
+        # A word ends here but longer ones continue; prefer the longer
+        return body + "?" if len(branches) == 1 and len(branches[0]) == 1 else "(?:" + body + ")?"
+    return body
+
+
+def _renumber_backrefs(pattern: str, offset: int) -> str:
+    """
+    pattern with numbered backreferences shifted by offset, for use inside
+    the combined regex where its groups come after `offset` others.
+    """
+    out = []
+    i = 0
+    in_class = False
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\" and i + 1 < len(pattern):
+            j = i + 1
+            while j < len(pattern) and j < i + 3 and pattern[j].isdigit():
+                j += 1
+            digits = pattern[i + 1:j]
+            # \0 and three-digit escapes are octal characters, not group references
+            if digits and not in_class and digits[0] != "0" and not (len(digits) == 2 and j < len(pattern)
+                                                                     and pattern[j] in "01234567"
+                                                                     and all(d in "01234567" for d in digits)):
+                out.append(f"(?:\\{int(digits) + offset})")
+                i = j
+                continue
+            out.append(pattern[i:i + 2])
+            i += 2
+            continue
+        if in_class:
+            in_class = ch != "]" or (out and out[-1] == "[")
+        elif ch == "[":
+            in_class = True
+        elif pattern.startswith("(?(", i) and i + 3 < len(pattern) and pattern[i + 3].isdigit():
+            raise ValueError("numbered conditional groups are not supported")
+        out.append(ch)
+        i += 1
+    return "".join(out)
+
+
+class Lexicon:
+    """Compiled rule set; apply() rewrites text in a single regex pass."""
+
+    def __init__(self, rules=()):
+        self.rules = 0
+        self.errors = []
+        self._regex = None
+        self._regex_rules = {}  # outer group index -> (compiled rule, replacement)
+        self._literals = {}     # group name -> {match key: replacement}
+        self._compile(list(rules))
+
+    def __len__(self):
+        return self.rules
+
+    def _compile(self, rules):
+        alternatives = []  # (rule number, alternative, groups it opens)
+        group = 0
+        literals = {(False, True): {}, (False, False): {}, (True, True): {}, (True, False): {}}
+        for n, rule in enumerate(rules, 1):
+            try:
+                find = str(rule.get("find") or "")
+                repl = str(rule.get("replace") if rule.get("replace") is not None else "")
+                case = bool(rule.get("case_sensitive", False))
+            except Exception:
+                self.errors.append(f"rule {n}: not an object")
+                continue
+            if not find:
+                continue
+            if rule.get("regex"):
+                if "(?P<" in find:
+                    self.errors.append(f"rule {n}: named groups are not supported")
+                    continue
+                try:
+                    pattern = find if case else f"(?i:{find})"
+                    compiled = re.compile(pattern)
+                    compiled.sub(repl, "")  # validates group references in the replacement
+                    # In the combined regex this rule's groups start after `group + 1` others
+                    combined = _renumber_backrefs(pattern, group + 1)
+                except (re.error, ValueError) as e:
+                    self.errors.append(f"rule {n}: {e}")
+                    continue
+                group += 1
+                self._regex_rules[group] = (compiled, repl)
+                alternatives.append((n, f"({combined})", 1 + compiled.groups))
+                group += compiled.groups
+            else:
+                table = literals[(case, bool(rule.get("whole_word", True)))]
+                table[find if case else find.lower()] = repl
+            self.rules += 1
+        for (case, whole), table in literals.items():
+            if not table:
+                continue
+            name = f"lit_{'cs' if case else 'ci'}_{'w' if whole else 'p'}"
+            body = _trie_pattern(table)
+            if not case:
+                body = f"(?i:{body})"
+            if whole:
+                body = rf"(?<!\w){body}(?!\w)"
+            alternatives.append((None, f"(?P<{name}>{body})", 1))
+            self._literals[name] = table
+        if alternatives:
+            self._regex = self._combine(alternatives)
+
+    def _combine(self, alternatives):
+        try:
+            return re.compile("|".join(alt for _n, alt, _g in alternatives))
+        except re.error:
+            pass
+        # A rule that only breaks in combination is dropped on its own; a never-matching
+        # stand-in with as many groups keeps the numbering of the rules after it
+        kept = []
+        for n, alt, groups in alternatives:
+            try:
+                re.compile("|".join(kept + [alt]))
+            except re.error as e:
+                self.errors.append(f"rule {n}: {e}" if n else f"literal rules: {e}")
+                self.rules -= 1
+                alt = "(?!)" + "()" * groups
+            kept.append(alt)
+        return re.compile("|".join(kept))
+
+    def _replace(self, m):
+        name = m.lastgroup
+        if name in self._literals:
+            text = m.group(name)
+            table = self._literals[name]
+            return table.get(text, table.get(text.lower(), text))
+        compiled, repl = self._regex_rules[m.lastindex]
+        sub = compiled.match(m.string, m.start())
+        return sub.expand(repl) if sub is not None else m.group(0)
+
+    def apply(self, text: str):
+        """(rewritten text, number of replacements)."""
+        if self._regex is None or not text:
+            return text, 0
+        return self._regex.subn(self._replace, text)
+
+
+def parse_rules(data) -> list:
+    """Normalize the accepted file shapes into a list of rule dicts."""
+    if isinstance(data, dict) and isinstance(data.get("rules"), list):
+        return data["rules"]
+    if isinstance(data, dict):
+        return [{"find": k, "replace": v} for k, v in data.items()]
+    if isinstance(data, list):
+        return data
+    return []
+
+
+def lexicon_path(settings_dir: str) -> str:
+    return os.path.join(settings_dir, LEXICON_FILE)
+
+
+_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def load(path: str) -> Lexicon:
+    """
+    Compiled lexicon for path (empty if the file is missing). Compiled
+    lexicons are cached per file and rebuilt only when it changes on disk.
+    A file that is not valid JSON yields an empty lexicon with the error in
+    .errors.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return Lexicon()
+    stamp = (st.st_size, st.st_mtime_ns)
+    with _CACHE_LOCK:
+        hit = _CACHE.get(path)
+        if hit is not None and hit[0] == stamp:
+            return hit[1]
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lex = Lexicon(parse_rules(json.load(f)))
+    except Exception as e:
+        lex = Lexicon()
+        lex.errors.append(f"{os.path.basename(path)}: {e}")
+    with _CACHE_LOCK:
+        _CACHE[path] = (stamp, lex)
+    return lex
+
+
+def ensure_file(path: str) -> str:
+    """Create path with a small example rule set if it doesn't exist; returns path."""
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(TEMPLATE, f, indent=2)
+    return path
@@ -0,0 +1,365 @@
+"""
+voxmanifest.py
+Persistent per-deck narration manifest for Voxsmith.
+
+Remembers, for every slide narrated from a deck, the hash of the resolved
+narration text (after "### Read Slide" expansion), the voice and request
+settings used, the output WAV and whether it made it into the deck. A rerun
+can then pick only the slides whose inputs changed instead of narrating the
+whole deck again.
+
+Also home to the per-session manifest (one JSONL line per slide, hash
+chained) and the run journal: an append-only JSONL log of per-slide progress
+(synthesized -> converted -> inserted -> saved) that lets an interrupted run
+resume where it stopped.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+
+MANIFEST_VERSION = 1
+
+# Slide states recorded in the manifest
+STATE_AUDIO = "audio"              # WAV written, not attached (audio-only run)
+STATE_INSERTED = "inserted"        # WAV attached to the deck and the deck saved
+STATE_INSERTED_UNSAVED = "inserted_unsaved"  # attached, but no save checkpoint yet
+STATE_SKIPPED_ATTACH = "skipped_attach"  # WAV written, attach deliberately skipped (text animations)
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8", "ignore")).hexdigest()
+
+
+def settings_sha256(voice_settings=None, output_format: str = "", model_id: str = "") -> str:
+    """Hash of the request knobs that change the audio for the same text and voice."""
+    blob = json.dumps({"voice_settings": voice_settings or {}, "output_format": output_format or "",
+                       "model_id": model_id or ""}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def deck_tag(deck_path: str) -> str:
+    """<deck name>_<hash of its absolute path>: unique per deck, stable across runs."""
+    full = os.path.abspath(deck_path)
+    base = os.path.splitext(os.path.basename(full))[0]
+    tag = hashlib.sha1(os.path.normcase(full).encode("utf-8", "ignore")).hexdigest()[:8]
+    return f"{base}_{tag}"
+
+
+def deck_manifest_path(manifests_dir: str, deck_path: str) -> str:
+    """One manifest per deck, named after the deck and its absolute path."""
+    return os.path.join(manifests_dir, f"{deck_tag(deck_path)}.json")
+
+
+class DeckManifest:
+    """Slide-keyed record of what was last narrated for a deck."""
+
+    def __init__(self, path: str, deck_path: str = ""):
+        self.path = path
+        self.deck_path = os.path.abspath(deck_path) if deck_path else ""
+        self.slides = {}
+        self._dirty = False
+
+    @classmethod
+    def load(cls, path: str, deck_path: str = ""):
+        m = cls(path, deck_path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict) and data.get("version") == MANIFEST_VERSION:
+                m.slides = {int(k): v for k, v in (data.get("slides") or {}).items() if isinstance(v, dict)}
+        except Exception:
+            pass
+        return m
+
+    def is_current(self, idx: int, text_hash: str, voice_id: str, settings_hash: str,
+                   output_file: str, need_inserted: bool) -> bool:
+        """True when slide idx was already narrated with these exact inputs."""
+        rec = self.slides.get(int(idx))
+        if not rec:
+            return False
+        if rec.get("text_sha256") != text_hash or rec.get("voice_id") != voice_id:
+            return False
+        if rec.get("settings_sha256") != settings_hash:
+            return False
+        out = rec.get("output_file") or ""
+        if os.path.normcase(os.path.abspath(out)) != os.path.normcase(os.path.abspath(output_file)):
+            return False
+        if not os.path.isfile(output_file):
+            return False
+        if need_inserted and rec.get("state") not in (STATE_INSERTED, STATE_SKIPPED_ATTACH):
+            return False
+        return True
+
+    def record(self, idx: int, *, text_hash: str, voice_id: str, settings_hash: str,
+               output_file: str, state: str, wav_sha256: str = "") -> None:
+        self.slides[int(idx)] = {
+            "text_sha256": text_hash,
+            "voice_id": voice_id,
+            "settings_sha256": settings_hash,
+            "output_file": os.path.abspath(output_file),
+            "wav_sha256": wav_sha256,
+            "state": state,
+            "updated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        self._dirty = True
+
+    def mark_saved(self, slide_indexes) -> None:
+        """Promote slides covered by a deck save from inserted_unsaved to inserted."""
+        for idx in slide_indexes:
+            rec = self.slides.get(int(idx))
+            if rec and rec.get("state") == STATE_INSERTED_UNSAVED:
+                rec["state"] = STATE_INSERTED
+                self._dirty = True
+
+    def unsaved(self) -> list:
+        """Slides attached in a run that ended before its deck was saved."""
+        return sorted(i for i, r in self.slides.items() if r.get("state") == STATE_INSERTED_UNSAVED)
+
+    def save(self) -> bool:
+        """Write atomically; a no-op when nothing changed."""
+        if not self._dirty:
+            return True
+        data = {
+            "version": MANIFEST_VERSION,
+            "deck": self.deck_path,
+            "slides": {str(k): self.slides[k] for k in sorted(self.slides)},
+        }
+        tmp = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, self.path)
+            self._dirty = False
+            return True
+        except Exception:
+            try:
+                os.remove(tmp)
+            except Exception:
+                pass
+            return False
+
+
+# ---------- Session manifest (one file per run, in the logs folder) ----------
+
+CHAIN_GENESIS = "0" * 64
+
+
+def _chain_next(prev: str, entry: dict) -> str:
+    blob = json.dumps(entry, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256((prev + "\n" + blob).encode("utf-8")).hexdigest()
+
+
+class SessionManifest:
+    """
+    Append-only JSONL record of what a run produced, one line per slide.
+
+    Each line carries "chain" = sha256(previous chain + entry), so appending
+    is O(1) and the last line's chain (mirrored into <path>.sha256) covers
+    every entry before it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.head = CHAIN_GENESIS
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def append(self, entry: dict) -> str:
+        """Append one entry; returns the new chain head."""
+        entry = {k: v for k, v in entry.items() if k != "chain"}
+        with self._lock:
+            head = _chain_next(self.head, entry)
+            line = json.dumps(dict(entry, chain=head), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            with open(self.path + ".sha256", "w", encoding="utf-8") as f:
+                f.write(head)
+            self.head = head
+            self.count += 1
+            return head
+
+
+def read_session_manifest(path: str):
+    """
+    Read a session manifest and check its hash chain.
+
+    Accepts both the JSONL format and the older pretty-printed JSON array.
+    Returns (entries, chain_ok); entries have the "chain" field removed.
+    A torn final line (crash mid-write) is dropped and reported as not ok.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        data = json.loads(text)
+        return (data if isinstance(data, list) else []), True
+    entries = []
+    head = CHAIN_GENESIS
+    ok = True
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            rec = json.loads(line)
+        except Exception:
+            ok = False
+            continue
+        chain = rec.pop("chain", None)
+        head = _chain_next(head, rec)
+        if chain != head:
+            ok = False
+        entries.append(rec)
+    return entries, ok
+
+
+def export_session_manifest_json(jsonl_path: str, json_path: str = "") -> str:
+    """Write the legacy JSON-array form of a session manifest; returns its path."""
+    entries, _ok = read_session_manifest(jsonl_path)
+    if not json_path:
+        json_path = os.path.splitext(jsonl_path)[0] + ".json"
+    tmp = json_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=2)
+    os.replace(tmp, json_path)
+    return json_path
+
+
+# ---------- Run journal (crash/cancel recovery) ----------
+
+J_SYNTHESIZED = "synthesized"   # raw API audio on disk
+J_CONVERTED = "converted"       # slideNN.wav final; wav_sha256 is its hash
+J_INSERTED = "inserted"         # attached in PowerPoint, not yet saved
+J_SAVED = "saved"               # deck saved with this slide's audio
+J_SKIPPED_ATTACH = "skipped_attach"
+
+_J_ORDER = {J_SYNTHESIZED: 1, J_CONVERTED: 2, J_INSERTED: 3, J_SAVED: 4, J_SKIPPED_ATTACH: 4}
+
+
+def journal_path(logs_dir: str, deck_path: str) -> str:
+    """Stable per-deck journal path (unlike the timestamped session manifest)."""
+    return os.path.join(logs_dir, f"{deck_tag(deck_path)}_journal.jsonl")
+
+
+class RunJournal:
+    """
+    Append-only JSONL journal shared by the pipeline threads.
+
+    Each run starts the file afresh (the caller carries finished slides over
+    from the previous run first), then only ever appends. Every line is
+    flushed as written, so a crash loses at most the line in flight; readers
+    skip a torn final line.
+    """
+
+    def __init__(self, path: str, run_id: str):
+        self.path = path
+        self.run_id = run_id
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._f = open(path, "w", encoding="utf-8")
+        except Exception:
+            self._f = None  # journaling is best-effort; the run itself goes on
+
+    def _write(self, rec: dict) -> None:
+        rec = dict(rec, run=self.run_id, ts=time.strftime("%Y-%m-%dT%H:%M:%S"))
+        line = json.dumps(rec, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            if self._f is None:
+                return
+            try:
+                self._f.write(line + "\n")
+                self._f.flush()
+            except Exception:
+                pass
+
+    def begin(self, deck_path: str, slides, audio_only: bool) -> None:
+        self._write({"evt": "run_start", "deck": os.path.abspath(deck_path),
+                     "slides": list(slides), "audio_only": bool(audio_only)})
+
+    def slide(self, idx: int, state: str, **fields) -> None:
+        self._write(dict(fields, evt="slide", slide=int(idx), state=state))
+
+    def end(self, status: str) -> None:
+        self._write({"evt": "run_end", "status": status})
+
+    def close(self) -> None:
+        with self._lock:
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+
+
+def load_last_run(path: str):
+    """
+    Replay the journal and summarize its most recent run.
+
+    Returns None when there is no journal, else
+    {"run", "deck", "audio_only", "status", "slides": {idx: merged record}}
+    where status is the run_end status or None if the run never finished.
+    """
+    runs = {}
+    last = None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except Exception:
+                    continue  # torn line from a crash
+                rid = rec.get("run")
+                if rec.get("evt") == "run_start":
+                    runs[rid] = {"run": rid, "deck": rec.get("deck"), "audio_only": rec.get("audio_only", False),
+                                 "status": None, "slides": {}}
+                    last = rid
+                elif rid in runs and rec.get("evt") == "slide":
+                    slides = runs[rid]["slides"]
+                    idx = int(rec.get("slide", 0))
+                    cur = slides.get(idx, {})
+                    # Keep the furthest state; later fields (hashes) override
+                    if _J_ORDER.get(rec.get("state"), 0) >= _J_ORDER.get(cur.get("state"), 0):
+                        cur = dict(cur, **rec)
+                    slides[idx] = cur
+                elif rid in runs and rec.get("evt") == "run_end":
+                    runs[rid]["status"] = rec.get("status")
+    except FileNotFoundError:
+        return None
+    except Exception:
+        return None
+    return runs.get(last)
+
+
+def resume_plan(last_run: dict, jobs: list, *, voice_id: str, settings_hash: str, audio_only: bool,
+                wav_path_for, file_sha256) -> tuple:
+    """
+    Split (idx, note) jobs using an interrupted run's journal.
+
+    Returns (remaining_jobs, done_slides, reuse) where done_slides finished
+    last time with identical inputs, and reuse maps slide -> journal record
+    for slides whose converted WAV is still on disk with a matching hash
+    (they skip synthesis and go straight to insertion).
+    """
+    if not last_run or last_run.get("status") == "complete":
+        return jobs, [], {}
+    slides = last_run.get("slides") or {}
+    done_state = J_CONVERTED if audio_only else J_SAVED
+    remaining, done, reuse = [], [], {}
+    for idx, note in jobs:
+        rec = slides.get(idx)
+        if (not rec or rec.get("text_sha256") != text_sha256(note) or rec.get("voice_id") != voice_id
+                or rec.get("settings_sha256") != settings_hash):
+            remaining.append((idx, note))
+            continue
+        state_rank = _J_ORDER.get(rec.get("state"), 0)
+        wav_ok = False
+        if state_rank >= _J_ORDER[J_CONVERTED] and rec.get("wav_sha256"):
+            wav_ok = file_sha256(wav_path_for(idx)) == rec.get("wav_sha256")
+        if wav_ok and (state_rank >= _J_ORDER[done_state] or rec.get("state") == J_SKIPPED_ATTACH):
+            done.append(idx)
+            continue
+        if wav_ok:
+            reuse[idx] = rec
+        remaining.append((idx, note))
+    return remaining, done, reuse
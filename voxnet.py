@@ -0,0 +1,409 @@
+"""
+voxnet.py
+Network telemetry and asyncio HTTP client for Voxsmith.
+
+log_net() writes the one-line "NET" record every outbound call logs, so the
+blocking requests path and the asyncio path report identically. log_tts()
+adds a NET_TTS record per finished synthesis (characters and time to the
+last byte); the pre-run estimator falls back on these.
+
+shared_session() is the process-wide requests session: allowlisted, pooled
+(keep-alive, so a slide's TTS request doesn't pay a fresh TCP+TLS
+handshake), safe to share between worker threads, and logging a NET line
+with connection-reuse counters for every call. ensure_pool_size() grows its
+pool to match the synthesis concurrency before a run.
+
+AsyncVoxClient runs the app's ElevenLabs calls (voice list, previews) on an
+event loop over one keep-alive connection pool, so they don't each need a
+thread. Narration synthesis stays on voxtts.synthesize() worker threads. It applies the same domain allowlist as
+make_voxsmith_session() and the same redacted telemetry. LoopThread hosts
+that loop for the Tk app and other blocking callers.
+
+For tests, point api_base at a local fake server and add its host to
+allowed_domains:
+
+    AsyncVoxClient(api_base="http://127.0.0.1:8765", allowed_domains={"127.0.0.1"})
+
+aiohttp is optional; without it `available()` is False and callers keep
+using the requests session.
+"""
+import json
+import time
+import asyncio
+import logging
+import threading
+import urllib.parse
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import voxtts
+from voxsecurity.allowlist import ALLOWED_DOMAINS, check_url, make_voxsmith_session
+from voxsecurity.redaction import redact
+
+try:
+    import aiohttp
+except Exception:
+    aiohttp = None
+
+try:
+    import certifi
+except Exception:
+    certifi = None
+
+API_BASE = "https://api.elevenlabs.io"
+# Idle keep-alive connections are dropped after this many seconds
+KEEPALIVE_SECONDS = 30
+# Pooled connections kept beyond the TTS workers, for voice lists, previews and quota checks
+POOL_HEADROOM = 2
+
+
+def available() -> bool:
+    return aiohttp is not None
+
+
+def log_net(method: str, url: str, status=None, elapsed_ms=None, size_bytes=None, headers=None,
+            verbose=False, app_version="v?", logger=None, conn=None) -> None:
+    """
+    Log one outbound request: a short line, or the full JSON record when verbose.
+
+    conn is an optional connection_stats() dict; its counters are appended
+    so the log shows how many requests rode on an existing connection.
+    """
+    logger = logger or logging.getLogger("voxsmith")
+    method = method.upper()
+    try:
+        path_only = urllib.parse.urlsplit(url).path
+        headers = headers or {}
+        rid = headers.get("x-request-id") or headers.get("x-amzn-requestid") or headers.get("request-id")
+        date_hdr = headers.get("date")
+        retry_after = headers.get("retry-after")
+    except Exception:
+        path_only, rid, date_hdr, retry_after = url, None, None, None
+    try:
+        if verbose:
+            logger.info(redact(json.dumps({
+                "evt": "net",
+                "method": method,
+                "path": path_only,
+                "status": status,
+                "ms": elapsed_ms,
+                "bytes": size_bytes,
+                "date": date_hdr,
+                "rid": rid,
+                "retry_after": retry_after,
+                "ua_ver": app_version,
+                **({"conn_reused": conn["reused"], "conn_opened": conn["opened"]} if conn else {}),
+            }, ensure_ascii=False)))
+        else:
+            reuse = f" reused={conn['reused']}/{conn['requests']}" if conn else ""
+            logger.info(redact(f"NET {method} {path_only} status={status} ms={elapsed_ms} bytes={size_bytes}{reuse}"))
+    except Exception:
+        logger.info(redact(f"NET {method} {path_only} status={status} ms={elapsed_ms} bytes={size_bytes} "
+                           f"rid={rid} date={date_hdr} retry_after={retry_after}"))
+    if status in (401, 403):
+        logger.info(redact("AUTH issue: 401/403 from ElevenLabs. Check API key in Credential Manager."))
+
+
+def log_tts(url: str, chars: int, elapsed_ms: int, size_bytes=None, verbose=False, app_version="v?",
+            logger=None) -> None:
+    """
+    Log one completed synthesis: characters sent and time until the last
+    audio byte. voxestimate reads these NET_TTS lines when it has no
+    samples file of its own yet.
+    """
+    logger = logger or logging.getLogger("voxsmith")
+    try:
+        path_only = urllib.parse.urlsplit(url).path
+    except Exception:
+        path_only = url
+    if verbose:
+        logger.info(redact(json.dumps({"evt": "net_tts", "path": path_only, "chars": chars, "ms": elapsed_ms,
+                                       "bytes": size_bytes, "ua_ver": app_version}, ensure_ascii=False)))
+    else:
+        logger.info(redact(f"NET_TTS {path_only} chars={chars} ms={elapsed_ms} bytes={size_bytes}"))
+
+
+def _retry_policy():
+    # Idempotent calls only; TTS POSTs are retried by voxtts.synthesize(), which also paces 429s
+    retry_kwargs = dict(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504), raise_on_status=False)
+    try:
+        return Retry(allowed_methods=frozenset(["GET", "PUT", "DELETE", "HEAD", "OPTIONS"]), **retry_kwargs)
+    except TypeError:
+        return Retry(method_whitelist=frozenset(["GET", "PUT", "DELETE", "HEAD", "OPTIONS"]), **retry_kwargs)
+
+
+def _mount_pool(session, size: int) -> None:
+    if getattr(session, "voxnet_pool_size", None) is not None:
+        session.voxnet_carry = connection_stats(session)  # keep the counters of the pool being replaced
+    adapter = HTTPAdapter(max_retries=_retry_policy(), pool_connections=4, pool_maxsize=size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.voxnet_pool_size = size
+
+
+def make_pooled_session(pool_size: int = voxtts.DEFAULT_CONCURRENCY + POOL_HEADROOM, user_agent: str = None,
+                        verbose=False, app_version="v?"):
+    """
+    An allowlisted requests session with a keep-alive pool of pool_size
+    connections per host, which logs a NET line (with reuse counters) for
+    every request. Prefer shared_session(); build your own only for tests.
+    """
+    s = make_voxsmith_session()
+    _mount_pool(s, max(1, int(pool_size)))
+    if certifi is not None:
+        s.verify = certifi.where()  # pinned CA bundle for frozen builds
+    if user_agent:
+        s.headers.update({"User-Agent": user_agent})
+    s.voxnet_verbose = verbose
+    s.voxnet_app_version = app_version
+    checked_request = s.request
+
+    def logged_request(method, url, *a, **kw):
+        t0 = time.perf_counter()
+        resp = None
+        try:
+            resp = checked_request(method, url, *a, **kw)
+            return resp
+        finally:
+            size = None
+            try:
+                if resp is not None:
+                    size = int(resp.headers.get("content-length") or 0) or None
+            except Exception:
+                pass
+            log_net(method, url, getattr(resp, "status_code", None), int((time.perf_counter() - t0) * 1000),
+                    size, getattr(resp, "headers", None), verbose=s.voxnet_verbose, app_version=app_version,
+                    conn=connection_stats(s))
+
+    s.request = logged_request
+    return s
+
+
+_SHARED = None
+_SHARED_LOCK = threading.Lock()
+
+
+def shared_session(**kwargs):
+    """The process-wide pooled session, created on first call (kwargs apply only then)."""
+    global _SHARED
+    with _SHARED_LOCK:
+        if _SHARED is None:
+            _SHARED = make_pooled_session(**kwargs)
+        return _SHARED
+
+
+def ensure_pool_size(session, workers: int) -> None:
+    """Grow a pooled session's per-host pool to cover `workers` concurrent requests (never shrinks)."""
+    current = getattr(session, "voxnet_pool_size", None)
+    if current is None:
+        return  # not one of ours
+    size = max(1, int(workers)) + POOL_HEADROOM
+    with _SHARED_LOCK:
+        if size > session.voxnet_pool_size:
+            # Requests already in flight keep their connections from the old adapter
+            _mount_pool(session, size)
+
+
+def connection_stats(session) -> dict:
+    """
+    Cumulative {"requests", "opened", "reused"} across the session's pools.
+    `opened` counts TCP(+TLS) connections made; the rest reused a kept-alive one.
+    """
+    carry = getattr(session, "voxnet_carry", None) or {}
+    requests_n = carry.get("requests", 0)
+    opened = carry.get("opened", 0)
+    seen = set()
+    try:
+        for adapter in session.adapters.values():
+            if id(adapter) in seen:
+                continue
+            seen.add(id(adapter))
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                requests_n += getattr(pool, "num_requests", 0)
+                opened += getattr(pool, "num_connections", 0)
+    except Exception:
+        pass
+    return {"requests": requests_n, "opened": opened, "reused": max(0, requests_n - opened)}
+
+
+class AsyncResponse:
+    """Buffered response with the parts of requests.Response Voxsmith reads."""
+
+    def __init__(self, url, status_code, headers, content=b""):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return (self.content or b"").decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class AsyncVoxClient:
+    """
+    asyncio HTTP client for the ElevenLabs API.
+
+    Create it anywhere, but use it on one event loop; the aiohttp session is
+    opened on first use. max_connections caps the pool - set it to the
+    plan's concurrency so requests queue locally rather than drawing 429s.
+    """
+
+    def __init__(self, *, api_base: str = API_BASE, allowed_domains=None, timeout=120,
+                 max_connections: int = voxtts.MAX_CONCURRENCY, max_attempts=3, backoff_base=0.75,
+                 user_agent: str = None, verbose=False, app_version="v?", ssl=None):
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is not installed")
+        self.api_base = api_base.rstrip("/")
+        self.allowed_domains = set(ALLOWED_DOMAINS if allowed_domains is None else allowed_domains)
+        self.timeout = timeout
+        self.max_connections = max(1, int(max_connections))
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff_base = backoff_base
+        self.user_agent = user_agent
+        self.verbose = verbose
+        self.app_version = app_version
+        self.ssl = ssl
+        self._session = None
+
+    async def __aenter__(self):
+        self._get_session()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=KEEPALIVE_SECONDS,
+                                             ssl=self.ssl)
+            headers = {"User-Agent": self.user_agent} if self.user_agent else None
+            self._session = aiohttp.ClientSession(connector=connector, headers=headers,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def url(self, path: str) -> str:
+        return f"{self.api_base}/{path.lstrip('/')}"
+
+    def _log(self, method, url, status, t0, size, headers):
+        log_net(method, url, status, int((time.perf_counter() - t0) * 1000), size, headers,
+                verbose=self.verbose, app_version=self.app_version)
+
+    async def request(self, method: str, url: str, *, headers=None, json=None, params=None,
+                      timeout=None) -> AsyncResponse:
+        """
+        Send one request and read the whole body. Redirects are returned, not
+        followed, so every host contacted has passed the allowlist. Raises
+        DomainNotAllowed or aiohttp errors.
+        """
+        check_url(url, self.allowed_domains)
+        t0 = time.perf_counter()
+        status = size = resp_headers = None
+        try:
+            kw = {"headers": headers, "json": json, "params": params, "allow_redirects": False}
+            if timeout is not None:
+                kw["timeout"] = aiohttp.ClientTimeout(total=timeout)
+            async with self._get_session().request(method.upper(), url, **kw) as resp:
+                status, resp_headers = resp.status, resp.headers
+                body = await resp.read()
+                size = len(body)
+                return AsyncResponse(str(resp.url), status, resp_headers, body)
+        finally:
+            self._log(method, url, status, t0, size, resp_headers)
+
+    async def fetch_voices(self, api_key: str):
+        """[(name, voice_id), ...] sorted by name; RuntimeError on API or network failure."""
+        if not api_key.strip():
+            raise ValueError("Missing API key")
+        url = self.url("/v1/voices")
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                resp = await self.request("GET", url, headers={"xi-api-key": api_key})
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempts < self.max_attempts:
+                    await asyncio.sleep(self.backoff_base * (2 ** (attempts - 1)))
+                    continue
+                raise RuntimeError(f"Network error: {e}") from e
+            if resp.status_code == 200:
+                out = []
+                for v in resp.json().get("voices", []):
+                    nm = (v.get("name") or "").strip() or "(unnamed voice)"
+                    vid = v.get("voice_id") or ""
+                    if vid:
+                        out.append((nm, vid))
+                out.sort(key=lambda x: x[0].lower())
+                return out
+            if 500 <= resp.status_code < 600 and attempts < self.max_attempts:
+                await asyncio.sleep(self.backoff_base * (2 ** (attempts - 1)))
+                continue
+            raise RuntimeError(pretty_api_error(resp))
+
+
+def pretty_api_error(resp):
+    try:
+        data = resp.json()
+    except Exception:
+        data = None
+    msg = None
+    if isinstance(data, dict):
+        d = data.get("detail")
+        if isinstance(d, dict):
+            msg = d.get("message") or d.get("error")
+        elif isinstance(d, list) and d:
+            msg = d[0].get("message") if isinstance(d[0], dict) else str(d[0])
+        elif isinstance(d, str):
+            msg = d
+        if not msg:
+            msg = data.get("message") or data.get("error")
+    if not msg:
+        msg = resp.text.strip()
+    return f"HTTP {resp.status_code}: {msg}" if msg else f"HTTP {resp.status_code}"
+
+
+class LoopThread:
+    """
+    An asyncio event loop on a daemon thread, for callers that block.
+
+    submit(coro) returns a concurrent.futures.Future; run(coro) waits for it.
+    One LoopThread (and one AsyncVoxClient on it) can serve the whole app.
+    """
+
+    def __init__(self, name="voxnet"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._main, name=name, daemon=True)
+        self._thread.start()
+
+    def _main(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        return self.submit(coro).result(timeout)
+
+    def stop(self, client=None, timeout=5) -> None:
+        """Close the client (if given) on the loop, then stop the loop."""
+        if client is not None:
+            try:
+                self.run(client.close(), timeout)
+            except Exception:
+                pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
@@ -0,0 +1,525 @@
+"""
+voxnotes.py
+Fast speaker-notes reader for Voxsmith.
+
+python-pptx's Presentation() parses every slide, layout and master (and
+touches every media part) before the first note can be read, which takes
+tens of seconds and a lot of memory on 300-500 MB media-heavy decks.
+DeckNotes opens the .pptx as a zip instead and reads only what narration
+needs: the slide list from presentation.xml, then - per selected slide -
+the slide's relationships and its notes part, streamed with iterparse.
+Media is never read.
+
+The text matches the python-pptx path exactly:
+  notes_text(i)  == slide.notes_slide.notes_text_frame.text
+  slide_text(i)  == voxcore.extract_slide_text(slide)
+
+load_index() keeps a per-deck JSON index of that text (plus hashes) so a
+run, a changed-only diff or a preview doesn't have to reparse the deck at
+all. It is keyed on the deck's size and mtime; when those move, each
+slide's entry is checked against the CRCs of the zip entries it was built
+from (slide, rels, notes, layout, master - read from the central
+directory, nothing is decompressed) and only the stale slides a run
+selected are reparsed, on a process pool when there are many.
+
+Benchmark against Presentation() (needs python-pptx):
+    python voxnotes.py deck.pptx [--slides 1-10]
+"""
+import os
+import sys
+import json
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+import voxmanifest
+
+_P = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+_R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_RT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/"
+
+RT_OFFICE_DOCUMENT = _RT + "officeDocument"
+RT_SLIDE = _RT + "slide"
+RT_NOTES_SLIDE = _RT + "notesSlide"
+RT_SLIDE_LAYOUT = _RT + "slideLayout"
+RT_SLIDE_MASTER = _RT + "slideMaster"
+
+# Shape elements python-pptx yields from a shape tree
+_SHAPE_TAGS = {_P + "sp", _P + "grpSp", _P + "graphicFrame", _P + "cxnSp", _P + "pic", _P + "contentPart"}
+
+# Layout placeholder type -> master placeholder it inherits position from (python-pptx's mapping)
+_MASTER_PH_TYPE = {
+    "body": "body", "chart": "body", "clipArt": "body", "ctrTitle": "title", "dgm": "body",
+    "dt": "dt", "ftr": "ftr", "media": "body", "obj": "body", "pic": "body", "sldNum": "sldNum",
+    "subTitle": "body", "tbl": "body", "title": "title",
+}
+
+
+INDEX_VERSION = 2
+
+# Below this many stale slides a process pool costs more to start than it saves
+POOL_MIN_SLIDES = 24
+POOL_MAX_WORKERS = 8
+
+
+def _part_rels_name(part: str) -> str:
+    d, f = posixpath.split(part)
+    return posixpath.join(d, "_rels", f + ".rels")
+
+
+def paragraph_text(p) -> str:
+    """Text of one a:p the way python-pptx reads it (runs, fields, a:br as vertical tab)."""
+    out = []
+    for child in p:
+        if child.tag in (_A + "r", _A + "fld"):
+            t = child.find(_A + "t")
+            out.append((t.text or "") if t is not None else "")
+        elif child.tag == _A + "br":
+            out.append("\v")
+    return "".join(out)
+
+
+def text_body_text(tx_body) -> str:
+    return "\n".join(paragraph_text(p) for p in tx_body.findall(_A + "p"))
+
+
+def _ph(shape):
+    """The p:ph element of a shape, or None if it isn't a placeholder."""
+    for nv in shape:
+        if nv.tag.startswith(_P + "nv"):
+            nv_pr = nv.find(_P + "nvPr")
+            return nv_pr.find(_P + "ph") if nv_pr is not None else None
+    return None
+
+
+def _shape_id(shape):
+    for nv in shape:
+        if nv.tag.startswith(_P + "nv"):
+            c_nv_pr = nv.find(_P + "cNvPr")
+            if c_nv_pr is not None:
+                return int(c_nv_pr.get("id"))
+    return None
+
+
+def _offset(shape):
+    """(left, top) from the shape's own a:xfrm, either of which may be None."""
+    sp_pr = shape.find(_P + "spPr")
+    off = sp_pr.find(_A + "xfrm/" + _A + "off") if sp_pr is not None else None
+    if off is None:
+        return None, None
+    return int(off.get("x")), int(off.get("y"))
+
+
+class DeckNotes:
+    """
+    Read-only view of a deck's notes (and slide text) straight from the zip.
+
+    Slides are 1-based like Voxsmith's slide ranges. Parts are opened on
+    demand; use as a context manager or call close().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._zip = zipfile.ZipFile(path)
+        self._rels_cache = {}
+        self._ph_cache = {}
+        try:
+            pres = self._target(self._rels(""), RT_OFFICE_DOCUMENT)
+            if pres is None:
+                raise ValueError("not a PowerPoint package (no presentation part)")
+            pres_rels = self._rels(pres)
+            self.slide_parts = [pres_rels[rid][1] for rid in self._slide_ids(pres)]
+        except Exception:
+            self._zip.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.slide_parts)
+
+    def close(self) -> None:
+        self._zip.close()
+
+    def _rels(self, part: str) -> dict:
+        """{rId: (type, target part name)} for part ("" for the package)."""
+        name = _part_rels_name(part) if part else "_rels/.rels"
+        if name in self._rels_cache:
+            return self._rels_cache[name]
+        rels = {}
+        try:
+            root = ET.fromstring(self._zip.read(name))
+        except KeyError:
+            root = None
+        base = posixpath.dirname(part)
+        for rel in (root if root is not None else ()):
+            if rel.get("TargetMode") == "External":
+                continue
+            target = rel.get("Target") or ""
+            target = target[1:] if target.startswith("/") else posixpath.normpath(posixpath.join(base, target))
+            rels[rel.get("Id")] = (rel.get("Type"), target)
+        self._rels_cache[name] = rels
+        return rels
+
+    @staticmethod
+    def _target(rels: dict, rel_type: str):
+        for typ, target in rels.values():
+            if typ == rel_type:
+                return target
+        return None
+
+    def _slide_ids(self, pres: str) -> list:
+        # presentation.xml can be large (custom shows, embedded fonts list); stop after the slide list
+        ids = []
+        with self._zip.open(pres) as f:
+            for event, elem in ET.iterparse(f, events=("end",)):
+                if elem.tag == _P + "sldId":
+                    ids.append(elem.get(_R + "id"))
+                elif elem.tag == _P + "sldIdLst":
+                    break
+        return ids
+
+    def _slide_part(self, idx: int) -> str:
+        if not 1 <= idx <= len(self.slide_parts):
+            raise IndexError(f"slide {idx} out of range (1-{len(self.slide_parts)})")
+        return self.slide_parts[idx - 1]
+
+    def notes_text(self, idx: int) -> str:
+        """Text of the notes body placeholder of slide idx ("" when the slide has no notes)."""
+        notes = self._target(self._rels(self._slide_part(idx)), RT_NOTES_SLIDE)
+        if notes is None or notes not in self._zip.NameToInfo:
+            return ""
+        with self._zip.open(notes) as f:
+            depth = 0
+            for event, elem in ET.iterparse(f, events=("start", "end")):
+                if elem.tag in _SHAPE_TAGS:
+                    depth += 1 if event == "start" else -1
+                if event != "end" or elem.tag != _P + "sp" or depth != 0:
+                    continue
+                # A top-level shape is complete: python-pptx takes the first body placeholder
+                ph = _ph(elem)
+                if ph is not None and ph.get("type", "obj") == "body":
+                    tx_body = elem.find(_P + "txBody")
+                    return text_body_text(tx_body) if tx_body is not None else ""
+                elem.clear()
+        return ""
+
+    def _tree_shapes(self, part: str) -> list:
+        root = ET.fromstring(self._zip.read(part))
+        sp_tree = root.find(_P + "cSld/" + _P + "spTree")
+        return [el for el in (sp_tree if sp_tree is not None else ()) if el.tag in _SHAPE_TAGS]
+
+    def _placeholders(self, part: str) -> list:
+        """[(type, idx, left, top)] for the placeholders of a layout or master part."""
+        if part not in self._ph_cache:
+            out = []
+            for shape in self._tree_shapes(part):
+                ph = _ph(shape)
+                if ph is not None:
+                    out.append((ph.get("type", "obj"), int(ph.get("idx", "0")), *_offset(shape)))
+            self._ph_cache[part] = out
+        return self._ph_cache[part]
+
+    def _inherited_offset(self, slide_part: str, ph_idx: int):
+        layout = self._target(self._rels(slide_part), RT_SLIDE_LAYOUT)
+        if layout is None:
+            return None, None
+        for typ, idx, left, top in self._placeholders(layout):
+            if idx != ph_idx:
+                continue
+            if left is not None and top is not None:
+                return left, top
+            master = self._target(self._rels(layout), RT_SLIDE_MASTER)
+            want = _MASTER_PH_TYPE.get(typ)
+            if master is None or want is None:
+                return left, top
+            for m_typ, _m_idx, m_left, m_top in self._placeholders(master):
+                if m_typ == want:
+                    return (left if left is not None else m_left), (top if top is not None else m_top)
+            return left, top
+        return None, None
+
+    def dependencies(self, idx: int) -> dict:
+        """{zip entry: CRC-32} for every part slide idx's notes and slide text are read from."""
+        part = self._slide_part(idx)
+        names = [part, _part_rels_name(part)]
+        rels = self._rels(part)
+        for rel_type in (RT_NOTES_SLIDE, RT_SLIDE_LAYOUT):
+            target = self._target(rels, rel_type)
+            if target is not None:
+                names.append(target)
+        layout = self._target(rels, RT_SLIDE_LAYOUT)
+        if layout is not None:
+            names.append(_part_rels_name(layout))
+            master = self._target(self._rels(layout), RT_SLIDE_MASTER)
+            if master is not None:
+                names.append(master)
+        info = self._zip.NameToInfo
+        return {n: info[n].CRC if n in info else None for n in names}
+
+    def slide_xml(self, idx: int) -> bytes:
+        """The raw slide part (for voxanimate.snapshot_from_timing_xml)."""
+        return self._zip.read(self._slide_part(idx))
+
+    def slide_text(self, idx: int) -> str:
+        """
+        Same result as voxcore.extract_slide_text(): text of the slide's
+        top-level text shapes except the title, in top-to-bottom then
+        left-to-right order, one shape per line.
+        """
+        part = self._slide_part(idx)
+        shapes = self._tree_shapes(part)
+        title_id = None
+        for shape in shapes:
+            ph = _ph(shape)
+            if ph is not None and ph.get("type", "obj") == "title":
+                title_id = _shape_id(shape)
+                break
+        items = []
+        for shape in shapes:
+            if _shape_id(shape) == title_id or shape.tag != _P + "sp":
+                continue  # title, groups, tables, pictures, connectors
+            tx_body = shape.find(_P + "txBody")
+            if tx_body is None:
+                continue
+            text = text_body_text(tx_body).strip()
+            if not text:
+                continue
+            left, top = _offset(shape)
+            ph = _ph(shape)
+            if ph is not None:
+                # Placeholders without their own position inherit it from the layout, then the master
+                base_left, base_top = self._inherited_offset(part, int(ph.get("idx", "0")))
+                left = left if left is not None else base_left
+                top = top if top is not None else base_top
+            items.append((top, left, text))
+        items.sort(key=lambda x: (x[0], x[1]))
+        return "\n".join(item[2] for item in items)
+
+
+# ---------- Notes index (one JSON file per deck, in the settings folder) ----------
+
+def index_path(index_dir: str, deck_path: str) -> str:
+    """One index per deck, named like its narration manifest."""
+    return voxmanifest.deck_manifest_path(index_dir, deck_path)
+
+
+def _index_entry(deck: DeckNotes, idx: int) -> dict:
+    entry = {"part": deck.slide_parts[idx - 1], "deps": deck.dependencies(idx)}
+    entry["notes"] = deck.notes_text(idx)
+    try:
+        entry["slide_text"] = deck.slide_text(idx)
+    except Exception as e:
+        # Kept so DeckIndex.slide_text() fails the same way the live reader would
+        entry["slide_text"] = ""
+        entry["slide_text_error"] = f"{type(e).__name__}: {e}"
+    entry["notes_sha256"] = voxmanifest.text_sha256(entry["notes"])
+    entry["slide_text_sha256"] = voxmanifest.text_sha256(entry["slide_text"])
+    return entry
+
+
+def _index_slides(path: str, indexes: list) -> dict:
+    """Process-pool job: index entries for a batch of slides of one deck."""
+    with DeckNotes(path) as deck:
+        return {idx: _index_entry(deck, idx) for idx in indexes}
+
+
+class DeckIndex:
+    """
+    Cached notes and slide text for a deck, with DeckNotes' reading
+    interface so run_narration can use either. .count is the deck's slide
+    count; .slides may hold only the slides a run asked for. .reparsed is
+    the number of slides that had to be read from the deck when the index
+    was loaded.
+    """
+
+    def __init__(self, path: str, deck_path: str, slides=None, stamp=None, count=0):
+        self.path = path
+        self.deck_path = os.path.abspath(deck_path)
+        self.slides = slides or {}
+        self.stamp = stamp
+        self.count = count
+        self.reparsed = 0
+
+    def __len__(self):
+        return self.count
+
+    def close(self) -> None:
+        pass
+
+    def notes_text(self, idx: int) -> str:
+        return self._entry(idx)["notes"]
+
+    def slide_text(self, idx: int) -> str:
+        entry = self._entry(idx)
+        if entry.get("slide_text_error"):
+            raise ValueError(entry["slide_text_error"])
+        return entry["slide_text"]
+
+    def _entry(self, idx: int) -> dict:
+        try:
+            return self.slides[int(idx)]
+        except KeyError:
+            if 1 <= int(idx) <= self.count:
+                raise IndexError(f"slide {idx} is not in the notes index") from None
+            raise IndexError(f"slide {idx} out of range (1-{self.count})") from None
+
+    @classmethod
+    def load(cls, path: str, deck_path: str = ""):
+        ix = cls(path, deck_path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict) and data.get("version") == INDEX_VERSION:
+                ix.slides = {int(k): v for k, v in (data.get("slides") or {}).items() if isinstance(v, dict)}
+                ix.stamp = data.get("stamp")
+                ix.count = int(data.get("count") or 0)
+        except Exception:
+            pass
+        return ix
+
+    def save(self) -> bool:
+        """Write atomically."""
+        data = {
+            "version": INDEX_VERSION,
+            "deck": self.deck_path,
+            "stamp": self.stamp,
+            "count": self.count,
+            "slides": {str(k): self.slides[k] for k in sorted(self.slides)},
+        }
+        tmp = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, self.path)
+            return True
+        except Exception:
+            try:
+                os.remove(tmp)
+            except Exception:
+                pass
+            return False
+
+
+def _deck_stamp(deck_path: str) -> list:
+    st = os.stat(deck_path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def load_index(deck_path: str, index_dir: str, workers=None, select=None) -> DeckIndex:
+    """
+    Up-to-date DeckIndex for deck_path, reparsing only the slides whose zip
+    entries changed since the index was written. select maps the deck's
+    slide count to the slides wanted (default: all); other slides are only
+    carried over from the existing index, never parsed. workers caps the
+    process pool (default: CPU count, at most POOL_MAX_WORKERS; 1 disables
+    it, as does running as a frozen app). Raises like DeckNotes() when the
+    deck can't be read.
+    """
+    ix = DeckIndex.load(index_path(index_dir, deck_path), deck_path)
+    stamp = _deck_stamp(deck_path)
+    if ix.count and ix.stamp == stamp:
+        wanted = select(ix.count) if select else range(1, ix.count + 1)
+        if all(idx in ix.slides for idx in wanted):
+            return ix
+
+    with DeckNotes(deck_path) as deck:
+        count = len(deck)
+        wanted = set(select(count) if select else range(1, count + 1))
+        slides = {}
+        stale = []
+        for idx in range(1, count + 1):
+            old = ix.slides.get(idx)
+            if old and old.get("part") == deck.slide_parts[idx - 1] and old.get("deps") == deck.dependencies(idx):
+                slides[idx] = old
+            elif idx in wanted:
+                stale.append(idx)
+        if workers is None:
+            workers = 1 if getattr(sys, "frozen", False) else min(os.cpu_count() or 1, POOL_MAX_WORKERS)
+        if len(stale) < POOL_MIN_SLIDES or workers <= 1:
+            for idx in stale:
+                slides[idx] = _index_entry(deck, idx)
+        else:
+            slides.update(_index_parallel(deck_path, stale, workers, deck))
+
+    ix.slides = slides
+    ix.stamp = stamp
+    ix.count = count
+    ix.reparsed = len(stale)
+    ix.save()
+    return ix
+
+
+def _index_parallel(deck_path: str, stale: list, workers: int, deck: DeckNotes) -> dict:
+    from concurrent.futures import ProcessPoolExecutor
+
+    # A few batches per worker keeps the pool busy without pickling per slide
+    size = max(4, -(-len(stale) // (workers * 4)))
+    batches = [stale[i:i + size] for i in range(0, len(stale), size)]
+    out = {}
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as pool:
+            for result in pool.map(_index_slides, [deck_path] * len(batches), batches):
+                out.update(result)
+    except Exception:
+        # No usable worker processes (frozen app, restricted host): do it here
+        for idx in stale:
+            if idx not in out:
+                out[idx] = _index_entry(deck, idx)
+    return out
+
+
+def _benchmark(argv=None) -> int:
+    import time
+    import argparse
+    import tracemalloc
+
+    ap = argparse.ArgumentParser(prog="voxnotes", description="Compare DeckNotes with python-pptx on a deck.")
+    ap.add_argument("deck")
+    ap.add_argument("--slides", default="", help='slide range, e.g. "1-5,8" (default: all)')
+    ap.add_argument("--repeat", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    from voxcore import select_slides, PptxNotes
+
+    def read(opener):
+        deck = opener(args.deck)
+        try:
+            out = {}
+            for i in select_slides(len(deck), args.slides):
+                try:
+                    text = deck.slide_text(i)
+                except Exception as e:
+                    text = f"<error {type(e).__name__}>"
+                out[i] = (deck.notes_text(i), text)
+            return out
+        finally:
+            deck.close()
+
+    results = {}
+    for name, opener in (("python-pptx", PptxNotes), ("DeckNotes", DeckNotes)):
+        best = None
+        for _ in range(max(1, args.repeat)):
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            out = read(opener)
+            elapsed = time.perf_counter() - t0
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = out
+        print(f"{name:12s} {best * 1000:9.1f} ms   peak {peak / 1048576:7.1f} MiB   {len(out)} slide(s)")
+    a, b = results["python-pptx"], results["DeckNotes"]
+    diff = [i for i in a if a[i] != b.get(i)]
+    print("identical text" if not diff else f"text differs on slide(s): {diff}")
+    return 1 if diff else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(_benchmark())
@@ -11,14 +11,18 @@ ALLOWED_DOMAINS = {
 class DomainNotAllowed(Exception):
     pass
 
+def check_url(url, allowed=None):
+    """Raise DomainNotAllowed unless the URL's host is on the allowlist."""
+    host = urlparse(url).hostname
+    if host not in (ALLOWED_DOMAINS if allowed is None else allowed):
+        raise DomainNotAllowed(f"Blocked domain: {host}")
+
 def make_voxsmith_session():
     s = requests.Session()
     old_request = s.request
 
     def checked_request(method, url, *a, **kw):
-        host = urlparse(url).hostname
-        if host not in ALLOWED_DOMAINS:
-            raise DomainNotAllowed(f"Blocked domain: {host}")
+        check_url(url)
         return old_request(method, url, *a, **kw)
 
     s.request = checked_request
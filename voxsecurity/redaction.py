@@ -0,0 +1,21 @@
+import re
+
+# Secrets and personal data that must never reach logs or the UI
+REDACTION_PATTERNS = [
+    (re.compile(r"(xi-api-key:\s*)([A-Za-z0-9_\-]{10,})", re.IGNORECASE), r"\1[REDACTED]"),
+    (re.compile(r"(Authorization:\s*Bearer\s+)([_A-Za-z0-9\.\-]{10,})", re.IGNORECASE), r"\1[REDACTED]"),
+    (re.compile(r"([?&](?:xi-api-key|api_key|apikey|token)=)([^&\s]{6,})", re.IGNORECASE), r"\1[REDACTED]"),
+    (re.compile(r"[A-Fa-f0-9]{8}-[A-Fa-f0-9]{4}-[A-Fa-f0-9]{4}-[A-Fa-f0-9]{4}-[A-Fa-f0-9]{12}"), "[REDACTED]"),
+    (re.compile(r"[A-Za-z0-9_\-]{32,}"), "[REDACTED]"),
+    (re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}"), "[REDACTED]"),
+]
+
+
+def redact(s: str) -> str:
+    try:
+        out = str(s)
+        for pat, repl in REDACTION_PATTERNS:
+            out = re.sub(pat, repl, out)
+        return out
+    except Exception:
+        return str(s)
@@ -4,10 +4,12 @@ import json
 import re
 import keyring
 import threading
+import multiprocessing
 import time
 import hashlib
 import subprocess
 import tempfile
+import ssl
 import traceback
 import shutil
 import tkinter as tk
@@ -15,128 +17,35 @@ from tkinter import filedialog, messagebox, simpledialog, ttk
 import customtkinter as ctk
 import requests
 import certifi
-from urllib3.util.retry import Retry
-from requests.adapters import HTTPAdapter
-from pptx import Presentation
 
 # --- Security: redaction helpers (Step 5) ---
-REDACTION_PATTERNS = [
-    (re.compile(r"(xi-api-key:\s*)([A-Za-z0-9_\-]{10,})", re.IGNORECASE), r"\1[REDACTED]"),
-    (re.compile(r"(Authorization:\s*Bearer\s+)([_A-Za-z0-9\.\-]{10,})", re.IGNORECASE), r"\1[REDACTED]"),
-    (re.compile(r"([?&](?:xi-api-key|api_key|apikey|token)=)([^&\s]{6,})", re.IGNORECASE), r"\1[REDACTED]"),
-    (re.compile(r"[A-Fa-f0-9]{8}-[A-Fa-f0-9]{4}-[A-Fa-f0-9]{4}-[A-Fa-f0-9]{4}-[A-Fa-f0-9]{12}"), "[REDACTED]"),
-    (re.compile(r"[A-Za-z0-9_\-]{32,}"), "[REDACTED]"),
-    (re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}"), "[REDACTED]"),
-]
+from voxsecurity.redaction import redact as _redact
 import logging
 from logging.handlers import RotatingFileHandler
 import atexit
 from datetime import datetime
 
 # --- Phase C: Network Telemetry Helper ---
-import urllib.parse
 
 def _voxsmith_http(method: str, url: str, **kwargs):
-    """Wrap outbound HTTP with timing and lightweight header logging.
+    """Send one request on the shared pooled session, which does the timing and NET logging.
     Returns (response). Raises requests exceptions like the underlying call.
     """
-    logger = logging.getLogger("voxsmith")
-    t0 = time.perf_counter()
-    try:
-        sess = make_voxsmith_session()
-    except Exception:
-        sess = requests.Session()
     if "timeout" not in kwargs:
         kwargs["timeout"] = NET_TIMEOUT if "NET_TIMEOUT" in globals() else 120
-    resp = None
-    err = None
-    try:
-        headers = kwargs.get("headers") or {}
-        headers.setdefault("User-Agent", USER_AGENT)
-        kwargs["headers"] = headers
-        resp = sess.request(method.upper(), url, **kwargs)
-        return resp
-    except Exception as e:
-        err = e
-        raise
-    finally:
-        t1 = time.perf_counter()
-        elapsed_ms = int((t1 - t0) * 1000)
-        try:
-            parts = urllib.parse.urlsplit(url)
-            path_only = parts.path
-            rid = None
-            try:
-                rid = (resp.headers.get("x-request-id") if resp is not None else None) or \
-                      (resp.headers.get("x-amzn-requestid") if resp is not None else None) or \
-                      (resp.headers.get("request-id") if resp is not None else None)
-            except Exception:
-                rid = None
-            date_hdr = None
-            try:
-                date_hdr = resp.headers.get("date") if resp is not None else None
-            except Exception:
-                date_hdr = None
-            retry_after = None
-            try:
-                retry_after = resp.headers.get("retry-after") if resp is not None else None
-            except Exception:
-                retry_after = None
-            size_bytes = None
-            try:
-                if resp is not None:
-                    size_bytes = int(resp.headers.get("content-length") or 0) or (len(resp.content) if getattr(resp, "content", None) is not None else 0)
-            except Exception:
-                size_bytes = None
-            status = getattr(resp, "status_code", None)
-            try:
-                _handle_auth_log(resp)
-            except Exception:
-                pass
-            log_msg = {
-                "evt": "net",
-                "method": method.upper(),
-                "path": path_only,
-                "status": status,
-                "ms": elapsed_ms,
-                "bytes": size_bytes,
-                "date": date_hdr,
-                "rid": rid,
-                "retry_after": retry_after,
-                "ua_ver": globals().get("APP_VERSION", "v?")
-            }
-            try:
-                logger.info(_redact(json.dumps(log_msg, ensure_ascii=False))) if NET_VERBOSE else logger.info(_redact(f"NET {method.upper()} {path_only} status={status} ms={elapsed_ms} bytes={size_bytes}"))
-            except Exception:
-                logger.info(_redact(f"NET {method.upper()} {path_only} status={status} ms={elapsed_ms} bytes={size_bytes} rid={rid} date={date_hdr} retry_after={retry_after}"))
-        except Exception:
-            pass
+    headers = kwargs.get("headers") or {}
+    headers.setdefault("User-Agent", USER_AGENT)
+    kwargs["headers"] = headers
+    return VOX_SESSION.request(method.upper(), url, **kwargs)
 
 
 # [Phase C] network guardrails
-from voxsecurity.allowlist import make_voxsmith_session, DomainNotAllowed
+from voxsecurity.allowlist import DomainNotAllowed
 from voxsecurity.checksum_verify import verify_self
 import time
 
 from voxsecurity.checksum_verify import verify_self
 
-# Single outbound session restricted to approved domains
-VOX_SESSION = make_voxsmith_session()  # api.elevenlabs.io, update.voxsmith.app
-# Back-compat: reuse existing session variable
-_VOX_SESSION = VOX_SESSION
-
-# Phase C: allowlisted HTTP session
-VOX_SESSION = make_voxsmith_session()  # restricts outbound domains
-
-
-def _redact(s: str) -> str:
-    try:
-        out = str(s)
-        for pat, repl in REDACTION_PATTERNS:
-            out = re.sub(pat, repl, out)
-        return out
-    except Exception:
-        return str(s)
 
 class RedactingFilter(logging.Filter):
     def filter(self, record):
@@ -211,7 +120,16 @@ def _configure_file_logger(logger_name="voxsmith"):
 
 
 import voxattach
-import voxanimate
+import voxtts
+import voxcache
+import voxaudio
+import voxcore
+import voxbatch
+import voxnet
+import voxlexicon
+import voxestimate
+from voxcore import (TARGET_SAMPLE_RATE, TARGET_CODEC, TARGET_CHANNELS, write_target_wav,
+                     run_hidden, pretty_api_error)
 
 def attach_audio_for_slide(deck_path: str, slide_index_1based: int, src_audio: str, out_audio: str):
     try:
@@ -263,31 +181,12 @@ USER_AGENT = f"Voxsmith/{APP_VERSION}+{BUILD_HASH}"
 NET_MAX_ATTEMPTS = 3  # 1 initial + 2 retries
 NET_BACKOFF_BASE = 0.75  # seconds; exponential backoff
 NET_TIMEOUT = 120  # seconds per request
-try:
-    _VOX_SESSION = VOX_SESSION
-
-    try:
-        # Configure retries
-        retry_kwargs = dict(total=3, backoff_factor=0.5, status_forcelist=(429,500,502,503,504), raise_on_status=False)
-        try:
-            retry = Retry(allowed_methods=frozenset(["GET","PUT","DELETE","HEAD","OPTIONS"]), **retry_kwargs)
-        except TypeError:
-            retry = Retry(method_whitelist=frozenset(["GET","PUT","DELETE","HEAD","OPTIONS"]), **retry_kwargs)
-        adapter = HTTPAdapter(max_retries=retry, pool_connections=10, pool_maxsize=10)
-        _VOX_SESSION.mount("https://", adapter)
-        _VOX_SESSION.mount("http://", adapter)
-        # Pin CA bundle for frozen builds
-        _VOX_SESSION.verify = certifi.where()
-        # Set a default UA
-        _VOX_SESSION.headers.update({"User-Agent": "Voxsmith/2.14.2 (+https://donburnside.com/voxsmith-2/)"})
-    except Exception:
-        pass
-except Exception:
-    _VOX_SESSION = None
-
-TARGET_SAMPLE_RATE = "44100"
-TARGET_CODEC = "pcm_s16le"
-TARGET_CHANNELS = "2"
+# Single outbound session restricted to approved domains (api.elevenlabs.io, update.voxsmith.app):
+# pooled keep-alive connections, retries for idempotent calls, pinned CA bundle, NET logging.
+# Its pool grows to the synthesis concurrency when a run starts.
+VOX_SESSION = voxnet.shared_session(user_agent=USER_AGENT, verbose=NET_VERBOSE, app_version=APP_VERSION)
+# Back-compat: reuse existing session variable
+_VOX_SESSION = VOX_SESSION
 
 DEFAULT_API_KEY = ""
 DEFAULT_INPUT_FILE = ""
@@ -298,19 +197,16 @@ DEFAULT_FIXED_ONLY = False
 DEFAULT_MAKE_COPY = True
 DEFAULT_HIDE_ICON = True
 
-def _ensure_local_ffmpeg_on_path():
+def normalize_audio(input_file: str, output_file: str):
     try:
-        if getattr(sys, "frozen", False):
-            exe_dir = os.path.dirname(sys.executable)
-        else:
-            exe_dir = os.path.dirname(os.path.abspath(__file__))
-        local_ffmpeg_dir = os.path.join(exe_dir, "ffmpeg")
-        if os.path.isdir(local_ffmpeg_dir):
-            os.environ["PATH"] = local_ffmpeg_dir + os.pathsep + os.environ.get("PATH", "")
-    except Exception:
+        with open(input_file, "rb") as f:
+            out = voxaudio.normalize_wav_bytes(f.read(), int(TARGET_SAMPLE_RATE), int(TARGET_CHANNELS))
+        if out is not None:
+            with open(output_file, "wb") as f:
+                f.write(out)
+            return output_file
+    except OSError:
         pass
-
-def normalize_audio(input_file: str, output_file: str):
     cmd = [
         "ffmpeg", "-y",
         "-i", input_file,
@@ -322,16 +218,10 @@ def normalize_audio(input_file: str, output_file: str):
     subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     return output_file
 
-_ensure_local_ffmpeg_on_path()
+voxcore.ensure_local_ffmpeg_on_path()
 
 def get_settings_dir() -> str:
-    if os.name == "nt":
-        base = os.getenv("APPDATA") or os.path.expanduser("~")
-        return os.path.join(base, APP_NAME)
-    elif sys.platform == "darwin":
-        return os.path.expanduser(f"~/Library/Application Support/{APP_NAME}")
-    else:
-        return os.path.expanduser(f"~/.config/{APP_NAME}")
+    return voxcore.get_settings_dir(APP_NAME)
 
 SETTINGS_DIR = get_settings_dir()
 LOGS_DIR = os.path.join(SETTINGS_DIR, 'logs')
@@ -407,6 +297,23 @@ def get_voices_cache_path() -> str:
     except Exception:
         return ""
 
+# === TTS audio cache helpers ===
+def get_tts_cache_dir() -> str:
+    """Get directory for cached TTS audio."""
+    return os.path.join(get_settings_dir(), "tts_cache")
+
+def make_tts_cache():
+    """Build the TTS audio cache sized from settings (tts_cache_mb)."""
+    try:
+        mb = int(load_settings().get("tts_cache_mb", voxcache.DEFAULT_MAX_MB))
+    except Exception:
+        mb = voxcache.DEFAULT_MAX_MB
+    return voxcache.TTSCache(get_tts_cache_dir(), max_bytes=max(0, mb) * 1024 * 1024)
+
+def get_deck_manifests_dir() -> str:
+    """Get directory for persistent per-deck narration manifests."""
+    return os.path.join(get_settings_dir(), "decks")
+
 def load_voice_cache() -> dict:
     """Load cached voices if valid (age < 1 week, key matches)."""
     try:
@@ -554,26 +461,6 @@ def log_line(w, msg):
     except Exception:
         pass
 
-def run_hidden(cmd_list):
-    kwargs = dict(stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    if os.name == "nt":
-        try:
-            kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
-        except AttributeError:
-            si = subprocess.STARTUPINFO(); si.dwFlags = subprocess.STARTF_USESHOWWINDOW
-            kwargs["startupinfo"] = si
-    return subprocess.run(cmd_list, **kwargs)
-
-def run_ffmpeg_quiet(cmd_list):
-    return run_hidden(cmd_list + ["-hide_banner", "-loglevel", "error"])
-
-def test_ffmpeg_available():
-    try:
-        cp = run_hidden(["ffmpeg", "-version"])
-        return cp.returncode == 0
-    except FileNotFoundError:
-        return False
-
 def open_folder(path: str):
     try:
         if os.name == "nt": os.startfile(path)
@@ -582,29 +469,33 @@ def open_folder(path: str):
     except Exception:
         pass
 
-def pretty_api_error(resp):
-    try:
-        data = resp.json()
-    except Exception:
-        data = None
-    msg = None
-    if isinstance(data, dict):
-        d = data.get("detail")
-        if isinstance(d, dict):
-            msg = d.get("message") or d.get("error")
-        elif isinstance(d, list) and d:
-            msg = d[0].get("message") if isinstance(d[0], dict) else str(d[0])
-        elif isinstance(d, str):
-            msg = d
-        if not msg:
-            msg = data.get("message") or data.get("error")
-    if not msg:
-        msg = resp.text.strip()
-    return f"HTTP {resp.status_code}: {msg}" if msg else f"HTTP {resp.status_code}"
+# Voice list and previews go through one asyncio loop and keep-alive client when aiohttp is present
+_VOX_ASYNC = None
+_VOX_ASYNC_LOCK = threading.Lock()
+
+def get_async_http():
+    """(LoopThread, AsyncVoxClient) shared by the app, or None without aiohttp."""
+    global _VOX_ASYNC
+    if not voxnet.available():
+        return None
+    with _VOX_ASYNC_LOCK:
+        if _VOX_ASYNC is None:
+            loop = voxnet.LoopThread()
+            client = voxnet.AsyncVoxClient(timeout=NET_TIMEOUT, max_attempts=NET_MAX_ATTEMPTS,
+                                           backoff_base=NET_BACKOFF_BASE, user_agent=USER_AGENT,
+                                           verbose=NET_VERBOSE, app_version=APP_VERSION,
+                                           ssl=ssl.create_default_context(cafile=certifi.where()))
+            atexit.register(loop.stop, client)
+            _VOX_ASYNC = (loop, client)
+        return _VOX_ASYNC
 
 def fetch_voices(api_key: str):
     if not api_key.strip():
         raise ValueError("Missing API key")
+    aio = get_async_http()
+    if aio is not None:
+        loop, client = aio
+        return loop.run(client.fetch_voices(api_key))
     url = "https://api.elevenlabs.io/v1/voices"
     h = {"xi-api-key": api_key}
     attempts = 0
@@ -637,33 +528,6 @@ def fetch_voices(api_key: str):
                 continue
             raise RuntimeError(f"Network error: {e}") from e
 
-def select_slides(total: int, spec: str):
-    if not spec.strip():
-        return list(range(1, total + 1))
-    s = set()
-    for part in [p.strip() for p in spec.split(',') if p.strip()]:
-        if '-' in part:
-            a, b = part.split('-', 1)
-            try:
-                st = int(a) if a else 1
-            except Exception:
-                st = 1
-            try:
-                en = int(b) if b else total
-            except Exception:
-                en = total
-            st = max(1, st); en = min(total, en)
-            if st <= en:
-                s.update(range(st, en + 1))
-        else:
-            try:
-                n = int(part)
-                if 1 <= n <= total:
-                    s.add(n)
-            except Exception:
-                pass
-    return sorted(s)
-
 class PreviewPlayer:
     def __init__(self, log_widget, preview_btn, stop_btn, get_preview_text):
         self.log_widget = log_widget
@@ -731,8 +595,12 @@ class PreviewPlayer:
                 h = {"xi-api-key": api_key, "Content-Type": "application/json", "Accept": "audio/wav"}
                 payload = {"text": t, "output_format": "wav", "voice_settings": {"stability": 0.5, "similarity_boost": 0.7}}
                 log_line(self.log_widget, "i Requesting preview...")
-                sess = VOX_SESSION
-                resp = sess.post(url, headers=h, json=payload, timeout=30)
+                aio = get_async_http()
+                if aio is not None:
+                    loop, client = aio
+                    resp = loop.run(client.request("POST", url, headers=h, json=payload, timeout=30))
+                else:
+                    resp = VOX_SESSION.post(url, headers=h, json=payload, timeout=30)
                 if resp.status_code != 200:
                     msg = pretty_api_error(resp)
                     log_line(self.log_widget, f"X Preview failed: {msg}")
@@ -740,16 +608,10 @@ class PreviewPlayer:
                     return
                 ct = (resp.headers.get("Content-Type") or "").lower()
                 ext = ".mp3" if ("mpeg" in ct or "mp3" in ct) else ".wav"
-                with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as src:
-                    src.write(resp.content); src_path = src.name
                 with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as dst:
                     dst_path = dst.name
-                run_ffmpeg_quiet(["ffmpeg","-y","-i",src_path,"-acodec","pcm_s16le","-ar","44100","-ac","2",dst_path])
-                try:
-                    os.remove(src_path)
-                except Exception:
-                    pass
                 self._temp_path = dst_path
+                write_target_wav(resp.content, dst_path, src_suffix=ext)
                 log_line(self.log_widget, "> Playing preview...")
                 self._play_wav_sync(dst_path)
                 log_line(self.log_widget, "OK Preview finished.")
@@ -839,459 +701,137 @@ def _name_looks_like_ng_audio(name: str) -> bool:
     return False
 
 # ------------------------------------------------------------
-# Slide text extraction for "### Read Slide" marker
+# PowerPoint attach routine that removes previous audio for each slide
 # ------------------------------------------------------------
 
-def extract_slide_text(slide):
-    """
-    Extract text from a slide's shapes and text boxes (excluding title).
-    Returns text in natural reading order: top-to-bottom, left-to-right.
-    
-    Excludes:
-    - Title shapes (first shape with title placeholder)
-    - Grouped objects
-    - Tables
-    
-    Returns:
-        str: Extracted text with newlines between shapes
-    """
-    from pptx.enum.shapes import MSO_SHAPE_TYPE, PP_PLACEHOLDER
-    
-    text_items = []
-    
-    # Find the title placeholder to exclude it
-    title_shape_id = None
-    for shape in slide.shapes:
-        if shape.is_placeholder:
-            try:
-                if shape.placeholder_format.type == PP_PLACEHOLDER.TITLE:
-                    title_shape_id = shape.shape_id
-                    break
-            except:
-                pass
-    
-    # Collect text from shapes with their positions
-    for shape in slide.shapes:
-        # Skip title
-        if shape.shape_id == title_shape_id:
-            continue
-            
-        # Skip grouped objects (they're part of a group)
-        try:
-            if hasattr(shape, 'group_items'):
-                # This is a group shape itself - skip individual processing
-                continue
-        except:
-            pass
-        
-        # Skip tables
-        if shape.shape_type == MSO_SHAPE_TYPE.TABLE:
-            continue
-        
-        # Extract text from text frames (shapes and text boxes)
-        if shape.has_text_frame:
-            text = shape.text_frame.text.strip()
-            if text:
-                # Store with position for sorting
-                top = shape.top
-                left = shape.left
-                text_items.append((top, left, text))
-    
-    # Sort by position: top-to-bottom (primary), then left-to-right (secondary)
-    text_items.sort(key=lambda x: (x[0], x[1]))
-    
-    # Extract just the text in sorted order
-    extracted_text = '\n'.join(item[2] for item in text_items)
-    
-    return extracted_text
+class _TkNarrationEvents(voxcore.NarrationEvents):
+    """Routes narration engine output to the log pane and message boxes."""
+
+    def __init__(self, log_widget):
+        self.log_widget = log_widget
+
+    def log(self, msg):
+        log_line(self.log_widget, msg)
+
+    def confirm(self, title, msg):
+        return messagebox.askyesno(title, msg)
+
+    def info(self, title, msg):
+        messagebox.showinfo(title, msg)
+
+    def error(self, title, msg):
+        messagebox.showerror(title, msg)
 
-# ------------------------------------------------------------
-# PowerPoint attach routine that removes previous audio for each slide
-# ------------------------------------------------------------
 
 def generate_narration(api_key, voice_id, input_file, output_dir, fixed_only, slide_range_spec, cancel_event,
-                       log_widget, start_button, cancel_button, audio_only=False):
+                       log_widget, start_button, cancel_button, audio_only=False, changed_only=False):
 
     def worker():
-        pp_app = None
-        pp_pres = None
         try:
-            # Prepare session-scoped manifest path in app logs directory
-            try:
-                safe_ensure_dir(LOGS_DIR)
-            except Exception:
-                pass
-            deck_base = os.path.splitext(os.path.basename(input_file))[0]
-            session_ts = time.strftime('%Y%m%d_%H%M%S')
-            session_manifest_path = os.path.join(LOGS_DIR, f"{deck_base}_{session_ts}_manifest.json")
-            if not api_key.strip():
-                log_line(log_widget, "X Missing API Key."); messagebox.showerror("Error","Enter API Key."); return
-            if not voice_id.strip():
-                log_line(log_widget, "X Missing Voice selection."); messagebox.showerror("Error","Choose a voice."); return
-            if not os.path.isfile(input_file):
-                log_line(log_widget, f"X PowerPoint not found: {input_file}"); messagebox.showerror("Error", f"PowerPoint not found:\n{input_file}"); return
-            if not test_ffmpeg_available():
-                log_line(log_widget, "X ffmpeg not found."); messagebox.showerror("ffmpeg not found","Place ffmpeg\\ffmpeg.exe next to the EXE or install ffmpeg."); return
-
-            os.makedirs(output_dir, exist_ok=True)
-            fixed_dir = output_dir
-
-            log_line(log_widget, f"i Deck: {input_file}")
-            log_line(log_widget, f"i Output: {output_dir}")
-            log_line(log_widget, "i Loading slides...")
-
-            # Use python-pptx to read notes text
-            try:
-                prs = Presentation(input_file)
-            except Exception as e:
-                log_line(log_widget, f"X Failed to open PowerPoint: {e}"); messagebox.showerror("Error", f"Failed to open PowerPoint:\n{e}"); return
+            env = voxcore.NarrationEnv(session=VOX_SESSION, settings=load_settings(), settings_dir=SETTINGS_DIR,
+                                       logs_dir=LOGS_DIR, manifests_dir=get_deck_manifests_dir(),
+                                       tts_cache=make_tts_cache(), net_timeout=NET_TIMEOUT,
+                                       net_max_attempts=NET_MAX_ATTEMPTS, net_backoff_base=NET_BACKOFF_BASE)
+            voxcore.run_narration(api_key, voice_id, input_file, output_dir, slide_range_spec, cancel_event,
+                                  events=_TkNarrationEvents(log_widget), env=env,
+                                  audio_only=audio_only, changed_only=changed_only)
+        except Exception as e:
+            log_line(log_widget, f"X Fatal error: {e}")
+            traceback.print_exc()
+        finally:
+            start_button.configure(state="normal")
+            cancel_button.configure(state="disabled")
+            cancel_event.clear()
 
-            total = len(prs.slides)
-            sel = select_slides(total, slide_range_spec or "")
-            log_line(log_widget, f"OK Loaded {total} slide(s). Will process: {sel if sel else 'none'}")
-            if not sel:
-                messagebox.showinfo("No slides selected","Your slide range selected no slides.")
-                return
+    start_button.configure(state="disabled")
+    cancel_button.configure(state="normal")
+    threading.Thread(target=worker, daemon=True).start()
+
+def estimate_narration(api_key, voice_id, input_file, output_dir, slide_range_spec, log_widget,
+                       audio_only=False, changed_only=False):
+    """Dry run in the background: characters, cache hits and time for the run the current fields describe."""
 
-            # Skip PowerPoint operations in audio-only mode
-            if audio_only:
-                log_line(log_widget, "i Audio-only mode: skipping PowerPoint operations")
-                animation_snapshots = {}
+    def worker():
+        try:
+            env = voxcore.NarrationEnv(session=VOX_SESSION, settings=load_settings(), settings_dir=SETTINGS_DIR,
+                                       logs_dir=LOGS_DIR, manifests_dir=get_deck_manifests_dir(),
+                                       tts_cache=make_tts_cache())
+            budget = voxbatch.fetch_character_quota(VOX_SESSION, api_key) if api_key.strip() else None
+            log_line(log_widget, "i Estimating run (nothing will be synthesized)...")
+            est = voxcore.estimate_narration(voice_id, input_file, output_dir, slide_range_spec,
+                                             events=_TkNarrationEvents(log_widget), env=env,
+                                             audio_only=audio_only, changed_only=changed_only,
+                                             char_budget=budget)
+            if est is None:
+                return
+            msg = (f"{est['slides']} slide(s), {est['cache_hits']} of {est['requests']} request(s) cached\n"
+                   f"{est['chars_billable']:,} billable characters\n"
+                   f"About {voxestimate.format_duration(est['est_seconds'])} of synthesis")
+            if budget is not None:
+                msg += f"\n{budget:,} characters left on the account"
+            if est["fits_budget"] is False:
+                messagebox.showwarning("Run estimate", msg + "\n\nThis run needs more characters than are left.")
             else:
-                # Open PowerPoint via COM for animation handling
-                log_line(log_widget, "i Opening PowerPoint for animation preservation...")
-                try:
-                    from win32com.client import Dispatch, GetActiveObject
-                    # gencache removed - causes issues in frozen exe
-                    
-                    # Try to get existing PowerPoint instance first
-                    pp_app = None
-                    try:
-                        pp_app = GetActiveObject("PowerPoint.Application")
-                        log_line(log_widget, "  Using existing PowerPoint instance")
-                    except:
-                        # No existing instance found
-                        pass
-                    
-                    # If no existing instance, create new one
-                    if not pp_app:
-                        pp_app = Dispatch("PowerPoint.Application")
-                        pp_app.Visible = True
-                        log_line(log_widget, "  Created new PowerPoint instance")
-                    else:
-                        pp_app.Visible = True
-                    
-                    # Check if deck is already open
-                    abs_path = os.path.abspath(input_file)
-                    pp_pres = None
-                    
-                    log_line(log_widget, f"  Looking for deck: {os.path.basename(abs_path)}")
-                    log_line(log_widget, f"  Currently open presentations: {pp_app.Presentations.Count}")
-                    
-                    for pres in pp_app.Presentations:
-                        try:
-                            pres_path = os.path.abspath(pres.FullName)
-                            log_line(log_widget, f"  Checking: {os.path.basename(pres_path)}")
-                            if pres_path.lower() == abs_path.lower():
-                                pp_pres = pres
-                                log_line(log_widget, "  Found: Deck already open, reusing")
-                                break
-                        except Exception as e:
-                            log_line(log_widget, f"  Error checking presentation: {e}")
-                            continue
-                    
-                    # If not open, open it
-                    if not pp_pres:
-                        log_line(log_widget, f"  Opening deck: {os.path.basename(abs_path)}")
-                        try:
-                            pp_pres = pp_app.Presentations.Open(abs_path, WithWindow=True)
-                            log_line(log_widget, "  Deck opened successfully")
-                        except Exception as e:
-                            log_line(log_widget, f"  Failed to open deck: {e}")
-                            raise
-                    
-                    if not pp_pres:
-                        raise RuntimeError("Deck failed to open (pp_pres is None)")
-                    
-                    log_line(log_widget, "OK PowerPoint ready for animation preservation")
-                except Exception as e:
-                    log_line(log_widget, f"X Failed to open PowerPoint via COM: {e}")
-                    messagebox.showerror("Error", f"Failed to open PowerPoint for animation handling:\n{e}")
-                    return
+                messagebox.showinfo("Run estimate", msg)
+        except Exception as e:
+            log_line(log_widget, f"X Estimate error: {e}")
+            traceback.print_exc()
 
-                # BATCH SNAPSHOT: Backup animations for all selected slides upfront
-                log_line(log_widget, "i Backing up animations for selected slides...")
-                animation_snapshots = {}
-                
-                for idx in sel:
-                    if cancel_event.is_set():
-                        break
-                    try:
-                        slide = pp_pres.Slides(idx)
-                        
-                        # Clean up orphaned effects first
-                        voxanimate.cleanup_orphaned_audio_effects(slide)
-                        
-                        # Snapshot the animation state
-                        snapshot = voxanimate.snapshot_slide_animations(slide)
-                        animation_snapshots[idx] = snapshot
-                        
-                        if snapshot.get("effects"):
-                            log_line(log_widget, f"  Slide {idx:02d}: {len(snapshot['effects'])} animations backed up")
-                        else:
-                            log_line(log_widget, f"  Slide {idx:02d}: No animations")
-                            
-                    except Exception as e:
-                        log_line(log_widget, f"  Slide {idx:02d}: Backup failed - {e}")
-                        animation_snapshots[idx] = None
-                
-                log_line(log_widget, "OK Animation backup complete\n")
-
-            url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
-            h = {"xi-api-key": api_key, "Content-Type": "application/json"}
-
-            processed = 0
-
-            # Process each slide: TTS generation + audio insertion + animation restoration
-            for idx in sel:
-                if cancel_event.is_set():
-                    log_line(log_widget, "i Run cancelled by user.")
-                    break
-
-                # Get notes text from python-pptx
-                s = prs.slides[idx-1]
-                text = s.notes_slide.notes_text_frame.text if s.notes_slide and s.notes_slide.notes_text_frame else ""
-                note = (text or "").strip()
-
-                # Check for "### Read Slide" marker (case-insensitive)
-                import re
-                read_slide_pattern = re.compile(r'###\s*read\s*slide', re.IGNORECASE)
-                if read_slide_pattern.search(note):
-                    log_line(log_widget, f"   Detected '### Read Slide' marker - extracting slide text...")
-                    try:
-                        # Extract text from slide shapes (excluding title)
-                        slide_text = extract_slide_text(s)
-                        if slide_text:
-                            # Replace the marker with extracted text (case-insensitive)
-                            note = read_slide_pattern.sub(slide_text, note)
-                            log_line(log_widget, f"   Extracted {len(slide_text)} chars from slide")
-                        else:
-                            log_line(log_widget, f"   Warning: No text found on slide to extract")
-                            # Remove the marker so we don't generate audio for it
-                            note = read_slide_pattern.sub("", note).strip()
-                    except Exception as e:
-                        log_line(log_widget, f"   Error extracting slide text: {e}")
-                        # Continue with original notes (minus the marker)
-                        note = read_slide_pattern.sub("", note).strip()
-
-                if not note:
-                    log_line(log_widget, f"- Skipping slide {idx:02d}: No notes found.")
-                    processed += 1
-                    continue
-
-                log_line(log_widget, f"> Generating slide {idx:02d}...")
-                txt_hash = hashlib.sha256(note.encode("utf-8", "ignore")).hexdigest()[:8]
-                log_line(log_widget, f"   text#={txt_hash}")
-                payload = {"text": note, "output_format": "wav", "voice_settings": {"stability": 0.5, "similarity_boost": 0.7}}
-
-                # Generate TTS audio
-                try:
-                    sess = VOX_SESSION
-                    attempts = 0
-                    last_err = None
-                    resp = None
-                    while attempts < NET_MAX_ATTEMPTS:
-                        attempts += 1
-                        try:
-                            resp = sess.post(url, headers=h, json=payload, timeout=NET_TIMEOUT)
-                            if resp.status_code == 200:
-                                break
-                            if 500 <= resp.status_code < 600 and attempts < NET_MAX_ATTEMPTS:
-                                time.sleep(NET_BACKOFF_BASE * (2 ** (attempts-1)))
-                                continue
-                            break
-                        except requests.RequestException as e:
-                            last_err = e
-                            if attempts < NET_MAX_ATTEMPTS:
-                                time.sleep(NET_BACKOFF_BASE * (2 ** (attempts-1)))
-                                continue
-                            raise
-
-                except requests.RequestException as e:
-                    log_line(log_widget, f" X Network error on slide {idx:02d}: {e}")
-                    processed += 1
-                    continue
-
-                if resp.status_code == 200:
-                    name = f"slide{idx:02d}.wav"
-                    fixed_path = os.path.join(fixed_dir, name)
-
-                    # Convert audio to proper format
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-                        tmp.write(resp.content); tmp_path = tmp.name
-                    wav_md5 = hashlib.md5(resp.content).hexdigest()[:8]
-                    log_line(log_widget, f"   wav#={wav_md5}")
-                    
-                    # Save to manifest
-                    try:
-                        manifest_path = session_manifest_path
-                        try:
-                            with open(manifest_path, 'r', encoding='utf-8') as mf:
-                                manifest = json.load(mf)
-                        except Exception:
-                            manifest = []
-                        manifest.append({'slide': idx, 'voice_id': voice_id, 'text_sha256': txt_hash, 'wav_md5': wav_md5, 'wav_sha256': _sha256_bytes(resp.content), 'bytes': len(resp.content), 'attempts': attempts, 'http_status': getattr(resp, 'status_code', None)})
-                        with open(manifest_path, 'w', encoding='utf-8') as mf:
-                            json.dump(manifest, mf, indent=2)
-                        try:
-                            _msha = _sha256_file(manifest_path)
-                            with open(manifest_path + '.sha256', 'w', encoding='utf-8') as csf:
-                                csf.write(_msha)
-                            logger = logging.getLogger('voxsmith')
-                            logger.info(_redact(f'MANIFEST sha256={_msha} file={safe_path(manifest_path)}'))
-                        except Exception:
-                            pass
-                    except Exception:
-                        pass
-                    
-                    run_ffmpeg_quiet(["ffmpeg","-y","-i",tmp_path,"-acodec",TARGET_CODEC,"-ar",TARGET_SAMPLE_RATE,"-ac",TARGET_CHANNELS,fixed_path])
-                    try:
-                        os.remove(tmp_path)
-                    except Exception:
-                        pass
-                    log_line(log_widget, f" i Converted -> {name}")
-                    
-                    # Skip attachment if audio_only mode is enabled
-                    if audio_only:
-                        log_line(log_widget, f"i Audio-only mode: saved to {name}")
-                        processed += 1
-                        continue
-                    
-                    # Check if this slide has text animations - if so, skip attachment
-                    snapshot = animation_snapshots.get(idx)
-                    if snapshot:
-                        should_skip, skip_reason = voxanimate.should_skip_audio_attachment(snapshot)
-                        if should_skip:
-                            log_line(log_widget, f"i Skipping attachment to slide {idx:02d} due to animation backup limitations")
-                            log_line(log_widget, f"i {skip_reason}")
-                            log_line(log_widget, f"i Audio saved to {name} - attach manually to preserve animations")
-                            processed += 1
-                            continue
+    threading.Thread(target=worker, daemon=True).start()
 
-                    
-                    # INSERT AUDIO + RESTORE ANIMATIONS
-                    log_line(log_widget, f"> Inserting audio into slide {idx:02d}...")
-                    
-                    try:
-                        slide = pp_pres.Slides(idx)
-                        
-                        # Remove existing VOX audio shapes
-                        voxattach._delete_existing_vox_audio(slide)
-                        
-                        # CRITICAL: Clear animation timeline BEFORE inserting audio
-                        # Inserting audio into an animated slide scrambles existing animations
-                        log_line(log_widget, f"  Clearing animation timeline before audio insertion...")
-                        try:
-                            seq = slide.TimeLine.MainSequence
-                            while seq.Count > 0:
-                                try:
-                                    seq.Item(1).Delete()
-                                except:
-                                    break
-                        except Exception:
-                            pass
-                        
-                        # Insert new audio shape WITHOUT auto-creating animation
-                        # AddMediaObject (not AddMediaObject2) gives us more control
-                        audio_path_abs = os.path.abspath(fixed_path)
-                        
-                        try:
-                            # Try AddMediaObject first (doesn't auto-animate)
-                            audio_shape = slide.Shapes.AddMediaObject(audio_path_abs, False, True, 0, 0)
-                        except:
-                            # Fall back to AddMediaObject2 if AddMediaObject not available
-                            audio_shape = slide.Shapes.AddMediaObject2(audio_path_abs, False, True, 0, 0)
-                        
-                        # Configure audio shape appearance and position
-                        try:
-                            audio_shape.Width = 32
-                            audio_shape.Height = 32
-                            W = pp_pres.PageSetup.SlideWidth
-                            H = pp_pres.PageSetup.SlideHeight
-                            audio_shape.Left = W + 5  # Off-slide to the right
-                            audio_shape.Top = H - audio_shape.Height - 5  # Bottom aligned
-                            audio_shape.AlternativeText = "VOX_VO"
-                            
-                            # Disable interactive triggers/click actions
-                            try:
-                                audio_shape.ActionSettings[1].Action = 0  # ppActionNone
-                            except:
-                                pass
-                        except Exception:
-                            pass
-                        
-                        # RESTORE ANIMATIONS from snapshot
-                        snapshot = animation_snapshots.get(idx)
-                        if snapshot is not None:
-                            # Always call restore - it handles both cases:
-                            # 1. If snapshot has effects: restores them with audio at position 1
-                            # 2. If snapshot is empty: just adds audio effect
-                            log_line(log_widget, f"  Restoring animations...")
-                            success = voxanimate.restore_slide_animations(slide, snapshot, audio_shape)
-                            if success:
-                                effect_count = len(snapshot.get("effects", []))
-                                if effect_count > 0:
-                                    log_line(log_widget, f"  OK Restored {effect_count} animations")
-                                else:
-                                    log_line(log_widget, f"  OK Audio inserted (no animations to restore)")
-                            else:
-                                log_line(log_widget, f"  ! Animation restoration had issues")
-                        else:
-                            # Snapshot failed, fall back to basic audio setup
-                            voxattach._configure_play_settings(audio_shape, hide=True)
-                            voxattach._append_media_play_after_previous(slide, audio_shape)
-                            log_line(log_widget, f"  ! Snapshot unavailable, basic audio setup used")
-                        
-                        # Save after each slide
-                        pp_pres.Save()
-                        log_line(log_widget, f"OK Slide {idx:02d} complete")
-                        
-                    except Exception as e:
-                        log_line(log_widget, f"X Slide {idx:02d} insertion error: {e}")
-                        
-                else:
-                    msg = pretty_api_error(resp)
-                    log_line(log_widget, f" X API error slide {idx:02d}: {msg}")
 
-                processed += 1
+class _TkBatchEvents(_TkNarrationEvents):
+    """Batch runs stay unattended: interrupted decks resume, per-deck popups go to the log."""
 
-            if not cancel_event.is_set():
-                if audio_only:
-                    log_line(log_widget, "* Done. Audio files saved to output folder.")
-                    messagebox.showinfo("Complete","Audio generation finished. Files saved to output folder.")
-                else:
-                    log_line(log_widget, "* Done. Check your output folder.")
-                    messagebox.showinfo("Complete","Narration finished. Check your output folder.")
-                try:
-                    log_line(log_widget, f"OK Session log saved")
-                except Exception:
-                    pass
-            else:
-                messagebox.showinfo("Cancelled","Generation was cancelled.")
+    def __init__(self, log_widget, deck):
+        super().__init__(log_widget)
+        self.deck_name = os.path.basename(deck)
 
+    def confirm(self, title, msg):
+        log_line(self.log_widget, f"i {self.deck_name}: resuming interrupted run")
+        return True
+
+    def info(self, title, msg):
+        pass
+
+    def error(self, title, msg):
+        log_line(self.log_widget, f"X {self.deck_name}: {msg}")
+
+
+def generate_batch_narration(api_key, voice_id, decks, output_root, cancel_event, log_widget, start_button,
+                             cancel_button, audio_only=True, changed_only=False):
+    """Narrate many decks as one queue sharing the TTS pool, session, rate limit and character budget."""
+
+    def worker():
+        try:
+            if not api_key.strip() or not voice_id.strip():
+                log_line(log_widget, "X Batch needs an API key and a voice."); return
+            env = voxcore.NarrationEnv(session=VOX_SESSION, settings=load_settings(), settings_dir=SETTINGS_DIR,
+                                       logs_dir=LOGS_DIR, manifests_dir=get_deck_manifests_dir(),
+                                       tts_cache=make_tts_cache(), net_timeout=NET_TIMEOUT,
+                                       net_max_attempts=NET_MAX_ATTEMPTS, net_backoff_base=NET_BACKOFF_BASE)
+            budget = voxbatch.fetch_character_quota(VOX_SESSION, api_key)
+            queue = voxbatch.BatchQueue(env, api_key, voice_id, char_budget=budget,
+                                        events_for=lambda deck: _TkBatchEvents(log_widget, deck))
+            for deck in decks:
+                queue.add(deck, voxbatch.output_dir_for(deck, output_root, decks), "",
+                          audio_only=audio_only, changed_only=changed_only)
+            log_line(log_widget, f"i Batch: {len(decks)} deck(s), {queue.concurrency} request(s) at a time"
+                                 + (f", {budget:,} characters available" if budget is not None else ""))
+
+            def on_deck_done(summary):
+                log_line(log_widget, f"* {os.path.basename(summary['deck'])}: {summary['status']} "
+                                     f"({summary['failures']} failed of {summary['selected']})")
+
+            results = queue.run(cancel_event, on_deck_done)
+            done = sum(1 for r in results if r and r["status"] == voxcore.STATUS_COMPLETE)
+            log_line(log_widget, f"* Batch finished: {done} of {len(results)} deck(s) complete, "
+                                 f"{queue.quota.used:,} characters used")
+            messagebox.showinfo("Batch complete", f"{done} of {len(results)} deck(s) narrated completely.")
         except Exception as e:
-            log_line(log_widget, f"X Fatal error: {e}")
+            log_line(log_widget, f"X Batch error: {e}")
             traceback.print_exc()
         finally:
-            # Save and leave PowerPoint open (don't close) - unless audio_only mode
-            if not audio_only:
-                try:
-                    if pp_pres:
-                        pp_pres.Save()
-                        log_line(log_widget, "i Deck saved and left open for review")
-                except Exception as e:
-                    log_line(log_widget, f"! Warning: Failed to save: {e}")
-            
             start_button.configure(state="normal")
             cancel_button.configure(state="disabled")
             cancel_event.clear()
@@ -1705,6 +1245,9 @@ def main():
     # Verbose variable (now controlled via Options menu, persistent across sessions)
     verbose_var = tk.BooleanVar(value=bool(settings.get("detailed_logs", False)))
 
+    # Changed-only regeneration (Options menu, persistent across sessions)
+    changed_only_var = tk.BooleanVar(value=bool(settings.get("changed_only", False)))
+
     remember_var = tk.BooleanVar(value=True)
     fixed_only_var = tk.BooleanVar(value=bool(settings.get("fixed_only", DEFAULT_FIXED_ONLY)))
 
@@ -1931,9 +1474,30 @@ def main():
             log_widget=log,
             start_button=run_btn,
             cancel_button=cancel_btn,
-            audio_only=audio_only_var.get()
+            audio_only=audio_only_var.get(),
+            changed_only=changed_only_var.get()
         )
 
+    def on_estimate():
+        estimate_narration(get_api_key(), voice_id_var.get().strip(), pptx_var.get(), out_var.get(),
+                           slide_range_var.get(), log, audio_only=audio_only_var.get(),
+                           changed_only=changed_only_var.get())
+
+    def on_batch():
+        folder = filedialog.askdirectory(title="Folder of decks to narrate")
+        if not folder:
+            return
+        decks = voxbatch.find_decks([folder])
+        if not decks:
+            messagebox.showinfo("Batch", "No .pptx decks in that folder.")
+            return
+        out_root = out_var.get().strip() or folder
+        if not messagebox.askyesno("Batch", f"Narrate {len(decks)} deck(s)?\nAudio goes to a subfolder per deck in:\n{out_root}"):
+            return
+        generate_batch_narration(get_api_key(), voice_id_var.get().strip(), decks, out_root, cancel_event, log,
+                                 run_btn, cancel_btn, audio_only=audio_only_var.get(),
+                                 changed_only=changed_only_var.get())
+
     def on_cancel():
         cancel_event.set(); cancel_btn.configure(state="disabled"); log._verbose_var = verbose_var; log_line(log, "i Cancelling after current slide...")
 
@@ -1985,9 +1549,56 @@ def main():
             """Toggle detailed logs and save to settings."""
             save_settings(detailed_logs=verbose_var.get())
         
-        popup.add_checkbutton(label="Detailed Logs", variable=verbose_var, 
+        popup.add_checkbutton(label="Detailed Logs", variable=verbose_var,
                              command=toggle_detailed_logs, font=("Open Sans", 13))
-        
+
+        def set_concurrency():
+            """Ask how many slides to synthesize at once (bounded by ElevenLabs plan limits)."""
+            current = voxtts.clamp_concurrency(load_settings().get("tts_concurrency", voxtts.DEFAULT_CONCURRENCY))
+            n = simpledialog.askinteger(
+                "Concurrent Requests",
+                f"Slides to synthesize at once (1-{voxtts.MAX_CONCURRENCY}).\n"
+                "Free: 2, Starter: 3, Creator: 5, Pro: 10, Scale/Business: 15",
+                initialvalue=current, minvalue=1, maxvalue=voxtts.MAX_CONCURRENCY, parent=root)
+            if n:
+                save_settings(tts_concurrency=voxtts.clamp_concurrency(n))
+
+        popup.add_command(label="Concurrent Requests...", command=set_concurrency, font=("Open Sans", 13))
+
+        def set_chunk_chars():
+            """Ask how long a note may get before it is split into parallel chunks (0 = never split)."""
+            try:
+                current = max(0, int(load_settings().get("tts_chunk_chars", voxcore.TTS_CHUNK_CHARS) or 0))
+            except Exception:
+                current = voxcore.TTS_CHUNK_CHARS
+            n = simpledialog.askinteger(
+                "Split Long Notes",
+                "Split notes longer than this many characters into sentence chunks\n"
+                "synthesized in parallel (0 = never split; 1000 is a good start).",
+                initialvalue=current, minvalue=0, maxvalue=5000, parent=root)
+            if n is not None:
+                save_settings(tts_chunk_chars=n)
+
+        popup.add_command(label="Split Long Notes...", command=set_chunk_chars, font=("Open Sans", 13))
+
+        def edit_pronunciations():
+            """Open the pronunciation dictionary in the default editor (creating an example first)."""
+            try:
+                open_folder(voxlexicon.ensure_file(voxlexicon.lexicon_path(SETTINGS_DIR)))
+            except Exception as e:
+                messagebox.showerror("Pronunciations", str(e))
+
+        popup.add_command(label="Pronunciations...", command=edit_pronunciations, font=("Open Sans", 13))
+
+        def toggle_changed_only():
+            """Toggle changed-slides-only regeneration and save to settings."""
+            save_settings(changed_only=changed_only_var.get())
+
+        popup.add_checkbutton(label="Only Changed Slides", variable=changed_only_var,
+                             command=toggle_changed_only, font=("Open Sans", 13))
+        popup.add_command(label="Estimate Run...", command=on_estimate, font=("Open Sans", 13))
+        popup.add_command(label="Batch Narrate Folder...", command=on_batch, font=("Open Sans", 13))
+
         try:
             # Position popup below the Options button
             popup.tk_popup(event.x_root, event.y_root + 10)
@@ -2121,6 +1732,9 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    # The notes index parses large decks on a process pool; in the frozen exe
+    # each worker re-runs this script and must stop here instead of opening a window
+    multiprocessing.freeze_support()
     try:
         try:
             already_open, _SINGLE_LOCK = _check_single_instance()
@@ -2158,10 +1772,3 @@ if __name__ == "__main__":
             except Exception:
                 pass
 
-def _handle_auth_log(resp):
-    try:
-        s = getattr(resp, "status_code", None)
-        if s in (401, 403):
-            logging.getLogger("voxsmith").info(_redact("AUTH issue: 401/403 from ElevenLabs. Check API key in Credential Manager."))
-    except Exception:
-        pass
@@ -0,0 +1,249 @@
+"""
+voxsmith_cli.py
+Headless command-line runner for Voxsmith narration.
+
+Narrates one deck, several decks, or every .pptx in a folder without the
+GUI. Progress is written to stdout as one JSON object per line; human log
+lines go to stderr. Several decks are run as one batch (voxbatch): their
+slides share one TTS worker pool, request rate limit and character budget.
+
+Examples:
+    python voxsmith_cli.py deck.pptx --voice <voice_id>
+    python voxsmith_cli.py decks/ --voice <voice_id> --slides 1-5 --out audio/
+    python voxsmith_cli.py deck.pptx --voice <voice_id> --attach --changed-only
+    python voxsmith_cli.py decks/ --voice <voice_id> --attach --offline
+    python voxsmith_cli.py decks/ --voice <voice_id> --dry-run
+
+Exit codes:
+    0  every selected slide was narrated
+    1  some slides failed (see the "slide" events)
+    2  bad arguments, missing API key, or nothing to narrate
+    3  at least one deck failed outright
+    130  cancelled (Ctrl+C)
+With --dry-run nothing is synthesized; 1 then means the run would need
+more characters than the budget allows.
+"""
+import os
+import sys
+import json
+import signal
+import argparse
+import threading
+import multiprocessing
+
+import voxcore
+import voxtts
+import voxbatch
+import voxlexicon
+
+try:
+    import keyring
+except Exception:
+    keyring = None
+
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_USAGE = 2
+EXIT_FAILED = 3
+EXIT_CANCELLED = 130
+
+_LOG_PREFIXES = ('X', '*', '>', 'OK', 'i', '!', ' X')
+
+
+class _CliEvents(voxcore.NarrationEvents):
+    """JSON progress on stdout, log lines on stderr; never blocks on a prompt."""
+
+    def __init__(self, deck, verbose=False, quiet=False, resume=False):
+        self.deck = deck
+        self.verbose = verbose
+        self.quiet = quiet
+        self.resume = resume
+
+    def log(self, msg):
+        if self.quiet:
+            return
+        msg = str(msg)
+        if not self.verbose and not msg.startswith(_LOG_PREFIXES):
+            return
+        print(voxcore.redact(msg), file=sys.stderr, flush=True)
+
+    def progress(self, **event):
+        emit(dict(event, deck=self.deck))
+
+    def confirm(self, title, msg):
+        # The only prompt is "resume the interrupted run?"
+        return self.resume
+
+    def error(self, title, msg):
+        self.log(f"X {title}: {msg}")
+
+
+_emit_lock = threading.Lock()
+
+
+def emit(event: dict) -> None:
+    line = json.dumps(event, ensure_ascii=False, default=str)
+    with _emit_lock:
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+
+def resolve_api_key(cli_value: str) -> str:
+    key = (cli_value or os.getenv("ELEVENLABS_API_KEY", "")).strip()
+    if key or keyring is None:
+        return key
+    try:
+        return (keyring.get_password(voxcore.APP_DIR_NAME, "elevenlabs") or "").strip()
+    except Exception:
+        return ""
+
+
+def exit_code_for(statuses) -> int:
+    if not statuses:
+        return EXIT_USAGE
+    if voxcore.STATUS_CANCELLED in statuses:
+        return EXIT_CANCELLED
+    if any(s in (voxcore.STATUS_FAILED, voxcore.STATUS_SAVE_FAILED) for s in statuses):
+        return EXIT_FAILED
+    if voxcore.STATUS_PARTIAL in statuses:
+        return EXIT_PARTIAL
+    if all(s == voxcore.STATUS_INVALID for s in statuses):
+        return EXIT_USAGE
+    if voxcore.STATUS_INVALID in statuses:
+        return EXIT_FAILED
+    return EXIT_OK
+
+
+def build_parser():
+    ap = argparse.ArgumentParser(prog="voxsmith_cli", description="Narrate PowerPoint speaker notes with ElevenLabs.")
+    ap.add_argument("decks", nargs="+", help=".pptx files and/or folders of decks")
+    ap.add_argument("--voice", required=True, help="ElevenLabs voice_id")
+    ap.add_argument("--api-key", default="", help="ElevenLabs API key (default: $ELEVENLABS_API_KEY, then the saved key)")
+    ap.add_argument("--slides", default="", help='slide range, e.g. "1-5,8" (default: all)')
+    ap.add_argument("--out", default="", help="output folder (one subfolder per deck when narrating several)")
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument("--audio-only", dest="attach", action="store_false", help="write WAVs only (default)")
+    mode.add_argument("--attach", dest="attach", action="store_true",
+                      help="also insert audio into the deck (needs PowerPoint unless --offline)")
+    ap.set_defaults(attach=False)
+    ap.add_argument("--offline", action="store_true",
+                    help="with --attach, write audio into the .pptx directly instead of through PowerPoint")
+    ap.add_argument("--changed-only", action="store_true", help="skip slides unchanged since the last run")
+    ap.add_argument("--resume", action="store_true", help="resume an interrupted run instead of starting over")
+    ap.add_argument("--concurrency", type=int, default=None, help=f"parallel TTS requests (1-{voxtts.MAX_CONCURRENCY})")
+    ap.add_argument("--chunk-chars", type=int, default=None,
+                    help="split notes longer than this into parallel sentence chunks (0 = never)")
+    ap.add_argument("--lexicon", default=None,
+                    help="pronunciation dictionary JSON (default: pronunciations.json in the settings folder)")
+    ap.add_argument("--parallel-decks", type=int, default=voxbatch.DEFAULT_DECK_WORKERS,
+                    help="audio-only decks narrated side by side (attach decks always run one at a time)")
+    ap.add_argument("--rate", type=float, default=voxbatch.DEFAULT_RATE_PER_SEC,
+                    help="max TTS requests per second across all decks (0 = no limit)")
+    ap.add_argument("--char-budget", type=int, default=None,
+                    help="max characters to synthesize (default: what is left on the account)")
+    ap.add_argument("--dry-run", action="store_true",
+                    help="only estimate characters, cache hits and time; synthesize nothing")
+    ap.add_argument("-r", "--recursive", action="store_true", help="search folders recursively")
+    ap.add_argument("-v", "--verbose", action="store_true", help="log every step to stderr")
+    ap.add_argument("-q", "--quiet", action="store_true", help="no log lines, JSON progress only")
+    return ap
+
+
+def main(argv=None) -> int:
+    ap = build_parser()
+    args = ap.parse_args(argv)
+    if args.offline and not args.attach:
+        ap.error("--offline only applies with --attach")
+
+    api_key = resolve_api_key(args.api_key)
+    if not api_key and not args.dry_run:
+        print("X No API key: pass --api-key or set ELEVENLABS_API_KEY", file=sys.stderr)
+        return EXIT_USAGE
+    decks = voxbatch.find_decks(args.decks, args.recursive)
+    if not decks:
+        print("X No .pptx decks found", file=sys.stderr)
+        return EXIT_USAGE
+
+    if args.lexicon and not os.path.isfile(args.lexicon):
+        print(f"X Pronunciation dictionary not found: {args.lexicon}", file=sys.stderr)
+        return EXIT_USAGE
+
+    voxcore.ensure_local_ffmpeg_on_path()
+    env = voxcore.NarrationEnv(lexicon=voxlexicon.load(args.lexicon) if args.lexicon else None)
+    if args.chunk_chars is not None:
+        env.settings = dict(env.settings, tts_chunk_chars=max(0, args.chunk_chars))
+    if args.offline:
+        env.settings = dict(env.settings, insert_backend="xml")
+    budget = args.char_budget
+    if budget is None and api_key:
+        budget = voxbatch.fetch_character_quota(env.session, api_key)
+    if args.dry_run:
+        return dry_run(env, args, decks, budget)
+    queue = voxbatch.BatchQueue(env, api_key, args.voice, concurrency=args.concurrency,
+                                deck_workers=args.parallel_decks, rate_per_sec=args.rate, char_budget=budget,
+                                events_for=lambda deck: _CliEvents(deck, verbose=args.verbose, quiet=args.quiet,
+                                                                   resume=args.resume))
+    batch = decks if len(decks) > 1 else ()
+    for deck in decks:
+        queue.add(deck, voxbatch.output_dir_for(deck, args.out, batch), args.slides,
+                  audio_only=not args.attach, changed_only=args.changed_only)
+
+    # First Ctrl+C cancels cleanly (partial files removed, journal written); a second one aborts
+    cancel_event = threading.Event()
+
+    def on_sigint(_sig, _frame):
+        if cancel_event.is_set():
+            raise KeyboardInterrupt
+        cancel_event.set()
+        print("i Cancelling after the current slide...", file=sys.stderr, flush=True)
+
+    try:
+        signal.signal(signal.SIGINT, on_sigint)
+    except Exception:
+        pass
+
+    emit({"evt": "start", "decks": len(decks), "mode": "attach" if args.attach else "audio",
+          "concurrency": queue.concurrency, "char_budget": budget})
+
+    def on_deck_done(summary):
+        emit({"evt": "deck_done", "deck": summary["deck"], "status": summary["status"],
+              "selected": summary["selected"], "processed": summary["processed"], "failures": summary["failures"]})
+
+    statuses = [s["status"] for s in queue.run(cancel_event, on_deck_done)]
+    code = exit_code_for(statuses)
+    emit({"evt": "done", "decks": len(statuses), "exit_code": code, "chars_used": queue.quota.used,
+          "statuses": {s: statuses.count(s) for s in sorted(set(statuses))}})
+    return code
+
+
+def dry_run(env, args, decks, budget) -> int:
+    """Estimate every deck (JSON "estimate" events) and the total against the budget."""
+    if args.concurrency is not None:
+        env.settings = dict(env.settings, tts_concurrency=voxtts.clamp_concurrency(args.concurrency))
+    totals = {"chars_billable": 0, "requests": 0, "cache_hits": 0, "est_seconds": 0.0}
+    failed = 0
+    batch = decks if len(decks) > 1 else ()
+    for deck in decks:
+        est = voxcore.estimate_narration(args.voice, deck, voxbatch.output_dir_for(deck, args.out, batch),
+                                         args.slides, events=_CliEvents(deck, verbose=args.verbose, quiet=args.quiet),
+                                         env=env, audio_only=not args.attach, changed_only=args.changed_only)
+        if est is None:
+            failed += 1
+            emit({"evt": "estimate", "deck": deck, "status": voxcore.STATUS_FAILED})
+            continue
+        emit({"evt": "estimate", "deck": deck, **est})
+        for k in totals:
+            totals[k] += est[k]
+    # Summed per-deck times: an upper bound, since a batch shares one worker pool across decks
+    fits = None if budget is None else totals["chars_billable"] <= budget
+    emit({"evt": "estimate_total", "decks": len(decks), "failed": failed, **totals,
+          "est_seconds": round(totals["est_seconds"], 1), "char_budget": budget, "fits_budget": fits})
+    if failed:
+        return EXIT_FAILED
+    return EXIT_PARTIAL if fits is False else EXIT_OK
+
+
+if __name__ == "__main__":
+    # Worker processes of the notes index pool start here in a frozen build
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,484 @@
+"""
+voxtts.py
+ElevenLabs text-to-speech request helpers for Voxsmith.
+
+Runs several slide syntheses at once on a bounded worker pool while handing
+results back in slide order, so the PowerPoint COM stage stays on the single
+thread that owns the presentation. An AIMD controller shared by the workers
+narrows concurrency when the API answers 429 and widens it again as requests
+succeed. chunk_text() splits long notes so one slide can be synthesized as
+several smaller requests.
+"""
+import re
+import math
+import time
+import queue
+import hashlib
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+import requests
+
+# ElevenLabs caps simultaneous TTS requests per plan
+# (Free 2, Starter 3, Creator 5, Pro 10, Scale/Business 15).
+# Default to the Free tier so a fresh install never trips the limit.
+DEFAULT_CONCURRENCY = 2
+MAX_CONCURRENCY = 15
+
+# Raw PCM output formats (16-bit little-endian mono) and their sample rates.
+# pcm_44100 needs a Pro plan or above; lower plans get an error and we fall
+# back to the legacy "wav" request.
+PCM_FORMATS = {"pcm_16000": 16000, "pcm_22050": 22050, "pcm_24000": 24000, "pcm_44100": 44100}
+LEGACY_FORMAT = "wav"
+
+STREAM_CHUNK = 64 * 1024
+
+# 429 handling: waits don't count as attempts, but give up after this many
+MAX_THROTTLE_WAITS = 8
+DEFAULT_THROTTLE_WAIT = 2.0  # seconds, when the 429 carries no retry-after
+
+
+# Long-note chunking: boundaries tried in order - paragraph, sentence, clause, word
+_CHUNK_SPLITTERS = (
+    (re.compile(r"\n\s*\n"), "\n\n"),
+    (re.compile(r"(?:(?<=[.!?\u2026])|(?<=[.!?\u2026][\"'\u201d\u2019)\]]))\s+"), " "),
+    (re.compile(r"(?<=[,;:\u2013\u2014])\s+"), " "),
+    (re.compile(r"\s+"), " "),
+)
+
+
+def chunk_text(text: str, max_chars: int) -> list:
+    """
+    Split text into chunks of at most max_chars, breaking at paragraph
+    boundaries where possible, then sentences, clauses and finally words.
+    Neighbouring pieces are packed greedily so chunks stay close to the
+    budget. Returns [text] when it already fits or max_chars <= 0.
+    """
+    text = (text or "").strip()
+    if max_chars <= 0 or len(text) <= max_chars:
+        return [text] if text else []
+    return _chunk(text, int(max_chars), 0)
+
+
+def _chunk(text, max_chars, level):
+    if len(text) <= max_chars:
+        return [text]
+    if level >= len(_CHUNK_SPLITTERS):
+        # A single "word" longer than the budget (a URL, say): hard cut
+        return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+    pattern, joiner = _CHUNK_SPLITTERS[level]
+    pieces = [p.strip() for p in pattern.split(text) if p.strip()]
+    if len(pieces) == 1:
+        return _chunk(pieces[0], max_chars, level + 1)
+    out = []
+    current = ""
+    for piece in pieces:
+        for part in _chunk(piece, max_chars, level + 1):
+            if current and len(current) + len(joiner) + len(part) <= max_chars:
+                current += joiner + part
+            else:
+                if current:
+                    out.append(current)
+                current = part
+    if current:
+        out.append(current)
+    return out
+
+
+def clamp_concurrency(value) -> int:
+    """Coerce a user/settings value into a usable worker count."""
+    try:
+        n = int(value)
+    except Exception:
+        return DEFAULT_CONCURRENCY
+    return max(1, min(MAX_CONCURRENCY, n))
+
+
+def pcm_rate(output_format: str):
+    """Sample rate for a raw PCM output format, or None for container formats."""
+    return PCM_FORMATS.get((output_format or "").lower())
+
+
+def is_format_not_allowed(resp) -> bool:
+    """True when the API rejected the requested output_format for this plan."""
+    if resp is None or resp.status_code not in (400, 401, 403, 422):
+        return False
+    try:
+        body = resp.text or ""
+    except Exception:
+        return False
+    return "output_format" in body
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), or None."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def synthesize(session, url: str, headers: dict, payload: dict, *, timeout=120,
+               max_attempts=3, backoff_base=0.75, cancel_event=None, params=None, stream=False,
+               controller=None):
+    """
+    POST one TTS request, retrying transient 5xx and network errors.
+
+    429 responses are waited out (honoring retry-after) without using up an
+    attempt. With a shared AdaptiveConcurrency controller the 429 also
+    pauses and narrows every other worker, and each success widens it again.
+
+    With stream=True the body is left on the wire for pump() to consume;
+    responses that are retried are closed so their connection is released.
+
+    Returns:
+        (response, attempts)  - response may be non-200 for API errors
+    Raises:
+        requests.RequestException once retries are exhausted
+        Cancelled if cancel_event is set while a retry is pending
+    """
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    def give_up(resp):
+        if stream:
+            resp.close()
+        raise Cancelled()
+
+    attempts = 0
+    throttled = 0
+    resp = None
+    while attempts < max_attempts:
+        attempts += 1
+        try:
+            epoch = controller.epoch if controller is not None else 0
+            resp = session.post(url, headers=headers, json=payload, params=params, timeout=timeout, stream=stream)
+            if resp.status_code == 200:
+                if controller is not None:
+                    controller.on_success()
+                break
+            retry_after = parse_retry_after(resp.headers.get("retry-after"))
+            if resp.status_code == 429 and throttled < MAX_THROTTLE_WAITS:
+                if cancelled():
+                    give_up(resp)
+                throttled += 1
+                attempts -= 1  # being rate limited is not a failed attempt
+                if stream:
+                    resp.close()
+                if controller is not None:
+                    controller.on_throttle(retry_after, epoch)
+                    controller.wait_if_paused(cancel_event)
+                else:
+                    _wait(retry_after if retry_after is not None else DEFAULT_THROTTLE_WAIT * (2 ** (throttled - 1)),
+                          cancel_event)
+                if cancelled():
+                    raise Cancelled()
+                continue
+            if 500 <= resp.status_code < 600 and attempts < max_attempts:
+                if cancelled():
+                    give_up(resp)
+                if stream:
+                    resp.close()
+                _wait(retry_after if retry_after is not None else backoff_base * (2 ** (attempts - 1)), cancel_event)
+                if cancelled():
+                    raise Cancelled()
+                continue
+            break
+        except requests.RequestException:
+            if attempts < max_attempts and not cancelled():
+                _wait(backoff_base * (2 ** (attempts - 1)), cancel_event)
+                if cancelled():
+                    raise Cancelled()
+                continue
+            raise
+    return resp, attempts
+
+
+def _wait(seconds, cancel_event=None):
+    if cancel_event is not None:
+        cancel_event.wait(seconds)
+    else:
+        time.sleep(seconds)
+
+
+class Cancelled(Exception):
+    """Raised inside a pool job that was skipped because the run was cancelled."""
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit shared by every synthesis worker.
+
+    Each success adds 1/limit (about +1 per full window); a 429 halves the
+    limit once per congestion event and pauses all workers until the
+    retry-after time. Requests already in flight when the limit drops finish
+    normally; new ones wait until in-flight falls below the new limit.
+    """
+
+    def __init__(self, max_limit=DEFAULT_CONCURRENCY, initial=None, min_limit=1, clock=time.monotonic):
+        self.max_limit = clamp_concurrency(max_limit)
+        self.min_limit = max(1, min(int(min_limit), self.max_limit))
+        self.limit = float(clamp_concurrency(initial) if initial else self.max_limit)
+        self.in_flight = 0
+        self.throttles = 0
+        self.lowest = int(self.limit)
+        self.epoch = 0
+        self._pause_until = 0.0
+        self._clock = clock
+        self._cond = threading.Condition()
+
+    def acquire(self, cancel_event=None) -> None:
+        with self._cond:
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise Cancelled()
+                now = self._clock()
+                if now >= self._pause_until and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                self._cond.wait(min(0.25, max(0.01, self._pause_until - now)))
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, cancel_event=None):
+        self.acquire(cancel_event)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def on_success(self) -> None:
+        with self._cond:
+            if self.limit < self.max_limit:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+                self._cond.notify_all()
+
+    def on_throttle(self, retry_after=None, epoch=None) -> None:
+        """Record a 429. Only the first 429 of a burst (same epoch) cuts the limit."""
+        with self._cond:
+            self.throttles += 1
+            wait = retry_after if retry_after is not None else DEFAULT_THROTTLE_WAIT
+            self._pause_until = max(self._pause_until, self._clock() + wait)
+            if epoch is None or epoch == self.epoch:
+                self.limit = float(max(self.min_limit, math.floor(self.limit / 2)))
+                self.lowest = min(self.lowest, int(self.limit))
+                self.epoch += 1
+
+    def wait_if_paused(self, cancel_event=None) -> bool:
+        """Sleep out a shared pause; False if cancelled meanwhile."""
+        while True:
+            with self._cond:
+                left = self._pause_until - self._clock()
+            if left <= 0:
+                return True
+            if cancel_event is not None:
+                if cancel_event.wait(min(left, 0.25)):
+                    return False
+            else:
+                time.sleep(min(left, 0.25))
+
+
+def iter_file(path: str, chunk_size: int = STREAM_CHUNK):
+    """Yield a file's bytes in chunks (used to replay cached audio like a response)."""
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            yield chunk
+
+
+def pump(chunks, sinks, cancel_event=None):
+    """
+    Feed byte chunks to every sink callable while hashing incrementally.
+
+    Returns (bytes, md5_hex, sha256_hex). Raises Cancelled if cancel_event
+    is set mid-transfer so partial files can be discarded.
+    """
+    md5 = hashlib.md5()
+    sha = hashlib.sha256()
+    n = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if cancel_event is not None and cancel_event.is_set():
+            raise Cancelled()
+        md5.update(chunk)
+        sha.update(chunk)
+        n += len(chunk)
+        for sink in sinks:
+            sink(chunk)
+    return n, md5.hexdigest(), sha.hexdigest()
+
+
+def ordered_map(fn, items, concurrency=DEFAULT_CONCURRENCY, cancel_event=None, executor=None):
+    """
+    Run fn(item) for each item on up to `concurrency` threads.
+
+    Yields (item, result, error) tuples strictly in input order. At most
+    2 x concurrency jobs are in flight or buffered at once, so a slow
+    consumer (PowerPoint insertion) never lets downloads pile up unbounded.
+
+    When cancel_event is set, no new jobs start, queued jobs are dropped and
+    the generator stops; requests already on the wire finish in the background
+    and their results are discarded.
+
+    Pass a shared executor to schedule onto a pool owned by the caller (a
+    multi-deck batch); it is left running when the generator finishes.
+    """
+    workers = clamp_concurrency(concurrency)
+    window = workers * 2
+    cancel_event = cancel_event or threading.Event()
+
+    def guarded(item):
+        if cancel_event.is_set():
+            raise Cancelled()
+        return fn(item)
+
+    pool = executor or ThreadPoolExecutor(max_workers=workers, thread_name_prefix="voxtts")
+    pending = deque()
+    it = iter(items)
+    try:
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < window and not cancel_event.is_set():
+                try:
+                    item = next(it)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.append((item, pool.submit(guarded, item)))
+            if not pending or cancel_event.is_set():
+                return
+            item, fut = pending.popleft()
+            # Poll so a cancel during a long request is noticed promptly
+            while not fut.done():
+                if cancel_event.wait(0.1):
+                    return
+            try:
+                yield item, fut.result(), None
+            except Cancelled:
+                return
+            except Exception as e:
+                yield item, None, e
+    finally:
+        for _, fut in pending:
+            fut.cancel()
+        if executor is None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+class StageTimer:
+    """Thread-safe per-stage wall-time totals for the run summary."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = {}
+        self.counts = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+            self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def summary(self) -> str:
+        with self._lock:
+            parts = [f"{k} {self.totals[k]:.1f}s/{self.counts[k]}" for k in self.totals]
+        return ", ".join(parts)
+
+
+_END = object()
+
+
+class _StageFailed:
+    """Queue entry for an error outside fetch()/convert(); the consumer re-raises it."""
+
+    __slots__ = ("error",)
+
+    def __init__(self, error):
+        self.error = error
+
+
+def pipeline(items, fetch, convert, concurrency=DEFAULT_CONCURRENCY, cancel_event=None, depth=None, executor=None):
+    """
+    Three-stage ordered pipeline: fetch -> convert -> caller.
+
+    fetch(item) runs on the ordered_map pool; convert(item, result) runs on
+    one dedicated thread; the caller (the thread that owns PowerPoint)
+    consumes (item, result, error) tuples in input order. Stages are joined
+    by bounded queues so slide N+1 downloads while slide N converts and
+    slide N-1 is inserted, without buffering the whole deck. An error in
+    the stage machinery itself is raised in the caller.
+    """
+    workers = clamp_concurrency(concurrency)
+    cancel_event = cancel_event or threading.Event()
+    stop = threading.Event()
+    q = queue.Queue(maxsize=depth or workers)
+
+    def halted():
+        return stop.is_set() or cancel_event.is_set()
+
+    def put(entry):
+        while not halted():
+            try:
+                q.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def convert_stage():
+        fetched = ordered_map(fetch, items, workers, cancel_event, executor)
+        try:
+            for item, result, err in fetched:
+                if halted():
+                    return
+                if err is None:
+                    try:
+                        result = convert(item, result)
+                    except Exception as e:
+                        result, err = None, e
+                if not put((item, result, err)):
+                    return
+        except Exception as e:
+            put(_StageFailed(e))
+        finally:
+            fetched.close()
+            # The end marker must get through even if the consumer is slow
+            while True:
+                try:
+                    q.put(_END, timeout=0.1)
+                    break
+                except queue.Full:
+                    if stop.is_set():
+                        break
+
+    t = threading.Thread(target=convert_stage, name="voxtts-convert", daemon=True)
+    t.start()
+    try:
+        while True:
+            try:
+                entry = q.get(timeout=0.1)
+            except queue.Empty:
+                if cancel_event.is_set() and not t.is_alive():
+                    return
+                continue
+            if entry is _END:
+                return
+            if isinstance(entry, _StageFailed):
+                raise entry.error
+            yield entry
+    finally:
+        stop.set()
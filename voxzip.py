@@ -0,0 +1,281 @@
+"""
+voxzip.py
+Incremental .pptx (zip) rewriter for Voxsmith.
+
+A deck save through zipfile decompresses and recompresses every member,
+so a 500 MB video deck costs the same to save whether one slide changed
+or fifty. rewrite() instead copies every member that isn't being replaced
+byte-for-byte - local header, compressed data and data descriptor - in
+as few contiguous ranges as possible (os.copy_file_range where the OS has
+it), compresses only the replaced and added parts, and writes a fresh
+central directory. Save time is then sequential I/O on the untouched
+bytes plus work proportional to the change.
+
+The result goes to a temporary file next to the destination, is flushed
+to disk, and only then renamed over it, so a crash or a full disk never
+leaves a half-written deck behind.
+"""
+import os
+import time
+import zlib
+import struct
+import zipfile
+
+TMP_SUFFIX = ".voxtmp"
+COPY_BLOCK = 8 << 20
+
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_CENTRAL_DIR = struct.Struct("<4s4B4HL2L5H2L")
+_END_ARCHIVE = struct.Struct("<4s4H2LH")
+_END_ARCHIVE64 = struct.Struct("<4sQ2H2L4Q")
+_END_ARCHIVE64_LOCATOR = struct.Struct("<4sLQL")
+
+_ZIP64_LIMIT = 0xFFFFFFFF
+_ZIP64_COUNT_LIMIT = 0xFFFF
+_ZIP64_EXTRA = 0x0001
+_FLAG_UTF8 = 0x800
+_FLAG_DESCRIPTOR = 0x08
+
+
+class _Entry:
+    """One member of the output: a copied source ZipInfo or a freshly written part."""
+
+    __slots__ = ("name", "flag_bits", "compress_type", "date_time", "crc", "compress_size", "file_size",
+                 "extra", "comment", "create_version", "create_system", "extract_version",
+                 "internal_attr", "external_attr", "offset")
+
+    @classmethod
+    def from_info(cls, info, offset):
+        e = cls()
+        e.name, e.flag_bits, e.compress_type, e.date_time = (info.filename, info.flag_bits,
+                                                             info.compress_type, info.date_time)
+        e.crc, e.compress_size, e.file_size = info.CRC, info.compress_size, info.file_size
+        e.extra, e.comment = _strip_zip64(info.extra), info.comment
+        e.create_version, e.create_system, e.extract_version = (info.create_version, info.create_system,
+                                                                info.extract_version)
+        e.internal_attr, e.external_attr = info.internal_attr, info.external_attr
+        e.offset = offset
+        return e
+
+    @classmethod
+    def new(cls, name, compress_type, offset, external_attr=0o600 << 16):
+        e = cls()
+        e.name, e.compress_type, e.offset = name, compress_type, offset
+        e.flag_bits = 0 if name.isascii() else _FLAG_UTF8
+        e.date_time = time.localtime()[:6]
+        e.crc = e.compress_size = e.file_size = 0
+        e.extra, e.comment = b"", b""
+        e.create_version, e.create_system = 20, 0
+        e.extract_version = 20
+        e.internal_attr, e.external_attr = 0, external_attr
+        return e
+
+    def encoded_name(self) -> bytes:
+        return self.name.encode("utf-8" if self.flag_bits & _FLAG_UTF8 else "cp437")
+
+    def dos_time(self):
+        y, mo, d, h, mi, s = self.date_time
+        return (h << 11) | (mi << 5) | (s // 2), (max(y, 1980) - 1980) << 9 | (mo << 5) | d
+
+    def central_record(self) -> bytes:
+        zip64 = []
+        file_size, compress_size, offset = self.file_size, self.compress_size, self.offset
+        if file_size >= _ZIP64_LIMIT:
+            zip64.append(file_size)
+            file_size = _ZIP64_LIMIT
+        if compress_size >= _ZIP64_LIMIT:
+            zip64.append(compress_size)
+            compress_size = _ZIP64_LIMIT
+        if offset >= _ZIP64_LIMIT:
+            zip64.append(offset)
+            offset = _ZIP64_LIMIT
+        extra = self.extra
+        extract_version = self.extract_version
+        if zip64:
+            extra = struct.pack(f"<HH{len(zip64)}Q", _ZIP64_EXTRA, 8 * len(zip64), *zip64) + extra
+            extract_version = max(extract_version, 45)
+        name = self.encoded_name()
+        dostime, dosdate = self.dos_time()
+        return _CENTRAL_DIR.pack(
+            b"PK\x01\x02", max(self.create_version, extract_version), self.create_system, extract_version, 0,
+            self.flag_bits, self.compress_type, dostime, dosdate, self.crc, compress_size, file_size,
+            len(name), len(extra), len(self.comment), 0, self.internal_attr, self.external_attr, offset,
+        ) + name + extra + self.comment
+
+    def local_header(self) -> bytes:
+        name = self.encoded_name()
+        dostime, dosdate = self.dos_time()
+        return _LOCAL_HEADER.pack(b"PK\x03\x04", self.extract_version, 0, self.flag_bits & ~_FLAG_DESCRIPTOR,
+                                  self.compress_type, dostime, dosdate, self.crc, self.compress_size,
+                                  self.file_size, len(name), 0) + name
+
+
+def _strip_zip64(extra: bytes) -> bytes:
+    """extra without its zip64 field (rebuilt for the member's new offset)."""
+    out = []
+    i = 0
+    while i + 4 <= len(extra):
+        tag, size = struct.unpack_from("<HH", extra, i)
+        if tag != _ZIP64_EXTRA:
+            out.append(extra[i:i + 4 + size])
+        i += 4 + size
+    return b"".join(out)
+
+
+def _copy_range(src, dst, start: int, length: int) -> None:
+    """Copy src[start:start + length] to dst's current position."""
+    copy_file_range = getattr(os, "copy_file_range", None)
+    if copy_file_range is not None:
+        dst.flush()
+        pos = dst.tell()
+        done = 0
+        try:
+            while done < length:
+                n = copy_file_range(src.fileno(), dst.fileno(), length - done,
+                                    offset_src=start + done, offset_dst=pos + done)
+                if n == 0:
+                    break
+                done += n
+        except OSError:
+            pass
+        dst.seek(pos + done)
+        start, length = start + done, length - done
+    src.seek(start)
+    while length > 0:
+        block = src.read(min(COPY_BLOCK, length))
+        if not block:
+            raise EOFError("source zip is truncated")
+        dst.write(block)
+        length -= len(block)
+
+
+def _write_bytes(dst, name: str, data: bytes, compress_type: int) -> _Entry:
+    entry = _Entry.new(name, compress_type, dst.tell())
+    entry.file_size = len(data)
+    entry.crc = zlib.crc32(data) & 0xFFFFFFFF
+    if compress_type == zipfile.ZIP_DEFLATED:
+        comp = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        data = comp.compress(data) + comp.flush()
+    entry.compress_size = len(data)
+    if entry.file_size >= _ZIP64_LIMIT:
+        raise ValueError(f"{name}: parts over 4 GB are not supported")
+    dst.write(entry.local_header())
+    dst.write(data)
+    return entry
+
+
+def _write_file(dst, name: str, path: str) -> _Entry:
+    """Stream a file in stored (uncompressed), then fill in its CRC and size."""
+    entry = _Entry.new(name, zipfile.ZIP_STORED, dst.tell())
+    header = entry.local_header()
+    dst.write(header)
+    crc, size = 0, 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(COPY_BLOCK), b""):
+            crc = zlib.crc32(block, crc)
+            size += len(block)
+            dst.write(block)
+    if size >= _ZIP64_LIMIT:
+        raise ValueError(f"{name}: parts over 4 GB are not supported")
+    entry.crc, entry.file_size, entry.compress_size = crc & 0xFFFFFFFF, size, size
+    end = dst.tell()
+    dst.seek(entry.offset)
+    dst.write(entry.local_header())
+    dst.seek(end)
+    return entry
+
+
+def _write_central_directory(dst, entries, comment: bytes) -> None:
+    cd_start = dst.tell()
+    for e in entries:
+        dst.write(e.central_record())
+    cd_size = dst.tell() - cd_start
+    count = len(entries)
+    if count >= _ZIP64_COUNT_LIMIT or cd_start >= _ZIP64_LIMIT or cd_size >= _ZIP64_LIMIT:
+        eocd64 = dst.tell()
+        dst.write(_END_ARCHIVE64.pack(b"PK\x06\x06", _END_ARCHIVE64.size - 12, 45, 45, 0, 0,
+                                      count, count, cd_size, cd_start))
+        dst.write(_END_ARCHIVE64_LOCATOR.pack(b"PK\x06\x07", 0, eocd64, 1))
+        count = min(count, _ZIP64_COUNT_LIMIT)
+        cd_size = min(cd_size, _ZIP64_LIMIT)
+        cd_start = min(cd_start, _ZIP64_LIMIT)
+    comment = comment[:0xFFFF]
+    dst.write(_END_ARCHIVE.pack(b"PK\x05\x06", 0, 0, count, count, cd_size, cd_start, len(comment)))
+    dst.write(comment)
+
+
+def rewrite(src_path: str, dst_path: str = None, replace=None, add_files=None, remove=()) -> dict:
+    """
+    Write src_path to dst_path (default: over src_path) with changes.
+
+    replace maps part names to new bytes; names already in the zip keep
+    their position and (when stored or deflated; anything else becomes
+    deflated) their compression, new ones are deflated and added at the
+    end. Every copy of a replaced name in a zip with duplicates is dropped
+    for the one new member. add_files maps new part names to files streamed in stored
+    (media). remove names parts to leave out. Every other member is
+    copied raw. Returns byte and member counts and the time taken.
+    """
+    t0 = time.perf_counter()
+    dst_path = dst_path or src_path
+    replace = dict(replace or {})
+    add_files = dict(add_files or {})
+    remove = set(remove)
+    replaced = set(replace)
+    stats = {"members_copied": 0, "members_written": 0, "bytes_copied": 0, "bytes_written": 0}
+    tmp = dst_path + TMP_SUFFIX
+    try:
+        with zipfile.ZipFile(src_path) as zin, open(src_path, "rb") as src, open(tmp, "wb") as dst:
+            infos = sorted(zin.infolist(), key=lambda i: i.header_offset)
+            ends = [i.header_offset for i in infos[1:]] + [zin.start_dir]
+            entries = []
+            run = None  # [source start, source end, output start] of the pending raw copy
+            for info, end in zip(infos, ends):
+                name = info.filename
+                if name in remove or name in replaced:
+                    if run is not None:
+                        _copy_range(src, dst, run[0], run[1] - run[0])
+                        run = None
+                    if name in replace:
+                        data = replace.pop(name)
+                        method = info.compress_type
+                        if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                            method = zipfile.ZIP_DEFLATED  # _write_bytes can't write bzip2/lzma
+                        entry = _write_bytes(dst, name, data, method)
+                        entry.external_attr = info.external_attr
+                        entries.append(entry)
+                        stats["members_written"] += 1
+                        stats["bytes_written"] += entry.compress_size
+                    continue
+                if run is None:
+                    run = [info.header_offset, end, dst.tell()]
+                elif run[1] == info.header_offset:
+                    run[1] = end
+                else:
+                    _copy_range(src, dst, run[0], run[1] - run[0])
+                    run = [info.header_offset, end, dst.tell()]
+                entries.append(_Entry.from_info(info, run[2] + info.header_offset - run[0]))
+                stats["members_copied"] += 1
+                stats["bytes_copied"] += end - info.header_offset
+            if run is not None:
+                _copy_range(src, dst, run[0], run[1] - run[0])
+            for name, data in replace.items():
+                entries.append(_write_bytes(dst, name, data, zipfile.ZIP_DEFLATED))
+                stats["members_written"] += 1
+                stats["bytes_written"] += entries[-1].compress_size
+            for name, path in add_files.items():
+                entries.append(_write_file(dst, name, path))
+                stats["members_written"] += 1
+                stats["bytes_written"] += entries[-1].compress_size
+            _write_central_directory(dst, entries, zin.comment)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp, dst_path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    stats["seconds"] = round(time.perf_counter() - t0, 3)
+    return stats